@@ -62,4 +62,6 @@ setup(
   packages=['taskrun'],
   install_requires=['termcolor >= 1.1.0',
                     'psutil >= 4.0.0'],
+  extras_require={'zstd': ['zstandard'],
+                  'lz4': ['lz4']},
 )
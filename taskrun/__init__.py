@@ -29,12 +29,24 @@
  * POSSIBILITY OF SUCH DAMAGE.
 """
 
+from .async_function_task import AsyncFunctionTask
+from .child_action import Affinity
+from .child_action import ChildAction
+from .child_action import Cwd
+from .child_action import Nice
+from .child_action import RLimit
+from .child_action import Umask
+from .cluster_backend import ClusterBackend
+from .cluster_bundle import ClusterBundle
 from .cluster_task import ClusterTask
 from .common_instantiations import basic_task_manager
 from .common_instantiations import standard_task_manager
+from .compressed_sink import CompressedSink
+from .compressed_sink import compressions
 from .condition import Condition
 from .counter_resource import CounterResource
 from .cpu_time_resource import CpuTimeResource
+from .execution_engine import ExecutionEngine
 from .failure_mode import FailureMode
 from .file_cleanup_observer import FileCleanupObserver
 from .file_hash_condition import FileHashCondition
@@ -42,14 +54,24 @@ from .file_hash_database import FileHashDatabase
 from .file_modification_condition import FileModificationCondition
 from .function_condition import FunctionCondition
 from .function_task import FunctionTask
+from .job_journal import JobJournal
+from .log_container import LogContainer
+from .log_container import LogReader
 from .memory_resource import MemoryResource
 from .nop_task import NopTask
 from .observer import Observer
+from .output_buffer import OutputBuffer
+from .process_pool_function_task import ProcessPoolFunctionTask
+from .process_supervisor import ProcessSupervisor
 from .process_task import ProcessTask
+from .ready_queue import ReadyQueue
+from .reservation import Reservation
 from .resource import Resource
 from .resource_manager import ResourceManager
 from .task import Task
 from .task_manager import TaskManager
+from .timer_wheel import TimerWheel
 from .verbose_observer import VerboseObserver
+from .worker_pool import WorkerPool
 
 __version__ = '4.2.3'
@@ -0,0 +1,166 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import os
+import resource
+
+
+class ChildAction:
+  """
+  This defines a declarative setup action that is applied in a child process
+  after it is forked and before it executes its program. apply() is called in
+  the child by a subprocess.Popen preexec_fn (see spawn()). Running arbitrary
+  Python code between fork and exec in a multithreaded process can deadlock on
+  locks held by other threads at the fork, so only a restricted set of actions
+  exist, each a single system call that takes no such lock.
+  """
+
+  @property
+  def key(self):
+    """
+    Returns:
+      (hashable) : actions with the same key replace each other
+    """
+    return type(self)
+
+  def apply(self):
+    """
+    Applies this action. This is called in the child process.
+    """
+    raise NotImplementedError('subclasses should override this!')
+
+
+class RLimit(ChildAction):
+  """
+  This sets a resource limit (see resource.setrlimit())
+  """
+
+  def __init__(self, limit, soft, hard=None):
+    """
+    Args:
+      limit (int) : the resource (resource.RLIMIT_*)
+      soft (int)  : the soft limit
+      hard (int)  : the hard limit, None to keep the current hard limit
+    """
+    self.limit = limit
+    self.soft = soft
+    self.hard = hard
+
+  @property
+  def key(self):
+    """
+    See ChildAction.key
+    """
+    return (RLimit, self.limit)
+
+  def apply(self):
+    """
+    See ChildAction.apply()
+    """
+    hard = self.hard
+    if hard is None:
+      hard = resource.getrlimit(self.limit)[1]
+    resource.setrlimit(self.limit, (self.soft, hard))
+
+
+class Nice(ChildAction):
+  """
+  This changes the scheduling priority (see os.nice())
+  """
+
+  def __init__(self, increment):
+    """
+    Args:
+      increment (int) : added to the niceness
+    """
+    self.increment = increment
+
+  def apply(self):
+    """
+    See ChildAction.apply()
+    """
+    os.nice(self.increment)
+
+
+class Affinity(ChildAction):
+  """
+  This restricts the CPUs used (see os.sched_setaffinity())
+  """
+
+  def __init__(self, cpus):
+    """
+    Args:
+      cpus (iterable<int>) : the CPUs to run on
+    """
+    self.cpus = frozenset(cpus)
+
+  def apply(self):
+    """
+    See ChildAction.apply()
+    """
+    os.sched_setaffinity(0, self.cpus)
+
+
+class Umask(ChildAction):
+  """
+  This sets the file mode creation mask (see os.umask())
+  """
+
+  def __init__(self, mask):
+    """
+    Args:
+      mask (int) : the new mask
+    """
+    self.mask = mask
+
+  def apply(self):
+    """
+    See ChildAction.apply()
+    """
+    os.umask(self.mask)
+
+
+class Cwd(ChildAction):
+  """
+  This changes the working directory (see os.chdir())
+  """
+
+  def __init__(self, path):
+    """
+    Args:
+      path (str) : the working directory
+    """
+    self.path = path
+
+  def apply(self):
+    """
+    See ChildAction.apply()
+    """
+    os.chdir(self.path)
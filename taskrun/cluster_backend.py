@@ -0,0 +1,569 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import os
+import re
+import subprocess
+import threading
+import time
+import traceback
+from .cluster_task import ClusterTask
+
+
+# the states of jobs that have finished, see sacct(1)
+_SLURM_FINISHED = {'BOOT_FAIL', 'CANCELLED', 'COMPLETED', 'DEADLINE', 'FAILED',
+                   'NODE_FAIL', 'OUT_OF_MEMORY', 'PREEMPTED', 'TIMEOUT'}
+
+# the environment variable holding the array index of a job array element
+ARRAY_INDEX = {
+  'sge': 'SGE_TASK_ID',
+  'lsf': 'LSB_JOBINDEX',
+  'slurm': 'SLURM_ARRAY_TASK_ID',
+}
+
+
+class ClusterBackend:
+  """
+  This class submits asynchronous ClusterTasks to a cluster scheduler and
+  tracks their jobs from a single poller thread instead of blocking a thread
+  and a scheduler client per job.
+
+  Tasks submitted within ARRAY_WINDOW of each other that have the same
+  ClusterTask.array_key() are coalesced into one array job of up to ARRAY_MAX
+  elements. The array job runs a script in SCRIPT_DIR (which must be visible
+  to the cluster) that selects the command of each element by its index, and
+  each element is tracked as the job of its task.
+
+  Every poll queries the state of all outstanding jobs with one batched
+  scheduler command (sacct for Slurm, bjobs for LSF, and qstat then qacct for
+  the finished jobs for SGE). The poll interval starts at POLL_MIN and doubles
+  up to POLL_MAX while no job finishes.
+  """
+
+  POLL_MIN = 1.0
+  POLL_MAX = 30.0
+  # the number of polls a job can be unknown to the scheduler before failing
+  MISSING_LIMIT = 10
+  ARRAY_WINDOW = 0.1
+  ARRAY_MAX = 1000
+  SCRIPT_DIR = '.taskrun'
+
+  def __init__(self, mode):
+    """
+    Constructs a ClusterBackend object
+
+    Args:
+      mode (str) : name of cluster scheduler (see ClusterTask)
+    """
+    assert mode in ARRAY_INDEX, 'invalid scheduler name: ' + mode
+    self._mode = mode
+    self._condition_variable = threading.Condition()
+    self._pending = {}  # array key -> [deadline, [task, ...]]
+    self._jobs = {}  # job id -> callback
+    self._missing = {}  # job id -> number of polls the job was unknown
+    self._progress = {}  # job id -> progress callback
+    self._scripts = {}  # array job id -> [unfinished elements, script]
+    self._interval = self.POLL_MIN
+    self._next_poll = time.monotonic() + self._interval
+    self._stop = False
+    self._polls = 0
+    self._submissions = 0
+    self._thread = threading.Thread(target=self._loop, daemon=True,
+                                    name='taskrun-cluster-' + mode)
+    self._thread.start()
+
+  @property
+  def mode(self):
+    """
+    Returns:
+      (str) : name of cluster scheduler
+    """
+    return self._mode
+
+  @property
+  def jobs(self):
+    """
+    Returns:
+      (int) : the number of outstanding jobs
+    """
+    with self._condition_variable:
+      return len(self._jobs)
+
+  @property
+  def polls(self):
+    """
+    Returns:
+      (int) : the number of scheduler queries made
+    """
+    return self._polls
+
+  @property
+  def submissions(self):
+    """
+    Returns:
+      (int) : the number of submission commands run
+    """
+    return self._submissions
+
+  @staticmethod
+  def parse_job_id(mode, output):
+    """
+    Args:
+      mode (str)   : name of cluster scheduler
+      output (str) : the stdout of the submission command
+
+    Returns:
+      (str) : the job id, None if not found
+    """
+    if mode == 'lsf':
+      # Job <123> is submitted to queue <normal>.
+      match = re.search(r'Job <(\d+)>', output)
+    else:
+      # sge: 123 or 123.1-4:1 (qsub -terse), slurm: 123 or 123;cluster
+      #  (sbatch --parsable)
+      match = re.match(r'\s*(\d+)', output)
+    return match.group(1) if match else None
+
+  @staticmethod
+  def element_id(mode, job_id, index):
+    """
+    Args:
+      mode (str)   : name of cluster scheduler
+      job_id (str) : the id of an array job
+      index (int)  : the index of an element of the array job
+
+    Returns:
+      (str) : the id of the element as reported by the scheduler
+    """
+    if mode == 'sge':
+      return '{}.{}'.format(job_id, index)
+    if mode == 'lsf':
+      return '{}[{}]'.format(job_id, index)
+    return '{}_{}'.format(job_id, index)
+
+  def submit(self, task):
+    """
+    Queues an asynchronous ClusterTask for submission. The task is informed
+    with ClusterTask.job_submitted() then ClusterTask.job_finished(). Jobs
+    that have a job_progress() method, like the jobs of a ClusterBundle, are
+    also informed at every poll (see watch()).
+
+    Args:
+      task (ClusterTask) : the task
+    """
+    with self._condition_variable:
+      assert not self._stop, 'cluster backend is shut down'
+      key = task.array_key()
+      if key not in self._pending:
+        self._pending[key] = [time.monotonic() + self.ARRAY_WINDOW, []]
+      self._pending[key][1].append(task)
+      self._condition_variable.notify()
+
+  def watch(self, job_id, callback, progress=None):
+    """
+    Tracks a submitted job until it finishes
+
+    Args:
+      job_id (str)        : the id of the job
+      callback (callable) : called on the poller thread as callback(returncode)
+                            when the job finishes, returncode is None if the
+                            job was lost by the scheduler
+      progress (callable) : called on the poller thread after every poll while
+                            the job is outstanding, returns True if the job
+                            made progress which restarts the adaptive polling
+    """
+    with self._condition_variable:
+      assert not self._stop, 'cluster backend is shut down'
+      self._jobs[job_id] = callback
+      if progress is not None:
+        self._progress[job_id] = progress
+      # new jobs restart the adaptive polling
+      self._interval = self.POLL_MIN
+      self._next_poll = min(self._next_poll, time.monotonic() + self.POLL_MIN)
+      self._condition_variable.notify()
+
+  def cancel(self, job_ids):
+    """
+    Cancels jobs with one scheduler command without waiting for it. The jobs
+    are reported finished by the poller.
+
+    Args:
+      job_ids (list<str>) : the ids of the jobs
+    """
+    # pylint: disable=protected-access
+    ClusterTask._cancel_jobs(self._mode, list(job_ids))
+
+  def shutdown(self):
+    """
+    Stops the poller thread. All jobs must have finished.
+    """
+    with self._condition_variable:
+      self._stop = True
+      self._condition_variable.notify()
+    self._thread.join()
+
+  def _loop(self):
+    """
+    This is the main loop of the poller thread
+    """
+    while True:
+      submissions = []
+      with self._condition_variable:
+        while True:
+          if self._stop and not self._jobs and not self._pending:
+            return
+          now = time.monotonic()
+          for key, (deadline, tasks) in list(self._pending.items()):
+            if deadline <= now or len(tasks) >= self.ARRAY_MAX:
+              del self._pending[key]
+              submissions.append(tasks)
+          if submissions or (self._jobs and self._next_poll <= now):
+            break
+          waits = [deadline - now for deadline, _ in self._pending.values()]
+          if self._jobs:
+            waits.append(self._next_poll - now)
+          self._condition_variable.wait(min(waits) if waits else None)
+        job_ids = list(self._jobs)
+
+      if submissions:
+        for tasks in submissions:
+          for start in range(0, len(tasks), self.ARRAY_MAX):
+            self._submit(tasks[start:start + self.ARRAY_MAX])
+        continue
+
+      try:
+        finished = self._query(job_ids)
+      except (OSError, subprocess.SubprocessError):
+        # the scheduler is unavailable, try again later
+        traceback.print_exc()
+        finished = None
+      self._polls += 1
+
+      # the jobs report their progress before their completion
+      with self._condition_variable:
+        progresses = list(self._progress.values())
+      progress = False
+      for callback in progresses:
+        try:
+          progress = callback() or progress
+        except Exception:  # pylint: disable=broad-except
+          traceback.print_exc()
+
+      callbacks = []
+      with self._condition_variable:
+        if finished is not None:
+          known = finished.pop(None)
+          for job_id in job_ids:
+            if job_id in finished:
+              callbacks.append((job_id, self._jobs.pop(job_id),
+                                finished[job_id]))
+              self._missing.pop(job_id, None)
+            elif job_id not in known:
+              # the scheduler doesn't know the job (yet)
+              self._missing[job_id] = self._missing.get(job_id, 0) + 1
+              if self._missing[job_id] >= self.MISSING_LIMIT:
+                callbacks.append((job_id, self._jobs.pop(job_id), None))
+                del self._missing[job_id]
+        for job_id, _, _ in callbacks:
+          self._progress.pop(job_id, None)
+        if callbacks or progress:
+          self._interval = self.POLL_MIN
+        else:
+          self._interval = min(self._interval * 2, self.POLL_MAX)
+        self._next_poll = time.monotonic() + self._interval
+
+      for job_id, callback, returncode in callbacks:
+        self._element_done(job_id)
+        try:
+          callback(returncode)
+        except Exception:  # pylint: disable=broad-except
+          # keep tracking the other jobs
+          traceback.print_exc()
+
+  def _submit(self, tasks):
+    """
+    Submits tasks as one job or as one array job
+
+    Args:
+      tasks (list<ClusterTask>) : tasks with the same array key
+    """
+    # tasks killed while pending are never submitted
+    live = []
+    for task in tasks:
+      if task.killed:
+        task.job_finished(None)
+      else:
+        live.append(task)
+    if not live:
+      return
+
+    script = None
+    if len(live) == 1:
+      command = live[0].describe()
+    else:
+      os.makedirs(self.SCRIPT_DIR, exist_ok=True)
+      script = os.path.abspath(os.path.join(
+        self.SCRIPT_DIR, 'array-{}-{}-{}.sh'.format(
+          os.getpid(), id(self), self._submissions)))
+      with open(script, 'w') as fd:
+        fd.write(type(live[0]).array_script(live, ARRAY_INDEX[self._mode]))
+      command = type(live[0]).array_command(live, script)
+
+    try:
+      proc = subprocess.run(command, shell=True, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, start_new_session=True)
+    except OSError as ex:
+      proc = subprocess.CompletedProcess(command, 127, b'', str(ex).encode())
+    self._submissions += 1
+    job_id = None
+    if proc.returncode == 0:
+      job_id = self.parse_job_id(self._mode, proc.stdout.decode('utf-8'))
+
+    if len(live) == 1:
+      job_ids = [job_id]
+    else:
+      job_ids = [None if job_id is None else
+                 self.element_id(self._mode, job_id, index)
+                 for index in range(1, len(live) + 1)]
+      if job_id is None:
+        os.remove(script)
+      else:
+        with self._condition_variable:
+          self._scripts[job_id] = [len(live), script]
+
+    cancels = []
+    for task, element in zip(live, job_ids):
+      if element is not None:
+        self.watch(element, task.job_finished,
+                   getattr(task, 'job_progress', None))
+      if not task.job_submitted(element, proc) and element is not None:
+        # killed while being submitted
+        cancels.append(element)
+    self.cancel(cancels)
+
+  def _element_done(self, job_id):
+    """
+    Removes the script of an array job when all its elements are done
+
+    Args:
+      job_id (str) : the id of a finished job or array job element
+    """
+    array_id = re.match(r'\d+', job_id).group(0)
+    with self._condition_variable:
+      if array_id not in self._scripts:
+        return
+      self._scripts[array_id][0] -= 1
+      if self._scripts[array_id][0] > 0:
+        return
+      script = self._scripts.pop(array_id)[1]
+    try:
+      os.remove(script)
+    except OSError:
+      pass
+
+  def _query(self, job_ids):
+    """
+    Queries the scheduler for the states of jobs
+
+    Args:
+      job_ids (list<str>) : the ids of the jobs and array job elements
+
+    Returns:
+      (dict) : job id -> return code of the finished jobs, the None key holds
+               the set of the ids known to the scheduler
+    """
+    # array job elements are queried through their array job
+    base_ids = list(dict.fromkeys(
+      re.match(r'\d+', job_id).group(0) for job_id in job_ids))
+    if self._mode == 'slurm':
+      output = _check_output(['sacct', '-n', '-X', '-P',
+                              '-o', 'JobID,State,ExitCode',
+                              '-j', ','.join(base_ids)])
+      return parse_sacct(output)
+    if self._mode == 'lsf':
+      output = _check_output(['bjobs', '-noheader', '-a',
+                              '-o', 'jobid jobindex stat exit_code'] + base_ids)
+      return parse_bjobs(output)
+    # SGE only reports finished jobs through the accounting
+    queued = parse_qstat(_check_output(['qstat']))
+    done = list(dict.fromkeys(
+      re.match(r'\d+', job_id).group(0) for job_id in job_ids
+      if job_id not in queued))
+    finished = {}
+    if done:
+      output = _check_output(
+        ['sh', '-c', 'for j in "$@"; do qacct -j "$j"; done', 'qacct'] + done,
+        check=False)
+      finished = parse_qacct(output)
+    finished[None] = queued | set(finished)
+    return finished
+
+
+def _check_output(args, check=True):
+  """
+  Runs a scheduler command
+
+  Returns:
+    (str) : the stdout of the command
+  """
+  proc = subprocess.run(args, stdout=subprocess.PIPE,
+                        stderr=subprocess.DEVNULL, check=check)
+  return proc.stdout.decode('utf-8', errors='replace')
+
+
+def _expand(spec):
+  """
+  Expands a scheduler's list of array indices (e.g., '1-5:2,8' or '3-9%2')
+
+  Returns:
+    (list<int>) : the indices
+  """
+  indices = []
+  for part in spec.split(','):
+    part = part.split('%')[0]
+    bounds, _, step = part.partition(':')
+    first, _, last = bounds.partition('-')
+    if not first.isdigit():
+      continue
+    last = last if last.isdigit() else first
+    indices.extend(range(int(first), int(last) + 1, int(step or 1)))
+  return indices
+
+
+def parse_sacct(output):
+  """
+  Parses 'sacct -n -X -P -o JobID,State,ExitCode' output
+
+  Returns:
+    (dict) : see ClusterBackend._query()
+  """
+  finished = {None: set()}
+  for line in output.splitlines():
+    fields = line.strip().split('|')
+    if len(fields) != 3:
+      continue
+    job_id, state, exit_code = fields
+    if '_[' in job_id:
+      # pending array job elements
+      array_id, _, spec = job_id.partition('_[')
+      finished[None].update('{}_{}'.format(array_id, index)
+                            for index in _expand(spec.rstrip(']')))
+      continue
+    finished[None].add(job_id)
+    state = state.split()[0] if state else ''
+    if state in _SLURM_FINISHED:
+      code, _, signum = exit_code.partition(':')
+      returncode = int(code or 0)
+      if returncode == 0 and signum and int(signum):
+        returncode = -int(signum)
+      if returncode == 0 and state != 'COMPLETED':
+        returncode = 1
+      finished[job_id] = returncode
+  return finished
+
+
+def parse_bjobs(output):
+  """
+  Parses 'bjobs -noheader -a -o "jobid jobindex stat exit_code"' output
+
+  Returns:
+    (dict) : see ClusterBackend._query()
+  """
+  finished = {None: set()}
+  for line in output.splitlines():
+    fields = line.split()
+    if len(fields) != 4 or not fields[0].isdigit():
+      continue
+    job_id, index, state, exit_code = fields
+    if index != '0':
+      job_id = '{}[{}]'.format(job_id, index)
+    finished[None].add(job_id)
+    if state == 'DONE':
+      finished[job_id] = 0
+    elif state == 'EXIT':
+      finished[job_id] = int(exit_code) if exit_code.isdigit() else 1
+      if finished[job_id] == 0:
+        finished[job_id] = 1
+  return finished
+
+
+def parse_qstat(output):
+  """
+  Parses 'qstat' output
+
+  Returns:
+    (set<str>) : the ids of the jobs and array job elements in the queue
+  """
+  queued = set()
+  for line in output.splitlines():
+    fields = line.split()
+    if not fields or not fields[0].isdigit():
+      continue
+    queued.add(fields[0])
+    # the ja-task-ID column follows the slots of array jobs, running jobs have
+    #  a queue column
+    if len(fields) >= 10:
+      tasks = fields[9]
+    elif len(fields) == 9 and '@' not in fields[7]:
+      tasks = fields[8]
+    else:
+      continue
+    queued.update('{}.{}'.format(fields[0], index) for index in _expand(tasks))
+  return queued
+
+
+def parse_qacct(output):
+  """
+  Parses 'qacct -j ID' output of one or more jobs
+
+  Returns:
+    (dict<str,int>) : job id -> return code
+  """
+  finished = {}
+  job_id = None
+  failed = 0
+  for line in output.splitlines():
+    fields = line.split(None, 1)
+    if len(fields) != 2:
+      continue
+    key, value = fields[0], fields[1].strip()
+    if key == 'jobnumber':
+      job_id = value
+      failed = 0
+    elif key == 'taskid' and value.isdigit() and job_id is not None:
+      job_id = '{}.{}'.format(job_id.split('.')[0], value)
+    elif key == 'failed':
+      failed = int(value.split()[0])
+    elif key == 'exit_status' and job_id is not None:
+      returncode = int(value.split()[0])
+      if returncode == 0 and failed:
+        returncode = 1
+      finished[job_id] = returncode
+  return finished
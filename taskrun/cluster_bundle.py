@@ -0,0 +1,507 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import argparse
+import json
+import os
+import shlex
+import shutil
+import sys
+import threading
+
+from .cluster_task import ClusterTask
+from .counter_resource import CounterResource
+from .observer import Observer
+from .process_task import ProcessTask
+from .resource_manager import ResourceManager
+from .task import Task
+from .task_manager import TaskManager
+
+
+MANIFEST_NAME = 'manifest.json'
+STATUS_NAME = 'status'
+
+# the directory holding the taskrun package, the workers import it from there
+_PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ClusterBundle:
+  """
+  This class packs many short ProcessTasks and ClusterTasks into a few cluster
+  jobs so that they don't each wait to be scheduled. A task is bundled by
+  setting its bundle property.
+
+  Bundled tasks that start within WINDOW of each other are packed by their
+  estimated runtimes (see Task.estimated_runtime, unknown estimates count as
+  the whole runtime of a job) into jobs of about runtime seconds that run
+  parallelism commands at a time. Each job runs a taskrun worker
+  (python -m taskrun.cluster_bundle) that appends the return code of every
+  command to a status file as soon as it finishes. The status files are read
+  by the manager's ClusterBackend at every poll so bundled tasks complete
+  individually. The jobs are submitted and tracked by the ClusterBackend of the
+  scheduler, and the job directories are in a directory that must be visible
+  to the cluster.
+
+  The commands of bundled tasks run with the shell in the job. Their output
+  goes to their stdout and stderr files. The output of a ProcessTask without
+  files is captured in the job directory and read back when the command
+  finishes. Child actions, output compression, and log containers are not
+  used. A killed task is reported killed immediately and the job is cancelled
+  once all its tasks are killed.
+  """
+
+  WINDOW = 0.5
+
+  def __init__(self, mode, parallelism=1, runtime=600, directory='.taskrun',
+               queues=None, cluster_resources=None, cluster_options=None):
+    """
+    Constructs a ClusterBundle object
+
+    Args:
+      mode (str)                         : name of cluster scheduler (see
+                                           ClusterTask)
+      parallelism (int)                  : the number of commands each job
+                                           runs at a time
+      runtime (num)                      : the target runtime of each job in
+                                           seconds
+      directory (str)                    : where the job directories are made
+      queues (strs)                      : the queues allowed to run in
+      cluster_resources (dict<str,str>)  : the resources of each job
+      cluster_options (strs)             : more arguments of the submission
+                                           command, for example the slots of
+                                           an SGE parallel environment
+    """
+    assert mode in ClusterTask.supported_modes(), \
+      'invalid scheduler name: ' + mode
+    assert isinstance(parallelism, int) and parallelism > 0, \
+      'parallelism must be an int > 0, {} is not'.format(parallelism)
+    assert runtime > 0, 'runtime must be > 0, {} is not'.format(runtime)
+    self._mode = mode
+    self._parallelism = parallelism
+    self._runtime = runtime
+    self._directory = directory
+    self._queues = set(queues or ())
+    self._cluster_resources = dict(cluster_resources or {})
+    self._cluster_options = list(cluster_options or ())
+    self._lock = threading.Lock()
+    self._pending = []  # tasks waiting for the window to close
+    self._jobs = {}  # task -> _BundleJob
+    self._count = 0
+
+  @property
+  def mode(self):
+    """
+    Returns:
+      (str) : name of cluster scheduler
+    """
+    return self._mode
+
+  @property
+  def parallelism(self):
+    """
+    Returns:
+      (int) : the number of commands each job runs at a time
+    """
+    return self._parallelism
+
+  @property
+  def runtime(self):
+    """
+    Returns:
+      (num) : the target runtime of each job in seconds
+    """
+    return self._runtime
+
+  def estimate(self, task):
+    """
+    Args:
+      task (Task) : a bundled task
+
+    Returns:
+      (num) : the estimated runtime of the task used for packing
+    """
+    if task.estimated_runtime is None:
+      return self._runtime
+    return task.estimated_runtime
+
+  def pack(self, tasks):
+    """
+    Packs tasks into jobs using first fit decreasing so that the estimated
+    runtimes of the tasks of a job add up to at most runtime * parallelism.
+
+    Args:
+      tasks (list<Task>) : the tasks
+
+    Returns:
+      (list<list<Task>>) : the tasks of each job
+    """
+    capacity = self._runtime * self._parallelism
+    bins = []  # [estimated work, tasks]
+    for task in sorted(tasks, key=self.estimate, reverse=True):
+      estimate = self.estimate(task)
+      for bin_ in bins:
+        if bin_[0] + estimate <= capacity:
+          bin_[0] += estimate
+          bin_[1].append(task)
+          break
+      else:
+        bins.append([estimate, [task]])
+    return [bin_[1] for bin_ in bins]
+
+  def submit(self, task):
+    """
+    This is called by a bundled task when it executes
+
+    Args:
+      task (ProcessTask or ClusterTask) : the task
+
+    Returns:
+      (None or Task.DEFERRED) : see Task.execute()
+    """
+    with self._lock:
+      # If we're killed at this point, don't bother submitting.
+      if task.killed:
+        return None
+      self._pending.append(task)
+      if len(self._pending) == 1:
+        task.manager.timer_wheel().schedule(self.WINDOW, self._flush)
+    return Task.DEFERRED
+
+  def kill(self, task):
+    """
+    This is called by a bundled task when it is killed. The task is finished
+    if it has been submitted and hasn't finished yet.
+
+    Args:
+      task (ProcessTask or ClusterTask) : the killed task
+    """
+    cancel = None
+    with self._lock:
+      if task in self._pending:
+        self._pending.remove(task)
+      elif task in self._jobs:
+        job = self._jobs.pop(task)
+        del job.live[job.tasks.index(task)]
+        if not job.live:
+          # nothing is left to run
+          job.killed = True
+          cancel = job
+      else:
+        return
+    task.finish(None)
+    if cancel is not None and cancel.job_id is not None:
+      cancel.manager.cluster_backend(self._mode).cancel([cancel.job_id])
+
+  def _flush(self):
+    """
+    This is called by the timer wheel when the window closes to submit the
+    pending tasks
+    """
+    with self._lock:
+      tasks = self._pending
+      self._pending = []
+      jobs = []
+      for job_tasks in self.pack(tasks):
+        self._count += 1
+        job = _BundleJob(self, job_tasks, os.path.abspath(os.path.join(
+          self._directory, 'bundle-{}-{}-{}'.format(
+            os.getpid(), id(self), self._count))))
+        for task in job_tasks:
+          self._jobs[task] = job
+        jobs.append(job)
+    for job in jobs:
+      job.prepare()
+      job.manager.cluster_backend(self._mode).submit(job)
+
+  def _finished(self, job, index):
+    """
+    Removes a task of a job that has finished
+
+    Args:
+      job (_BundleJob) : the job
+      index (int)      : the index of the task in the job
+
+    Returns:
+      (Task) : the task, None if it already finished or was killed
+    """
+    with self._lock:
+      task = job.live.pop(index, None)
+      if task is not None:
+        del self._jobs[task]
+      return task
+
+  def command(self, directory, script):
+    """
+    This builds the command that submits a job.
+
+    Args:
+      directory (str) : the job directory
+      script (str)    : the script running the worker
+
+    Returns:
+      (str) : the full command line
+    """
+    log = shlex.quote(os.path.join(directory, 'worker.log'))
+    name = shlex.quote(os.path.basename(directory))
+    if self._mode == 'sge':
+      cmd = ['qsub', '-terse', '-V', '-b', 'yes', '-cwd', '-N', name,
+             '-o', log, '-e', log]
+      if len(self._queues) > 0:
+        cmd.extend(['-q', ','.join(self._queues)])
+      if len(self._cluster_resources) > 0:
+        cmd.extend(['-l', ','.join(
+          ['{0}={1}'.format(k, v)
+           for k, v in self._cluster_resources.items()])])
+      cmd.extend(self._cluster_options)
+      cmd.extend(['sh', shlex.quote(script)])
+      return ' '.join(cmd)
+
+    if self._mode == 'lsf':
+      cmd = ['bsub', '-J', name, '-n', str(self._parallelism),
+             '-o', log, '-e', log]
+      if len(self._queues) > 0:
+        cmd.extend(['-q', ','.join(self._queues)])
+      if len(self._cluster_resources) > 0:
+        cmd.extend(
+        ['{0} {1}'.format(k, v) for k, v in self._cluster_resources.items()])
+      cmd.extend(self._cluster_options)
+      cmd.extend(['--', 'sh', shlex.quote(script)])
+      return ' '.join(cmd)
+
+    cmd = ['sbatch', '--parsable', '-J', name, '-c', str(self._parallelism),
+           '-o', log, '-e', log]
+    cmd.extend(self._cluster_options)
+    cmd.append(shlex.quote(script))
+    return ' '.join(cmd)
+
+
+class _BundleJob:
+  """
+  A job of a ClusterBundle. It is submitted and tracked by a ClusterBackend
+  like an asynchronous ClusterTask.
+  """
+
+  def __init__(self, bundle, tasks, directory):
+    self.bundle = bundle
+    self.tasks = tasks
+    self.live = dict(enumerate(tasks))  # index -> unfinished task
+    self.manager = tasks[0].manager
+    self.directory = directory
+    self.job_id = None
+    self.killed = False
+    self._offset = 0
+
+  def prepare(self):
+    """
+    Writes the manifest of the tasks and the script that runs the worker
+    """
+    entries = []
+    for task in self.tasks:
+      command = task.command
+      if not isinstance(command, str):
+        command = shlex.join(command)
+      if isinstance(task, ProcessTask):
+        entries.append([command, task.stdout_file, task.stderr_file])
+      else:
+        entries.append([command, task.stdout_file or os.devnull,
+                        task.stderr_file or os.devnull])
+    os.makedirs(self.directory, exist_ok=True)
+    with open(os.path.join(self.directory, MANIFEST_NAME), 'w') as fd:
+      json.dump({'parallelism': self.bundle.parallelism, 'tasks': entries}, fd)
+    with open(os.path.join(self.directory, 'run.sh'), 'w') as fd:
+      fd.write('#!/bin/sh\n'
+               'PYTHONPATH={}${{PYTHONPATH:+:$PYTHONPATH}} exec {} -m '
+               'taskrun.cluster_bundle {}\n'.format(
+                 shlex.quote(_PACKAGE_ROOT), shlex.quote(sys.executable),
+                 shlex.quote(self.directory)))
+
+  def array_key(self):
+    """
+    See ClusterTask.array_key(), jobs are never coalesced
+    """
+    return ('bundle', id(self))
+
+  def describe(self):
+    """
+    See ClusterTask.describe()
+    """
+    return self.bundle.command(self.directory,
+                               os.path.join(self.directory, 'run.sh'))
+
+  def job_submitted(self, job_id, proc):
+    """
+    See ClusterTask.job_submitted()
+    """
+    self.job_id = job_id
+    if job_id is None:
+      self._fail('couldn\'t submit bundle job ({}): {}'.format(
+        proc.returncode, proc.stderr.decode('utf-8', errors='replace')))
+      return True
+    return not self.killed
+
+  def job_progress(self):
+    """
+    This is called by the ClusterBackend at every poll while the job is
+    outstanding. It finishes the tasks whose commands have finished.
+
+    Returns:
+      (bool) : True if any task finished
+    """
+    try:
+      with open(os.path.join(self.directory, STATUS_NAME), 'rb') as fd:
+        fd.seek(self._offset)
+        data = fd.read()
+    except FileNotFoundError:
+      return False
+    # only complete lines are consumed
+    data = data[:data.rfind(b'\n') + 1]
+    self._offset += len(data)
+    progress = False
+    for line in data.decode('utf-8').splitlines():
+      index, returncode = (int(field) for field in line.split())
+      task = self.bundle._finished(self, index)  # pylint: disable=protected-access
+      if task is None:
+        continue
+      progress = True
+      task.bundle_finished(returncode, self._read(index, 'out'),
+                           self._read(index, 'err'))
+    return progress
+
+  def job_finished(self, returncode):
+    """
+    See ClusterTask.job_finished()
+    """
+    self.job_progress()
+    if not self.live:
+      # the job directory is kept to debug lost tasks
+      shutil.rmtree(self.directory, ignore_errors=True)
+    elif returncode is None:
+      self._fail('bundle job {} was lost by the scheduler'.format(self.job_id))
+    else:
+      self._fail('bundle job {} ended ({}) without running the task'.format(
+        self.job_id, returncode))
+
+  def _fail(self, message):
+    """
+    Fails the unfinished tasks
+
+    Args:
+      message (str) : the error
+    """
+    for index in list(self.live):
+      task = self.bundle._finished(self, index)  # pylint: disable=protected-access
+      if task is not None:
+        task.finish(message)
+
+  def _read(self, index, suffix):
+    """
+    Returns:
+      (bytes) : the output captured by the worker, None if none
+    """
+    try:
+      with open(os.path.join(self.directory, '{}.{}'.format(index, suffix)),
+                'rb') as fd:
+        return fd.read()
+    except FileNotFoundError:
+      return None
+
+
+class _StatusObserver(Observer):
+  """
+  This observer of a bundle worker appends the index and return code of every
+  finished task to the status file.
+  """
+
+  def __init__(self, filename):
+    super().__init__()
+    self._fd = open(filename, 'a')
+
+  def _done(self, task):
+    """
+    Records a finished task
+    """
+    # a command that couldn't be started is reported like the shell does
+    returncode = 127 if task.returncode is None else task.returncode
+    self._fd.write('{} {}\n'.format(task.name, returncode))
+    self._fd.flush()
+
+  def task_completed(self, task):
+    """
+    See Observer.task_completed()
+    """
+    self._done(task)
+
+  def task_failed(self, task, errors):
+    """
+    See Observer.task_failed()
+    """
+    self._done(task)
+
+  def task_killed(self, task):
+    """
+    See Observer.task_killed()
+    """
+    self._done(task)
+
+  def run_complete(self):
+    """
+    See Observer.run_complete()
+    """
+    self._fd.close()
+
+
+def main(args=None):
+  """
+  Runs the tasks of a ClusterBundle job
+  """
+  ap = argparse.ArgumentParser(
+    prog='python -m taskrun.cluster_bundle',
+    description='Runs the tasks of a cluster bundle job')
+  ap.add_argument('directory', help='the job directory')
+  args = ap.parse_args(args)
+
+  with open(os.path.join(args.directory, MANIFEST_NAME)) as fd:
+    manifest = json.load(fd)
+  tm = TaskManager(
+    resource_manager=ResourceManager(
+      CounterResource('slots', 1, manifest['parallelism'])),
+    observers=[_StatusObserver(os.path.join(args.directory, STATUS_NAME))],
+    failure_mode='blind_continue')
+  for index, (command, stdout, stderr) in enumerate(manifest['tasks']):
+    task = ProcessTask(tm, str(index), command)
+    task.stdout_file = stdout or os.path.join(args.directory,
+                                              '{}.out'.format(index))
+    task.stderr_file = stderr or os.path.join(args.directory,
+                                              '{}.err'.format(index))
+  return 0 if tm.run_tasks() else 1
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -31,7 +31,11 @@
 import os
 import subprocess
 import re
+import selectors
+import shlex
+import signal
 import threading
+from .failure_mode import FailureMode
 from .task import Task
 
 class ClusterTask(Task):
@@ -39,6 +43,12 @@ class ClusterTask(Task):
   This class is a Task that runs as a cluster process.
   """
 
+  # the job id reported by a synchronous scheduler client, see _communicate()
+  _CLIENT_JOB_ID = {
+    'sge': re.compile(rb'Your job (\d+)'),
+    'lsf': re.compile(rb'Job <(\d+)>'),
+    'slurm': re.compile(rb'(?:jobid|job allocation) (\d+)')}
+
   @staticmethod
   def supported_modes():
     """
@@ -69,6 +79,12 @@ class ClusterTask(Task):
     self.stdout = None
     self.stderr = None
     self.returncode = None
+    self._asynchronous = False
+    self._native_dependencies = False
+    self._bundle = None
+    self._after = {}  # dependency -> job id, see _submit()
+    self.job_id = None
+    self._reattached = False
     self._proc = None
     self._lock = threading.Lock()
 
@@ -90,6 +106,14 @@ class ClusterTask(Task):
     """
     self._command = value
 
+  @property
+  def mode(self):
+    """
+    Returns:
+      (str) : name of cluster scheduler
+    """
+    return self._mode
+
   @property
   def stdout_file(self):
     """
@@ -144,6 +168,88 @@ class ClusterTask(Task):
     """
     self._log_file = filename
 
+  @property
+  def asynchronous(self):
+    """
+    Returns:
+      (bool) : True if the job is submitted without sync and tracked by the
+               manager's ClusterBackend
+    """
+    return self._asynchronous
+
+  @asynchronous.setter
+  def asynchronous(self, value):
+    """
+    Sets whether the job is submitted without sync (qsub -terse, bsub, or
+    sbatch) and tracked by the manager's ClusterBackend instead of blocking a
+    thread and a scheduler client for the life of the job.
+
+    Args:
+      value (bool) : True to submit without sync
+    """
+    self._asynchronous = value
+
+  @property
+  def native_dependencies(self):
+    """
+    Returns:
+      (bool) : True if the job can be submitted before its dependencies finish
+    """
+    return self._native_dependencies
+
+  @native_dependencies.setter
+  def native_dependencies(self, value):
+    """
+    Sets whether the job is submitted as soon as all its unfinished
+    dependencies are asynchronous ClusterTasks of the same scheduler whose jobs
+    have been submitted. The job then waits in the scheduler using its native
+    job dependencies (sbatch --dependency, qsub -hold_jid, or bsub -w) so that
+    the queue waits of a chain of jobs overlap. Only asynchronous tasks without
+    conditions are submitted early. Unless the manager's failure mode is
+    BLIND_CONTINUE, the job is cancelled when a dependency fails.
+
+    Note that the task is running, and its resources and timeout are in use,
+    from when it is submitted.
+
+    Args:
+      value (bool) : True to submit using native dependencies
+    """
+    self._native_dependencies = value
+
+  @property
+  def bundle(self):
+    """
+    Returns:
+      (ClusterBundle) : the bundle running this task, None if submitted alone
+    """
+    return self._bundle
+
+  @bundle.setter
+  def bundle(self, value):
+    """
+    Sets the ClusterBundle that runs this task in a job with other tasks
+    instead of submitting a job for it. The job uses the scheduler settings of
+    the bundle instead of those of this task.
+
+    Args:
+      value (ClusterBundle) : the bundle, None to submit alone
+    """
+    self._bundle = value
+
+  def bundle_finished(self, returncode, stdout, stderr):
+    """
+    This is called by the ClusterBundle when the command has finished
+
+    Args:
+      returncode (int) : the return code
+      stdout (bytes)   : unused, the output is in the stdout file
+      stderr (bytes)   : unused, the output is in the stderr file
+    """
+    # pylint: disable=unused-argument
+    with self._lock:
+      self.returncode = returncode
+    self.finish(returncode or None)
+
   @property
   def queues(self):
     """
@@ -217,9 +323,13 @@ class ClusterTask(Task):
       cmd = ['qsub',
              '-V',            # copy full environment
              '-b', 'yes',     # execute binary file
-             '-sync', 'yes',  # wait for job to complete before exiting
              '-cwd',          # use current working directory
              '-N', self.name] # name of the task
+      if self._asynchronous:
+        cmd.insert(1, '-terse')         # only print the job id
+        cmd.extend(self._dependency_args())
+      else:
+        cmd[1:1] = ['-sync', 'yes']     # wait for job to complete
       if self._stdout_file:
         cmd.extend(['-o', self._stdout_file])
       else:
@@ -240,6 +350,7 @@ class ClusterTask(Task):
     # LSF cluster task
     if self._mode == 'lsf':
       cmd = ['bsub', '-J', self.name] # name of the task
+      cmd.extend(self._dependency_args())
       if self._stdout_file:
         cmd.extend(['-o', self._stdout_file])
       else:
@@ -259,7 +370,11 @@ class ClusterTask(Task):
 
     # Slurm cluster task
     if self._mode == 'slurm':
-      cmd = ['srun', '-vv', '-J', self.name]
+      if self._asynchronous:
+        cmd = ['sbatch', '--parsable', '-J', self.name]
+        cmd.extend(self._dependency_args())
+      else:
+        cmd = ['srun', '-vv', '-J', self.name]
       if self._stdout_file:
         cmd.extend(['-o', self._stdout_file])
       else:
@@ -270,7 +385,10 @@ class ClusterTask(Task):
         cmd.extend(['-e', os.devnull])
       if self._cluster_options:
         cmd.extend(self._cluster_options)
-      cmd.append(self._command)
+      if self._asynchronous:
+        cmd.append('--wrap=' + shlex.quote(self._command))
+      else:
+        cmd.append(self._command)
       return ' '.join(cmd)
 
     assert False, 'programmer error :('
@@ -281,6 +399,11 @@ class ClusterTask(Task):
     See Task.execute()
     """
 
+    if self._bundle is not None:
+      return self._bundle.submit(self)
+    if self._asynchronous:
+      return self._submit()
+
     with self._lock:
       # If we're killed at this point, don't bother starting a new process.
       if self.killed:
@@ -288,18 +411,18 @@ class ClusterTask(Task):
 
       # format stderr output
       if self._log_file:
-        stderr_fd = open(self._log_file, 'w')
+        stderr_fd = open(self._log_file, 'wb')
       else:
-        stderr_fd = subprocess.PIPE
+        stderr_fd = None
 
       # start the command
       cmd = self._build_command()
       self._proc = subprocess.Popen(
-        cmd, stdout=subprocess.PIPE, stderr=stderr_fd, shell=True,
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True,
         start_new_session=True)
 
     # wait for the process to finish, collect output
-    self.stdout, self.stderr = self._proc.communicate()
+    self.stdout, self.stderr = self._communicate(stderr_fd)
     if self.stdout is not None:
       self.stdout = self.stdout.decode('utf-8')
     if self.stderr is not None:
@@ -307,7 +430,6 @@ class ClusterTask(Task):
 
     # close the output file
     if self._log_file:
-      #pylint: disable=maybe-no-member
       stderr_fd.close()
 
     # check the return code
@@ -316,10 +438,398 @@ class ClusterTask(Task):
       return None
     return self.returncode
 
+  def _communicate(self, stderr_fd):
+    """
+    Collects the output of the scheduler client until it exits. The job id is
+    recorded as soon as the client reports it so that a kill cancels the job by
+    id.
+
+    Args:
+      stderr_fd (file) : the binary file receiving stderr, None to collect it
+
+    Returns:
+      (tuple) : stdout (bytes) and stderr (bytes or None when written to the
+                file)
+    """
+    outputs = {self._proc.stdout: [], self._proc.stderr: []}
+    pattern = self._CLIENT_JOB_ID[self._mode]
+    seen = b''
+    with selectors.DefaultSelector() as selector:
+      for pipe in outputs:
+        selector.register(pipe, selectors.EVENT_READ)
+      while selector.get_map():
+        for key, _ in selector.select():
+          data = os.read(key.fd, 65536)
+          if not data:
+            selector.unregister(key.fileobj)
+            key.fileobj.close()
+            continue
+          if key.fileobj is self._proc.stderr and stderr_fd is not None:
+            stderr_fd.write(data)
+          else:
+            outputs[key.fileobj].append(data)
+          if self.job_id is not None:
+            continue
+          seen = seen[-64:] + data
+          match = pattern.search(seen)
+          if match is None:
+            continue
+          with self._lock:
+            self.job_id = match.group(1).decode('utf-8')
+            killed = self.killed
+          if killed:
+            # the kill came before the job id was known
+            self._cancel_jobs(self._mode, [self.job_id])
+    self._proc.wait()
+    stderr = None
+    if stderr_fd is None:
+      stderr = b''.join(outputs[self._proc.stderr])
+    return b''.join(outputs[self._proc.stdout]), stderr
+
+  def _submit(self):
+    """
+    Has the manager's ClusterBackend submit the job without sync, possibly in
+    an array job with other tasks, and track it
+
+    Returns:
+      (None or errors) : Task.DEFERRED when submitted, see Task.execute()
+    """
+    with self._lock:
+      # If we're killed at this point, don't bother submitting.
+      if self.killed:
+        return None
+
+    # the jobs of the dependencies that haven't finished yet, a dependency
+    #  that finishes from here on informs this task with task_done()
+    with self._manager.condition_variable:
+      # pylint: disable=protected-access
+      for dependency in self.get_dependencies():
+        if not dependency._finished:
+          self._after[dependency] = dependency.job_id
+        elif self._stops_for(dependency):
+          # failed while this task was being started
+          self.kill_reason = 'dependency {} failed'.format(dependency.name)
+          self.killed = True
+          return None
+
+    # reattach to the job of a previous manager (see TaskManager.journal)
+    journal = self._manager.journal
+    found = None if journal is None else journal.lookup(self)
+    if found is not None and found[1] in (0, None):
+      job_id, returncode = found
+      with self._lock:
+        if self.killed:
+          return None
+        self.job_id = job_id
+        self.returncode = returncode
+        self._reattached = returncode is None
+      if returncode == 0:
+        # completed while journaled
+        return None
+      self._notify_dependents()
+      self._manager.cluster_backend(self._mode).watch(job_id,
+                                                      self.job_finished)
+      return Task.DEFERRED
+
+    self._manager.cluster_backend(self._mode).submit(self)
+    return Task.DEFERRED
+
+  def ready(self):
+    """
+    See Task.ready()
+    This implementation is also ready when the task uses native dependencies
+    and the jobs of all its unfinished dependencies have been submitted.
+    """
+    if super().ready():
+      return True
+    if not (self._native_dependencies and self._asynchronous) or \
+       self.conditions or self._bundle is not None:
+      return False
+    # pylint: disable=protected-access
+    for dependency in self.get_dependencies():
+      if dependency._finished:
+        continue
+      if not isinstance(dependency, ClusterTask) or \
+         dependency._mode != self._mode or \
+         not dependency._asynchronous or dependency.job_id is None:
+        return False
+    return True
+
+  def task_done(self, task):
+    """
+    See Task.task_done()
+    This implementation cancels the job when it was submitted depending on a
+    dependency that failed.
+    """
+    super().task_done(task)
+    with self._manager.condition_variable:
+      if task not in self._after or not self._stops_for(task):
+        return
+    self.kill_reason = 'dependency {} failed'.format(task.name)
+    self.kill()
+    if not self.killed:
+      # the job already finished
+      self.kill_reason = None
+
+  def _stops_for(self, dependency):
+    """
+    Args:
+      dependency (Task) : a finished dependency
+
+    Returns:
+      (bool) : True if this task must not run because the dependency failed
+    """
+    # pylint: disable=protected-access
+    return (self._manager.failure_mode is not FailureMode.BLIND_CONTINUE and
+            (dependency.killed or dependency._errors is not None))
+
+  def _dependency_args(self):
+    """
+    Returns:
+      (list<str>) : the scheduler arguments that make the job wait for the
+                    jobs of its unfinished dependencies
+    """
+    job_ids = sorted(set(self._after.values()))
+    if not job_ids:
+      return []
+    blind = self._manager.failure_mode is FailureMode.BLIND_CONTINUE
+    if self._mode == 'sge':
+      # SGE holds array elements by their array job, regardless of exit status
+      return ['-hold_jid', ','.join(
+        sorted({re.match(r'\d+', job_id).group(0) for job_id in job_ids}))]
+    if self._mode == 'lsf':
+      condition = 'ended' if blind else 'done'
+      return ['-w', shlex.quote(' && '.join(
+        '{}({})'.format(condition, job_id) for job_id in job_ids))]
+    if blind:
+      return ['--dependency=afterany:' + ':'.join(job_ids)]
+    return ['--dependency=afterok:' + ':'.join(job_ids),
+            '--kill-on-invalid-dep=yes']
+
+  def array_key(self):
+    """
+    Returns:
+      (tuple) : asynchronous tasks with equal keys can be submitted together
+                as an array job
+    """
+    return (self._mode, tuple(sorted(self._queues)),
+            tuple(sorted(self._cluster_resources.items())),
+            tuple(self._cluster_options),
+            tuple(sorted(set(self._after.values()))))
+
+  @staticmethod
+  def array_script(tasks, index):
+    """
+    This builds the script run by each element of an array job.
+
+    Args:
+      tasks (list<ClusterTask>) : the tasks in array index order from 1
+      index (str)               : the environment variable of the array index
+
+    Returns:
+      (str) : the script
+    """
+    lines = ['#!/bin/sh', 'case "${}" in'.format(index)]
+    for idx, task in enumerate(tasks, 1):
+      # pylint: disable=protected-access
+      lines.append('{}) exec sh -c {} >{} 2>{} ;;'.format(
+        idx, shlex.quote(task._command),
+        shlex.quote(task._stdout_file or os.devnull),
+        shlex.quote(task._stderr_file or os.devnull)))
+    lines.append('esac')
+    return '\n'.join(lines) + '\n'
+
+  @staticmethod
+  def array_command(tasks, script):
+    """
+    This builds the command that submits tasks with the same array_key() as
+    one array job.
+
+    Args:
+      tasks (list<ClusterTask>) : the tasks in array index order from 1
+      script (str)              : the script selecting the command of each
+                                  element (see array_script())
+
+    Returns:
+      (str) : the full command line
+    """
+    # pylint: disable=protected-access
+    task = tasks[0]
+    count = len(tasks)
+    name = shlex.quote(task.name)
+    if task._mode == 'sge':
+      cmd = ['qsub', '-terse', '-t', '1-{}'.format(count), '-V', '-b', 'yes',
+             '-cwd', '-N', name, '-o', os.devnull, '-e', os.devnull]
+      cmd.extend(task._dependency_args())
+      if len(task._queues) > 0:
+        cmd.extend(['-q', ','.join(task._queues)])
+      if len(task._cluster_resources) > 0:
+        cmd.extend(['-l', ','.join(
+          ['{0}={1}'.format(k, v)
+           for k, v in task._cluster_resources.items()])])
+      cmd.extend(['sh', shlex.quote(script)])
+      return ' '.join(cmd)
+
+    if task._mode == 'lsf':
+      cmd = ['bsub', '-J', shlex.quote('{}[1-{}]'.format(task.name, count)),
+             '-o', os.devnull, '-e', os.devnull]
+      cmd.extend(task._dependency_args())
+      if len(task._queues) > 0:
+        cmd.extend(['-q', ','.join(task._queues)])
+      if len(task._cluster_resources) > 0:
+        cmd.extend(
+        ['{0} {1}'.format(k, v) for k, v in task._cluster_resources.items()])
+      cmd.extend(['--', 'sh', shlex.quote(script)])
+      return ' '.join(cmd)
+
+    cmd = ['sbatch', '--parsable', '--array=1-{}'.format(count), '-J', name,
+           '-o', os.devnull, '-e', os.devnull]
+    cmd.extend(task._dependency_args())
+    cmd.extend(task._cluster_options)
+    cmd.append(shlex.quote(script))
+    return ' '.join(cmd)
+
+  def job_submitted(self, job_id, proc):
+    """
+    This is called by the ClusterBackend when the job has been submitted
+
+    Args:
+      job_id (str)                       : the id of the job or the array job
+                                           element, None if submission failed
+      proc (subprocess.CompletedProcess) : the submission command
+
+    Returns:
+      (bool) : False if the job must be cancelled as this task was killed
+    """
+    with self._lock:
+      self.stdout = proc.stdout.decode('utf-8')
+      self.stderr = proc.stderr.decode('utf-8')
+      if self._log_file:
+        with open(self._log_file, 'w') as fd:
+          fd.write(self.stderr)
+      self.job_id = job_id
+      killed = self.killed
+    if job_id is not None:
+      if self._manager.journal is not None:
+        self._manager.journal.submitted(self)
+      self._notify_dependents()
+    if job_id is None:
+      self.returncode = proc.returncode
+      if proc.returncode != 0:
+        self.finish(proc.returncode)
+      else:
+        self.finish('no job id in submission output: {}'.format(self.stdout))
+      return True
+    return not killed
+
+  def job_finished(self, returncode):
+    """
+    This is called by the ClusterBackend when the job has finished
+
+    Args:
+      returncode (int) : the return code, None if the job was lost or never
+                         submitted
+    """
+    with self._lock:
+      lost = returncode is None and self._reattached and not self.killed
+      self._reattached = False
+      if lost:
+        # the job of a previous manager is unknown, e.g., purged from the
+        #  accounting, so it is run again
+        self.job_id = None
+      else:
+        self.returncode = returncode
+    if lost:
+      self._manager.cluster_backend(self._mode).submit(self)
+      return
+    if returncode is not None and self._manager.journal is not None:
+      self._manager.journal.finished(self)
+    if returncode is None:
+      self.finish('job {} was lost by the scheduler'.format(self.job_id))
+    else:
+      self.finish(returncode or None)
+
+  def _notify_dependents(self):
+    """
+    Informs the dependents using native dependencies that the job of this
+    task has been submitted, they may be able to submit now
+    """
+    with self._manager.condition_variable:
+      for dependent in self.get_dependents():
+        if isinstance(dependent, ClusterTask) and dependent.ready():
+          self._manager.task_ready(dependent)
+
+  @staticmethod
+  def cancel_command(mode, job_ids):
+    """
+    This builds one command that cancels many scheduler jobs.
+
+    Args:
+      mode (str)          : name of cluster scheduler
+      job_ids (list<str>) : the ids of the jobs or array job elements
+
+    Returns:
+      (list<str>) : the command arguments
+    """
+    if mode == 'sge':
+      return ['qdel', ','.join(job_ids)]
+    if mode == 'lsf':
+      return ['bkill'] + list(job_ids)
+    if mode == 'slurm':
+      return ['scancel'] + list(job_ids)
+    assert False, 'programmer error :('
+    return None
+
+  @classmethod
+  def _cancel_jobs(cls, mode, job_ids):
+    """
+    Cancels scheduler jobs with one command without waiting for it.
+
+    Args:
+      mode (str)          : name of cluster scheduler
+      job_ids (list<str>) : the ids of the jobs or array job elements
+    """
+    if job_ids:
+      subprocess.Popen(cls.cancel_command(mode, job_ids),
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       start_new_session=True)
+
+  @classmethod
+  def kill_all(cls, tasks):
+    """
+    See Task.kill_all()
+    This implementation terminates the process groups of the local scheduler
+    clients then cancels the jobs by id with one command per scheduler without
+    waiting for it.
+    """
+    job_ids = {}
+    for task in tasks:
+      # pylint: disable=protected-access
+      job_id = task._terminate_client()
+      if task._bundle is not None:
+        # a bundled task is finished by its bundle
+        if task.killed:
+          task._bundle.kill(task)
+        continue
+      if job_id is not None:
+        job_ids.setdefault(task._mode, []).append(job_id)
+    for mode, mode_job_ids in job_ids.items():
+      cls._cancel_jobs(mode, mode_job_ids)
+
   def kill(self):
     """
     See Task.kill()
-    This implementation calls Popen.terminate()
+    This implementation terminates the scheduler client and cancels the job in
+    the scheduler by id
+    """
+    self.kill_all([self])
+
+  def _terminate_client(self):
+    """
+    Marks this task killed and terminates the scheduler client
+
+    Returns:
+      (str) : the id of the job to cancel in the scheduler, None if unknown
     """
 
     with self._lock:
@@ -327,8 +837,10 @@ class ClusterTask(Task):
       if self.returncode is None and not self.killed:
         self.killed = True
         # there is a chance the proc hasn't been created yet
-        if self._proc is not None:
+        if not self._asynchronous and self._proc is not None:
           try:
-            self._proc.terminate()
+            os.killpg(self._proc.pid, signal.SIGTERM)
           except ProcessLookupError:
             pass
+        return self.job_id
+    return None
@@ -32,6 +32,7 @@
 import os
 
 from .counter_resource import CounterResource
+from .execution_engine import ExecutionEngine
 from .failure_mode import FailureMode
 from .file_cleanup_observer import FileCleanupObserver
 from .memory_resource import MemoryResource
@@ -50,7 +51,10 @@ def standard_task_manager(
     verbosity=1,
     log_file=None,
     cleanup_files=True,
-    failure_mode='aggressive_fail'):
+    failure_mode='aggressive_fail',
+    engine='thread_per_task',
+    capture_limit=None,
+    capture_raw=False):
   """Creates a standard task manager.
 
   Args:
@@ -64,6 +68,10 @@ def standard_task_manager(
     log_file       (str)  - a file to write log to, None for none
     cleanup_files  (bool) - remove output files of tasks on failure
     failure_mode   (FM)   - failure mode, see failure_mode.py create()
+    engine         (EE)   - execution engine, see execution_engine.py create()
+    capture_limit  (int)  - bytes of each ProcessTask output stream retained,
+                            None for all
+    capture_raw    (bool) - keep ProcessTask output as bytes
 
   Returns:
     task_manager (TaskManager)
@@ -84,14 +92,16 @@ def standard_task_manager(
   resource_manager = ResourceManager(*resources)
 
   return __create_standard_task_manager(
-    resource_manager, verbosity, log_file, cleanup_files, failure_mode)
+    resource_manager, verbosity, log_file, cleanup_files, failure_mode, engine,
+    capture_limit, capture_raw)
 
 
 def basic_task_manager(
     parallelism=1,
     verbosity=1,
     cleanup_files=True,
-    failure_mode='aggressive_fail'):
+    failure_mode='aggressive_fail',
+    engine='thread_per_task'):
   """Creates a task manager that executes tasks with N-way parallelism.
 
   The resource created is called 'slots'. By default each task takes 1 slot.
@@ -101,6 +111,7 @@ def basic_task_manager(
     verbosity      (int)  - 0=off, 1=minimal, 2=full
     cleanup_files  (bool) - remove output files of tasks on failure
     failure_mode   (FM)   - failure mode, see failure_mode.py create()
+    engine         (EE)   - execution engine, see execution_engine.py create()
 
   Returns:
     task_manager (TaskManager)
@@ -113,15 +124,19 @@ def basic_task_manager(
   resources.append(CounterResource('slots', 1, slots))
   resource_manager = ResourceManager(*resources)
   return __create_standard_task_manager(
-    resource_manager, verbosity, None, cleanup_files, failure_mode)
+    resource_manager, verbosity, None, cleanup_files, failure_mode, engine,
+    None, False)
 
 
-def __create_task_manager(rm, obs, fm):
-  return TaskManager(resource_manager=rm, observers=obs, failure_mode=fm)
+def __create_task_manager(rm, obs, fm, engine, capture_limit, capture_raw):
+  return TaskManager(resource_manager=rm, observers=obs, failure_mode=fm,
+                     engine=engine, capture_limit=capture_limit,
+                     capture_raw=capture_raw)
 
 
 def __create_standard_task_manager(rm, verbosity, log_file, cleanup_files,
-                                   failure_mode):
+                                   failure_mode, engine, capture_limit,
+                                   capture_raw):
   observers = []
   if verbosity > 0:
     full_verbosity = verbosity > 1
@@ -136,4 +151,6 @@ def __create_standard_task_manager(rm, verbosity, log_file, cleanup_files,
   if cleanup_files:
     observers.append(FileCleanupObserver())
   failure_mode = FailureMode.create(failure_mode)
-  return __create_task_manager(rm, observers, failure_mode)
+  engine = ExecutionEngine.create(engine)
+  return __create_task_manager(rm, observers, failure_mode, engine,
+                               capture_limit, capture_raw)
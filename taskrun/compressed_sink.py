@@ -0,0 +1,161 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import gzip
+
+# conditionally import the zstd and lz4 packages, it's OK if they don't exist
+try:
+  import zstandard
+except ImportError:
+  zstandard = None
+try:
+  import lz4.frame
+except ImportError:
+  lz4 = None
+
+
+SUFFIXES = {
+  'gzip': '.gz',
+  'zstd': '.zst',
+  'lz4': '.lz4',
+}
+
+
+def compressions():
+  """
+  Returns:
+    (list<str>) : the output compressions available in this environment
+  """
+  available = ['gzip']
+  if zstandard is not None:
+    available.append('zstd')
+  if lz4 is not None:
+    available.append('lz4')
+  return available
+
+
+def compressed_name(filename, compression):
+  """
+  Args:
+    filename (str)    : the name of an output file
+    compression (str) : the compression, None for none
+
+  Returns:
+    (str) : the name of the file written, the compression suffix is appended
+            unless the filename already has it
+  """
+  if compression is None:
+    return filename
+  suffix = SUFFIXES[compression]
+  if filename.endswith(suffix):
+    return filename
+  return filename + suffix
+
+
+class CompressedSink:
+  """
+  This class compresses a stream of output chunks into a file as they are
+  written so that the uncompressed output never touches the disk. Write errors
+  are recorded instead of raised so the reader of the stream keeps draining the
+  pipe of the process.
+  """
+
+  def __init__(self, filename, compression):
+    """
+    Constructs a CompressedSink object and creates the file
+
+    Args:
+      filename (str)    : the name of the file to write
+      compression (str) : one of compressions()
+    """
+    assert compression in compressions(), \
+      'compression {} is not available, use one of {}'.format(
+        compression, compressions())
+    self._filename = filename
+    self._total = 0
+    self._error = None
+    if compression == 'gzip':
+      # all sinks share the supervisor thread, a fast level keeps it ahead of
+      #  chatty processes while logs still compress well
+      self._file = gzip.open(filename, 'wb', compresslevel=1)
+    elif compression == 'zstd':
+      self._file = zstandard.ZstdCompressor().stream_writer(
+        open(filename, 'wb'))
+    else:
+      self._file = lz4.frame.open(filename, 'wb')
+
+  @property
+  def filename(self):
+    """
+    Returns:
+      (str) : the name of the file written
+    """
+    return self._filename
+
+  @property
+  def total(self):
+    """
+    Returns:
+      (int) : the number of uncompressed bytes written
+    """
+    return self._total
+
+  @property
+  def error(self):
+    """
+    Returns:
+      (OSError) : the first error writing the file, None if none
+    """
+    return self._error
+
+  def write(self, chunk):
+    """
+    Compresses a chunk of output into the file
+
+    Args:
+      chunk (bytes) : the output
+    """
+    self._total += len(chunk)
+    if self._error is not None:
+      return
+    try:
+      self._file.write(chunk)
+    except OSError as ex:
+      self._error = ex
+
+  def close(self):
+    """
+    Finishes the compressed stream and closes the file
+    """
+    try:
+      self._file.close()
+    except OSError as ex:
+      if self._error is None:
+        self._error = ex
@@ -63,6 +63,29 @@ class CounterResource(Resource):
     """
     return self._total - self._amount
 
+  def capacity(self):
+    """
+    See Resource.capacity()
+    """
+    if 0 < self.default <= self._total:
+      return max(1, int(self._total / self.default))
+    return max(1, int(self._total))
+
+  def amount(self, task):
+    """
+    See Resource.amount()
+    """
+    uses = task.resource(self.name)
+    if uses is None:
+      uses = self.default
+    return uses
+
+  def available(self):
+    """
+    See Resource.available()
+    """
+    return self._amount
+
   def can_use(self, task):
     """
     See Resource.can_use()
@@ -29,6 +29,7 @@
  * POSSIBILITY OF SUCH DAMAGE.
 """
 import resource
+from .child_action import RLimit
 from .process_task import ProcessTask
 from .resource import Resource
 
@@ -74,9 +75,7 @@ class CpuTimeResource(Resource):
     # enforce CPU time limit on the ProcessTask
     if isinstance(task, ProcessTask):
       assert int(secs) > 0
-      # TODO(nicmcd): use the following when Python subprocess is fixed
-      #task.add_prefunc(lambda: (limit_cputime(secs)))
-      task.command = 'ulimit -t {} && {}'.format(int(secs), task.command)
+      task.add_prefunc(RLimit(resource.RLIMIT_CPU, int(secs), int(secs)))
 
     return True
 
@@ -84,17 +83,3 @@ class CpuTimeResource(Resource):
     """
     See Resource.release()
     """
-
-
-def limit_cputime(secs):
-  """
-  This uses resource.RLIMIT_CPU to limit the amount of CPU time THIS process
-  is able to use. This is intented to be used as a preexec_fn in the
-  subprocess.Popen constructor of taskrun.process_task
-
-  Args:
-    membytes (int) : the number of bytes to be the threshold
-  """
-  limits = resource.getrlimit(resource.RLIMIT_CPU)
-  limits = (secs, limits[1])
-  resource.setrlimit(resource.RLIMIT_CPU, limits)
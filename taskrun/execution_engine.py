@@ -0,0 +1,73 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import enum
+
+
+@enum.unique
+class ExecutionEngine(enum.Enum):
+  """
+  This enum class defines how a TaskManager executes its tasks
+  """
+
+  # Each task is started as its own thread (Task is a threading.Thread)
+  THREAD_PER_TASK = 1
+
+  # Tasks are work items executed by a fixed size pool of worker threads
+  WORKER_POOL = 2
+
+  @staticmethod
+  def create(val):
+    """
+    This function returns an ExecutionEngine object by parsing the input. The
+    input can be an ExecutionEngine, the integer value, or the string value
+
+    Args:
+      val (ExecutionEngine, int, str) : the engine to return in Enum form
+
+    Returns:
+      ExecutionEngine object
+    """
+
+    if isinstance(val, ExecutionEngine):
+      return val
+
+    if isinstance(val, int):
+      return ExecutionEngine(val)
+
+    if isinstance(val, str):
+      if val.lower() == 'thread_per_task':
+        return ExecutionEngine.THREAD_PER_TASK
+      if val.lower() == 'worker_pool':
+        return ExecutionEngine.WORKER_POOL
+      raise ValueError('invalid ExecutionEngine str {0}'.format(val))
+
+    raise TypeError('invalid input type to ExecutionEngine.create(): {0}'
+                    .format(type(val)))
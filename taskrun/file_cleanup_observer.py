@@ -45,9 +45,12 @@ class FileCleanupObserver(Observer):
     See Observer.task_failed()
     """
 
+    # output files of compressed ProcessTasks are written with other names
+    output_files = getattr(task, 'output_files', {})
     for condition in task.conditions:
       if isinstance(condition, (FileHashCondition, FileModificationCondition)):
         for output in condition.outputs:
+          output = output_files.get(output, output)
           if os.path.isfile(output):
             try:
               os.remove(output)
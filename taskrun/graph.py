@@ -0,0 +1,224 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import collections
+
+# pylint: disable=protected-access
+
+
+def topological_sort(tasks):
+  """
+  This performs a Kahn topological sort of the specified tasks considering
+  only the dependencies among them.
+
+  Args:
+    tasks (iterable<Task>) : the tasks to sort
+
+  Returns:
+    (list<Task>, list<Task>) : the tasks in dependency order and the tasks that
+                               couldn't be ordered because they are part of or
+                               depend on a cycle
+  """
+  indegree = {}
+  for task in tasks:
+    indegree[task] = 0
+  for task in indegree:
+    for dependency in task._dependencies:
+      if dependency in indegree:
+        indegree[task] += 1
+
+  visit = collections.deque(task for task, count in indegree.items()
+                            if count == 0)
+  order = []
+  while visit:
+    task = visit.popleft()
+    order.append(task)
+    for dependent in task._dependents:
+      if dependent in indegree:
+        indegree[dependent] -= 1
+        if indegree[dependent] == 0:
+          visit.append(dependent)
+
+  remaining = [task for task, count in indegree.items() if count > 0]
+  return order, remaining
+
+
+def find_cycles(tasks):
+  """
+  This finds the cycles among the specified tasks. One cycle is reported for
+  each strongly connected component (Tarjan's algorithm) since enumerating
+  every elementary cycle is exponential.
+
+  Args:
+    tasks (iterable<Task>) : the tasks to search
+
+  Returns:
+    (list<list<Task>>) : the cycles, each as a list of tasks where each task
+                         depends on the next and the last depends on the first
+  """
+  members = dict.fromkeys(tasks)  # insertion ordered set
+  index = {}
+  lowlink = {}
+  stack = []
+  on_stack = set()
+  components = []
+  counter = 0
+  for root in members:
+    if root in index:
+      continue
+    # iterative Tarjan DFS over dependencies
+    work = [(root, iter(root._dependencies))]
+    index[root] = lowlink[root] = counter
+    counter += 1
+    stack.append(root)
+    on_stack.add(root)
+    while work:
+      task, deps = work[-1]
+      advanced = False
+      for dep in deps:
+        if dep not in members:
+          continue
+        if dep not in index:
+          index[dep] = lowlink[dep] = counter
+          counter += 1
+          stack.append(dep)
+          on_stack.add(dep)
+          work.append((dep, iter(dep._dependencies)))
+          advanced = True
+          break
+        if dep in on_stack:
+          lowlink[task] = min(lowlink[task], index[dep])
+      if advanced:
+        continue
+      work.pop()
+      if work:
+        parent = work[-1][0]
+        lowlink[parent] = min(lowlink[parent], lowlink[task])
+      if lowlink[task] == index[task]:
+        component = []
+        while True:
+          member = stack.pop()
+          on_stack.remove(member)
+          component.append(member)
+          if member is task:
+            break
+        if len(component) > 1 or task in task._dependencies:
+          components.append(component)
+
+  return [_component_cycle(component) for component in components]
+
+
+def _component_cycle(component):
+  """
+  This finds one cycle within a strongly connected component (BFS from one
+  member back to itself).
+
+  Args:
+    component (list<Task>) : the tasks of the component
+
+  Returns:
+    (list<Task>) : the cycle
+  """
+  members = set(component)
+  start = component[-1]
+  parents = {start: None}
+  visit = collections.deque([start])
+  while visit:
+    task = visit.popleft()
+    for dep in task._dependencies:
+      if dep is start:
+        cycle = []
+        while task is not None:
+          cycle.append(task)
+          task = parents[task]
+        cycle.reverse()
+        return cycle
+      if dep in members and dep not in parents:
+        parents[dep] = task
+        visit.append(dep)
+  assert False, 'programmer error, component has no cycle'
+  return None
+
+
+def add_edge(task, dependency):
+  """
+  This maintains a topological order of tasks (the Task._order attribute) as a
+  dependency is added, using the Pearce-Kelly dynamic topological sort. Only
+  the tasks ordered between the two tasks (the affected region) are visited
+  and reordered.
+
+  Args:
+    task (Task)       : the task that will depend on the dependency
+    dependency (Task) : the dependency
+
+  Raises:
+    ValueError : if the dependency would create a cycle
+  """
+  lower = task._order
+  upper = dependency._order
+  if dependency is task:
+    raise ValueError('cyclic dependency found')
+  if upper < lower:
+    return
+
+  # tasks reachable from the task (dependents) that are ordered before the
+  #  dependency, reaching the dependency itself means a cycle
+  forward = []
+  visited = {task}
+  visit = [task]
+  while visit:
+    curr = visit.pop()
+    forward.append(curr)
+    for dependent in curr._dependents:
+      if dependent is dependency:
+        raise ValueError('cyclic dependency found')
+      if dependent._order < upper and dependent not in visited:
+        visited.add(dependent)
+        visit.append(dependent)
+
+  # tasks the dependency depends on that are ordered after the task
+  backward = []
+  visited = {dependency}
+  visit = [dependency]
+  while visit:
+    curr = visit.pop()
+    backward.append(curr)
+    for dep in curr._dependencies:
+      if dep._order > lower and dep not in visited:
+        visited.add(dep)
+        visit.append(dep)
+
+  # reuse the same order slots, backward region first
+  forward.sort(key=lambda t: t._order)
+  backward.sort(key=lambda t: t._order)
+  affected = backward + forward
+  slots = sorted(t._order for t in affected)
+  for slot, curr in zip(slots, affected):
+    curr._order = slot
@@ -0,0 +1,145 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import json
+import os
+import threading
+
+
+class JobJournal:
+  """
+  This class persists the scheduler jobs of asynchronous ClusterTasks in an
+  append-only file of JSON lines so that a restarted TaskManager using the
+  same journal reattaches to the jobs instead of submitting them again.
+
+  A task is identified by its name, scheduler, and command. A line is written
+  when the job of a task is submitted and when it finishes. The journal is
+  flushed after every line so that it survives the death of the manager
+  process, a truncated last line is ignored.
+  """
+
+  def __init__(self, path):
+    """
+    Constructs a JobJournal object, reading the existing journal
+
+    Args:
+      path (str) : the journal file
+    """
+    self._path = path
+    self._lock = threading.Lock()
+    self._fd = None
+    self._records = {}  # task name -> {mode, command, job_id, returncode}
+    if os.path.exists(path):
+      with open(path) as fd:
+        for line in fd:
+          try:
+            record = json.loads(line)
+          except ValueError:
+            continue
+          if 'command' in record:
+            self._records[record['name']] = dict(record, returncode=None)
+          elif record['name'] in self._records:
+            self._records[record['name']].update(record)
+
+  @property
+  def path(self):
+    """
+    Returns:
+      (str) : the journal file
+    """
+    return self._path
+
+  def lookup(self, task):
+    """
+    Args:
+      task (ClusterTask) : an asynchronous ClusterTask
+
+    Returns:
+      (str, int) : the id of the last job of the task and its return code, the
+                   return code is None if it hasn't been seen finishing, None
+                   if the journal has no job for the task
+    """
+    with self._lock:
+      record = self._records.get(task.name)
+    if record is None or record['mode'] != task.mode or \
+       record['command'] != task.command:
+      return None
+    return record['job_id'], record['returncode']
+
+  def submitted(self, task):
+    """
+    Records that the job of a task has been submitted
+
+    Args:
+      task (ClusterTask) : the task, its job_id is set
+    """
+    self._write({'name': task.name, 'mode': task.mode,
+                 'command': task.command, 'job_id': task.job_id})
+
+  def finished(self, task):
+    """
+    Records that the job of a task has finished
+
+    Args:
+      task (ClusterTask) : the task, its job_id and returncode are set
+    """
+    self._write({'name': task.name, 'job_id': task.job_id,
+                 'returncode': task.returncode})
+
+  def close(self):
+    """
+    Closes the journal file, it is reopened by the next record
+    """
+    with self._lock:
+      if self._fd is not None:
+        self._fd.close()
+        self._fd = None
+
+  def _write(self, record):
+    """
+    Appends a record to the journal
+
+    Args:
+      record (dict) : the record
+    """
+    with self._lock:
+      if 'command' in record:
+        self._records[record['name']] = dict(record, returncode=None)
+      elif record['name'] in self._records:
+        self._records[record['name']].update(record)
+      if self._fd is None:
+        self._fd = open(self._path, 'a+')
+        # end a line truncated by the death of a manager
+        if self._fd.tell() > 0:
+          self._fd.seek(self._fd.tell() - 1)
+          if self._fd.read(1) != '\n':
+            self._fd.write('\n')
+      self._fd.write(json.dumps(record) + '\n')
+      self._fd.flush()
@@ -0,0 +1,365 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+
+
+INDEX_NAME = 'index'
+SEGMENT_FORMAT = 'segment-{:05d}.log'
+
+
+class LogContainer:
+  """
+  This class aggregates the output of many tasks into a few append-only
+  segment files instead of a file per task and stream. Output chunks are
+  appended to the current segment with buffered writes and an index records
+  the (task name, stream, segment, offset, length) of every run of consecutive
+  chunks of a stream. A new segment is started when the current one reaches
+  the segment size. The output of a task is read back with LogReader.
+
+  Set ProcessTask.log_container to send a task's output to a container. The
+  index is written when the container is flushed or closed, which makes the
+  output visible to readers. The container must be closed when all tasks
+  writing to it are done.
+  """
+
+  SEGMENT_SIZE_DEFAULT = 1 << 30
+  BUFFER_SIZE_DEFAULT = 1 << 20
+
+  def __init__(self, path, segment_size=SEGMENT_SIZE_DEFAULT,
+               buffer_size=BUFFER_SIZE_DEFAULT):
+    """
+    Constructs a LogContainer object, new segments are added to an existing
+    container
+
+    Args:
+      path (str)         : the directory of the container, created if needed
+      segment_size (int) : the size to start a new segment at
+      buffer_size (int)  : the write buffer size of the segment and index files
+    """
+    os.makedirs(path, exist_ok=True)
+    self._path = path
+    self._segment_size = segment_size
+    self._buffer_size = buffer_size
+    self._lock = threading.Lock()
+    self._index = open(os.path.join(path, INDEX_NAME), 'a',
+                       buffering=buffer_size)
+    self._segment = -1
+    for filename in os.listdir(path):
+      if filename.startswith('segment-'):
+        self._segment = max(self._segment, int(filename[8:13]))
+    self._file = None
+    self._offset = 0
+    self._run = None  # [name, stream, segment, offset, length] being extended
+    self._closed = False
+    self._roll()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  @property
+  def path(self):
+    """
+    Returns:
+      (str) : the directory of the container
+    """
+    return self._path
+
+  def sink(self, name, stream):
+    """
+    Args:
+      name (str)   : the name of the task
+      stream (str) : the name of the stream (e.g., 'stdout')
+
+    Returns:
+      (LogSink) : a sink writing the output of a task's stream to this container
+    """
+    return LogSink(self, name, stream)
+
+  def write(self, name, stream, chunk):
+    """
+    Appends a chunk of output of a task's stream
+
+    Args:
+      name (str)    : the name of the task
+      stream (str)  : the name of the stream
+      chunk (bytes) : the output
+    """
+    if not chunk:
+      return
+    with self._lock:
+      assert not self._closed, 'log container is closed'
+      if self._offset >= self._segment_size:
+        self._end_run()
+        self._roll()
+      run = self._run
+      if run is None or run[0] != name or run[1] != stream:
+        self._end_run()
+        run = self._run = [name, stream, self._segment, self._offset, 0]
+      self._file.write(chunk)
+      self._offset += len(chunk)
+      run[4] += len(chunk)
+
+  def end_stream(self, name, stream):
+    """
+    Ends the output of a task's stream and flushes it to its segment, the index
+    isn't flushed
+
+    Args:
+      name (str)   : the name of the task
+      stream (str) : the name of the stream
+    """
+    with self._lock:
+      if self._closed:
+        return
+      run = self._run
+      if run is not None and run[0] == name and run[1] == stream:
+        self._end_run()
+      self._file.flush()
+
+  def flush(self):
+    """
+    Makes all written output visible to readers
+    """
+    with self._lock:
+      if not self._closed:
+        self._end_run()
+        self._file.flush()
+        self._index.flush()
+
+  def close(self):
+    """
+    Flushes and closes the container
+    """
+    with self._lock:
+      if self._closed:
+        return
+      self._end_run()
+      self._file.close()
+      self._index.close()
+      self._closed = True
+
+  def _end_run(self):
+    """
+    Records the current run of chunks in the index
+
+    WARNING: this method must be called while holding the lock
+    """
+    if self._run is not None:
+      print(json.dumps(self._run), file=self._index)
+      self._run = None
+
+  def _roll(self):
+    """
+    Starts a new segment
+
+    WARNING: this method must be called while holding the lock
+    """
+    if self._file is not None:
+      self._file.close()
+    self._segment += 1
+    self._file = open(
+      os.path.join(self._path, SEGMENT_FORMAT.format(self._segment)), 'wb',
+      buffering=self._buffer_size)
+    self._offset = 0
+
+
+class LogSink:
+  """
+  This class writes the output of one stream of a task to a LogContainer. It
+  records write errors instead of raising them like a CompressedSink.
+  """
+
+  def __init__(self, container, name, stream):
+    """
+    Constructs a LogSink object
+
+    Args:
+      container (LogContainer) : the container written to
+      name (str)               : the name of the task
+      stream (str)             : the name of the stream
+    """
+    self._container = container
+    self._name = name
+    self._stream = stream
+    self._total = 0
+    self._error = None
+
+  @property
+  def filename(self):
+    """
+    Returns:
+      (str) : the directory of the container written to
+    """
+    return self._container.path
+
+  @property
+  def total(self):
+    """
+    Returns:
+      (int) : the number of bytes written
+    """
+    return self._total
+
+  @property
+  def error(self):
+    """
+    Returns:
+      (OSError) : the first error writing the container, None if none
+    """
+    return self._error
+
+  def write(self, chunk):
+    """
+    Appends a chunk of output to the container
+
+    Args:
+      chunk (bytes) : the output
+    """
+    self._total += len(chunk)
+    if self._error is not None:
+      return
+    try:
+      self._container.write(self._name, self._stream, chunk)
+    except OSError as ex:
+      self._error = ex
+
+  def close(self):
+    """
+    Ends the output of the stream, it is visible to readers once the container
+    is flushed or closed
+    """
+    try:
+      self._container.end_stream(self._name, self._stream)
+    except OSError as ex:
+      if self._error is None:
+        self._error = ex
+
+
+class LogReader:
+  """
+  This class reads the output of tasks from a LogContainer directory
+  """
+
+  def __init__(self, path):
+    """
+    Constructs a LogReader object by loading the index of a container
+
+    Args:
+      path (str) : the directory of the container
+    """
+    self._path = path
+    self._runs = {}  # (name, stream) -> [(segment, offset, length), ...]
+    with open(os.path.join(path, INDEX_NAME)) as fd:
+      for line in fd:
+        if not line.endswith('\n'):
+          break  # partially written by a running container
+        name, stream, segment, offset, length = json.loads(line)
+        self._runs.setdefault((name, stream), []).append(
+          (segment, offset, length))
+
+  def names(self):
+    """
+    Returns:
+      (list<str>) : the names of the tasks in the container
+    """
+    return list(dict.fromkeys(name for name, _ in self._runs))
+
+  def streams(self, name):
+    """
+    Args:
+      name (str) : the name of the task
+
+    Returns:
+      (list<str>) : the names of the streams of a task in the container
+    """
+    return [stream for task, stream in self._runs if task == name]
+
+  def read(self, name, stream='stdout'):
+    """
+    Args:
+      name (str)   : the name of the task
+      stream (str) : the name of the stream
+
+    Returns:
+      (bytes) : the output of a task's stream, empty if none
+    """
+    data = []
+    fds = {}
+    try:
+      for segment, offset, length in self._runs.get((name, stream), ()):
+        if segment not in fds:
+          fds[segment] = open(os.path.join(
+            self._path, SEGMENT_FORMAT.format(segment)), 'rb')
+        fds[segment].seek(offset)
+        data.append(fds[segment].read(length))
+    finally:
+      for fd in fds.values():
+        fd.close()
+    return b''.join(data)
+
+
+def main(args=None):
+  """
+  Prints the output of a task from a LogContainer, or lists the tasks in it
+  """
+  ap = argparse.ArgumentParser(
+    prog='python -m taskrun.log_container',
+    description='Extracts the output of a task from a log container')
+  ap.add_argument('path', help='the log container directory')
+  ap.add_argument('name', nargs='?',
+                  help='the task name, lists the tasks if not given')
+  ap.add_argument('-s', '--stream', default='stdout',
+                  help='the stream to extract (default: stdout)')
+  args = ap.parse_args(args)
+
+  reader = LogReader(args.path)
+  if args.name is None:
+    for name in reader.names():
+      print(name)
+    return 0
+  if args.stream not in reader.streams(args.name):
+    print('{} has no {} in {}'.format(args.name, args.stream, args.path),
+          file=sys.stderr)
+    return 1
+  sys.stdout.buffer.write(reader.read(args.name, args.stream))
+  sys.stdout.flush()
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
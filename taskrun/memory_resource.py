@@ -30,6 +30,7 @@
 """
 import resource
 import psutil
+from .child_action import RLimit
 from .process_task import ProcessTask
 from .counter_resource import CounterResource
 
@@ -46,11 +47,8 @@ class MemoryResource(CounterResource):
     # if this is a ProcessTask, enforce memory limit
     if isinstance(task, ProcessTask):
       assert uses > 0.0, 'ProcessTasks must use some memory!'
-      # TODO(nicmcd): use the following when Python subprocess is fixed
-      #membytes = int(uses * 1024 * 1024 * 1024)
-      #task.add_prefunc(lambda: (limit_mem(membytes)))
-      memkbytes = int(uses * 1024 * 1024)
-      task.command = 'ulimit -v {} && {}'.format(memkbytes, task.command)
+      membytes = int(uses * 1024 * 1024) * 1024
+      task.add_prefunc(RLimit(resource.RLIMIT_AS, membytes, membytes))
 
   def current_available_memory_gib():
     """
@@ -61,16 +59,3 @@ class MemoryResource(CounterResource):
       (float) : amount of available memory in GiB
     """
     return psutil.virtual_memory().available / (1024 * 1024 * 1024)
-
-def limit_mem(membytes):
-  """
-  This uses resource.RLIMIT_AS to limit the amount of address space THIS process
-  is able to use. This is intented to be used as a preexec_fn in the
-  subprocess.Popen constructor of taskrun.process_task
-
-  Args:
-    membytes (int) : the number of bytes to be the threshold
-  """
-  limits = resource.getrlimit(resource.RLIMIT_AS)
-  limits = (membytes, limits[1])
-  resource.setrlimit(resource.RLIMIT_AS, limits)
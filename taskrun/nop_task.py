@@ -60,6 +60,12 @@ class NopTask(Task):
     """
     self._done = True
 
+  async def execute_async(self):
+    """
+    See Task.execute_async()
+    """
+    self.execute()
+
   def kill(self):
     """
     See Task.kill()
@@ -85,6 +85,27 @@ class Observer:
       task (Task): the task that failed
     """
 
+  def task_output(self, task, stream, chunk):
+    """
+    Notification of output produced by a running ProcessTask. Output is
+    delivered in batches while the process runs and all of it is delivered
+    before the task finishes. This is only called when wants_output() returns
+    True.
+
+    Args:
+      task (Task): the task that produced the output
+      stream (str): 'stdout' or 'stderr'
+      chunk (bytes): the output, not aligned to line boundaries
+    """
+
+  def wants_output(self):
+    """
+    Returns:
+      (bool) : True if this observer wants task_output() notifications, by
+               default when task_output() is overridden
+    """
+    return type(self).task_output is not Observer.task_output
+
   def run_starting(self):
     """
     Notification of run starting
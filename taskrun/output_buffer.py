@@ -0,0 +1,115 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import collections
+
+
+class OutputBuffer:
+  """
+  This class captures a stream of output chunks. When bounded only the last
+  'limit' bytes are retained like a ring buffer while all bytes are counted.
+  """
+
+  def __init__(self, limit=None):
+    """
+    Constructs an OutputBuffer object
+
+    Args:
+      limit (int) : the maximum number of bytes retained, None for unbounded
+    """
+    assert limit is None or (isinstance(limit, int) and limit >= 0), \
+      'limit must be None or an int >= 0, {} is not'.format(limit)
+    self._limit = limit
+    self._chunks = collections.deque()
+    self._size = 0
+    self._total = 0
+
+  @property
+  def limit(self):
+    """
+    Returns:
+      (int) : the maximum number of bytes retained, None for unbounded
+    """
+    return self._limit
+
+  @property
+  def total(self):
+    """
+    Returns:
+      (int) : the number of bytes written
+    """
+    return self._total
+
+  @property
+  def truncated(self):
+    """
+    Returns:
+      (bool) : True if written bytes have been dropped
+    """
+    return self._limit is not None and self._total > self._limit
+
+  def write(self, chunk):
+    """
+    Appends a chunk of output, dropping the oldest bytes beyond the limit
+
+    Args:
+      chunk (bytes) : the output
+    """
+    self._total += len(chunk)
+    if self._limit is not None:
+      if len(chunk) >= self._limit:
+        self._chunks.clear()
+        self._size = 0
+        chunk = chunk[len(chunk) - self._limit:]
+      else:
+        # drop whole chunks that are no longer needed
+        while (self._chunks and
+               self._size + len(chunk) - len(self._chunks[0]) >= self._limit):
+          self._size -= len(self._chunks.popleft())
+    if chunk:
+      self._chunks.append(chunk)
+      self._size += len(chunk)
+
+  def getvalue(self):
+    """
+    Returns:
+      (bytes) : the retained output
+    """
+    data = b''.join(self._chunks)
+    if self._limit is not None and len(data) > self._limit:
+      data = data[len(data) - self._limit:]
+    return data
+
+  def text(self):
+    """
+    Returns:
+      (str) : the retained output decoded as UTF-8, invalid bytes are replaced
+    """
+    return self.getvalue().decode('utf-8', errors='replace')
@@ -0,0 +1,118 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import asyncio
+import concurrent.futures
+import threading
+from .function_task import FunctionTask
+
+
+class ProcessPoolFunctionTask(FunctionTask):
+  """
+  This class is a FunctionTask that runs the function call in the task
+  manager's process pool (see TaskManager.process_pool()). This allows CPU
+  bound Python functions to run in parallel. The function, its arguments, and
+  its return value must be picklable.
+  """
+
+  def __init__(self, manager, name, func, *args, **kwargs):
+    """
+    This instiates a ProcessPoolFunctionTask object with a function and
+    arguments
+
+    Args:
+      manager (TaskManager) : passed to Task.__init__()
+      name (str)            : passed to Task.__init__()
+      func (function)       : the function to be executed
+      *args                 : passed to func when executed
+      **kwargs              : passed to func when executed
+    """
+
+    super().__init__(manager, name, func, *args, **kwargs)
+    self._future = None
+    self._lock = threading.Lock()
+
+  def _submit(self):
+    """
+    Submits the function call to the process pool
+
+    Returns:
+      (concurrent.futures.Future) : the future result, None if killed
+    """
+    with self._lock:
+      if self.killed:
+        return None
+      self._future = self._manager.process_pool().submit(
+        self._func, *self._args, **self._kwargs)
+      return self._future
+
+  def _result(self, future):
+    """
+    Returns:
+      (None or errors) : the errors of the function call like FunctionTask
+    """
+    try:
+      res = future.result()
+    except concurrent.futures.CancelledError:
+      return None
+    if res == 0:
+      res = None
+    return res
+
+  def execute(self):
+    """
+    See Task.execute()
+    """
+
+    future = self._submit()
+    if future is None:
+      return None
+    return self._result(future)
+
+  async def execute_async(self):
+    """
+    See Task.execute_async()
+    """
+
+    future = self._submit()
+    if future is None:
+      return None
+    await asyncio.wait([asyncio.wrap_future(future)])
+    return self._result(future)
+
+  def kill(self):
+    """
+    See Task.kill()
+    This implementation can only cancel the function call before it has
+    started in the process pool.
+    """
+    with self._lock:
+      if self._future is None or self._future.cancel():
+        self.killed = True
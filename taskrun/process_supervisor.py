@@ -0,0 +1,297 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import os
+import selectors
+import threading
+import time
+import traceback
+from .output_buffer import OutputBuffer
+
+
+class _Child:
+  """
+  The state of one supervised child process
+  """
+
+  def __init__(self, proc, callback, stdout, stderr, listener):
+    self.proc = proc
+    self.callback = callback
+    self.listener = listener
+    self.pending = {}  # stream name -> [chunk, ...]
+    self.deadline = None
+    self.pidfd = None
+    self.status = None
+    self.usage = None
+    self.streams = {}  # fd -> (name, file, OutputBuffer)
+    self.stdout = None
+    self.stderr = None
+    if proc.stdout is not None:
+      self.stdout = stdout if stdout is not None else OutputBuffer()
+      self.streams[proc.stdout.fileno()] = ('stdout', proc.stdout,
+                                            self.stdout)
+    if proc.stderr is not None:
+      self.stderr = stderr if stderr is not None else OutputBuffer()
+      self.streams[proc.stderr.fileno()] = ('stderr', proc.stderr,
+                                            self.stderr)
+
+  def done(self):
+    """
+    Returns:
+      (bool) : True when the child has been reaped and all output is read
+    """
+    return self.status is not None and not self.streams
+
+  def result(self):
+    """
+    Returns:
+      (int, OutputBuffer, OutputBuffer, resource.struct_rusage) : the return
+        code, stdout, stderr, and resource usage of the child
+    """
+    return (os.waitstatus_to_exitcode(self.status), self.stdout, self.stderr,
+            self.usage)
+
+  def flush(self):
+    """
+    Delivers the pending output chunks to the listener, one call per stream
+    """
+    pending = self.pending
+    self.pending = {}
+    self.deadline = None
+    for name, chunks in pending.items():
+      try:
+        self.listener(name, b''.join(chunks))
+      except Exception:  # pylint: disable=broad-except
+        # a broken listener must not stop the supervision
+        traceback.print_exc()
+
+
+class ProcessSupervisor:
+  """
+  This class watches child processes from a single thread instead of blocking
+  a thread per child in Popen.communicate(). The output pipes and exit of each
+  child are multiplexed with a selector. Child exits are detected by polling
+  a pidfd (Linux) and otherwise by polling wait4(WNOHANG). Children are reaped
+  with wait4() so their resource usage comes for free with their exit status.
+
+  Output can also be delivered live to a listener. Chunks read within
+  OUTPUT_INTERVAL of each other are batched into one call per stream so that
+  very chatty children cost a bounded number of listener calls.
+  """
+
+  POLL_INTERVAL = 0.005
+  OUTPUT_INTERVAL = 0.05
+
+  def __init__(self):
+    """
+    Constructs a ProcessSupervisor object
+    """
+    self._selector = selectors.DefaultSelector()
+    self._lock = threading.Lock()
+    self._added = []
+    self._children = {}  # pid -> _Child
+    self._polled = set()  # pids without a pidfd
+    self._stop = False
+    self._wakeup_read, self._wakeup_write = os.pipe()
+    os.set_blocking(self._wakeup_read, False)
+    os.set_blocking(self._wakeup_write, False)
+    self._selector.register(self._wakeup_read, selectors.EVENT_READ, None)
+    self._thread = threading.Thread(target=self._loop, daemon=True,
+                                    name='taskrun-supervisor')
+    self._thread.start()
+
+  @property
+  def children(self):
+    """
+    Returns:
+      (int) : the number of children being supervised
+    """
+    with self._lock:
+      return len(self._children) + len(self._added)
+
+  def watch(self, proc, callback, stdout=None, stderr=None, listener=None):
+    """
+    Supervises a child process until it has exited and its output pipes are
+    closed.
+
+    Args:
+      proc (subprocess.Popen) : the child process, its stdout and stderr are
+                                read if they are pipes
+      callback (callable)     : called on the supervisor thread as
+                                callback(returncode, stdout, stderr, usage)
+                                with the OutputBuffers of the pipes (None if
+                                not pipes) and the resource.struct_rusage of
+                                the child
+      stdout (OutputBuffer)   : captures stdout, None for unbounded
+      stderr (OutputBuffer)   : captures stderr, None for unbounded
+      listener (callable)     : if given, called on the supervisor thread as
+                                listener(stream, chunk) while the child runs
+                                where stream is 'stdout' or 'stderr' and
+                                chunk is the batched bytes read. All output is
+                                delivered before the callback is called.
+    """
+    with self._lock:
+      assert not self._stop, 'supervisor is shut down'
+      self._added.append(_Child(proc, callback, stdout, stderr, listener))
+    self._wake()
+
+  def shutdown(self):
+    """
+    Stops the supervisor thread. All children must have finished.
+    """
+    with self._lock:
+      self._stop = True
+    self._wake()
+    self._thread.join()
+    self._selector.close()
+    os.close(self._wakeup_read)
+    os.close(self._wakeup_write)
+
+  def _wake(self):
+    """
+    Wakes up the supervisor thread
+    """
+    try:
+      os.write(self._wakeup_write, b'\0')
+    except BlockingIOError:
+      pass  # already has a pending wake up
+
+  def _register(self, child):
+    """
+    Starts watching a newly added child
+    """
+    self._children[child.proc.pid] = child
+    for fd in child.streams:
+      os.set_blocking(fd, False)
+      self._selector.register(fd, selectors.EVENT_READ, child)
+    try:
+      child.pidfd = os.pidfd_open(child.proc.pid)
+    except (AttributeError, OSError):
+      self._polled.add(child.proc.pid)
+    else:
+      self._selector.register(child.pidfd, selectors.EVENT_READ, child)
+
+  def _read(self, child, fd):
+    """
+    Reads available output from a child's pipe
+    """
+    name, stream, output = child.streams[fd]
+    try:
+      chunk = os.read(fd, 65536)
+    except BlockingIOError:
+      return
+    if chunk:
+      output.write(chunk)
+      if child.listener is not None:
+        child.pending.setdefault(name, []).append(chunk)
+        if child.deadline is None:
+          child.deadline = time.monotonic() + self.OUTPUT_INTERVAL
+    else:
+      self._selector.unregister(fd)
+      del child.streams[fd]
+      stream.close()
+
+  def _reap(self, child):
+    """
+    Collects the exit status of a child if it has exited
+
+    Returns:
+      (bool) : True if the child was reaped
+    """
+    pid, status, usage = os.wait4(child.proc.pid, os.WNOHANG)
+    if pid == 0:
+      return False
+    child.status = status
+    child.usage = usage
+    child.proc.returncode = os.waitstatus_to_exitcode(status)
+    if child.pidfd is not None:
+      self._selector.unregister(child.pidfd)
+      os.close(child.pidfd)
+      child.pidfd = None
+    self._polled.discard(child.proc.pid)
+    return True
+
+  def _loop(self):
+    """
+    This is the main loop of the supervisor thread
+    """
+    while True:
+      with self._lock:
+        added = self._added
+        self._added = []
+        stop = self._stop and not self._children and not added
+      if stop:
+        return
+      for child in added:
+        self._register(child)
+
+      # wait for output, exits, or new children
+      timeout = self.POLL_INTERVAL if self._polled else None
+      deadlines = [child.deadline for child in self._children.values()
+                   if child.deadline is not None]
+      if deadlines:
+        wait = max(0.0, min(deadlines) - time.monotonic())
+        timeout = wait if timeout is None else min(timeout, wait)
+      finished = []
+      for key, _ in self._selector.select(timeout):
+        child = key.data
+        if child is None:
+          try:
+            os.read(self._wakeup_read, 4096)
+          except BlockingIOError:
+            pass
+        elif key.fd == child.pidfd:
+          self._reap(child)
+        elif key.fd in child.streams:
+          self._read(child, key.fd)
+        if child is not None and child.done():
+          finished.append(child)
+      for pid in list(self._polled):
+        child = self._children[pid]
+        if self._reap(child) and child.done():
+          finished.append(child)
+
+      # deliver the batched output that is due
+      now = time.monotonic()
+      for child in self._children.values():
+        if child.deadline is not None and child.deadline <= now:
+          child.flush()
+
+      # report the finished children
+      for child in dict.fromkeys(finished):
+        if self._children.pop(child.proc.pid, None) is None:
+          continue
+        if child.pending:
+          child.flush()
+        try:
+          child.callback(*child.result())
+        except Exception:  # pylint: disable=broad-except
+          # keep supervising the other children
+          traceback.print_exc()
@@ -28,16 +28,30 @@
  * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
  * POSSIBILITY OF SUCH DAMAGE.
 """
+import asyncio
+import functools
 import os
+import shlex
 import signal
 import subprocess
 import threading
+from .child_action import ChildAction
+from .child_action import RLimit
+from .compressed_sink import CompressedSink
+from .compressed_sink import compressed_name
+from .compressed_sink import compressions
+from .output_buffer import OutputBuffer
+from .spawn import spawn
 from .task import Task
 
 
 class ProcessTask(Task):
   """
   This class is a Task that runs as a subprocess
+
+  When the process finishes, its returncode and usage (the
+  resource.struct_rusage reported by wait4() including the waited for
+  descendants of the process) are set before the observers are notified.
   """
 
   def __init__(self, manager, name, command=None):
@@ -47,24 +61,33 @@ class ProcessTask(Task):
     Args:
       manager (TaskManager) : passed to Task.__init__()
       name (str)            : passed to Task.__init__()
-      command (str)         : the command to be run
+      command (str or list) : the command to be run by the shell, or a list of
+                              the program and its arguments to be run directly
     """
     super().__init__(manager, name)
     self._command = command
     self._stdout_file = None
     self._stderr_file = None
+    self._output_compression = None
+    self._log_container = None
+    self._bundle = None
     self.stdout = None
     self.stderr = None
+    self.stdout_capture = None
+    self.stderr_capture = None
     self.returncode = None
+    self.usage = None
+    self._capture_limit = manager.capture_limit
+    self._capture_raw = manager.capture_raw
     self._proc = None
-    self._prefuncs = []
+    self._prefuncs = {}  # ChildAction.key -> ChildAction
     self._lock = threading.Lock()
 
   @property
   def command(self):
     """
     Returns:
-      (str) : the process's command
+      (str or list) : the process's command
     """
     return self._command
 
@@ -74,7 +97,7 @@ class ProcessTask(Task):
     Sets the process's command
 
     Args:
-      value (str) : the new command
+      value (str or list) : the new command
     """
     self._command = value
 
@@ -114,17 +137,184 @@ class ProcessTask(Task):
     """
     self._stderr_file = filename
 
+  @property
+  def output_compression(self):
+    """
+    Returns:
+      (str) : the compression of the output files, None for uncompressed
+    """
+    return self._output_compression
+
+  @output_compression.setter
+  def output_compression(self, value):
+    """
+    Sets the compression of the output files. The output is piped from the
+    process and compressed by the manager's ProcessSupervisor as it is produced.
+    The compression suffix is appended to filenames that don't have it (see
+    output_files).
+
+    Args:
+      value (str) : one of 'gzip', 'zstd', or 'lz4' if importable, None for
+                    uncompressed
+    """
+    assert value is None or value in compressions(), \
+      'output_compression must be None or one of {}, {} is not'.format(
+        compressions(), value)
+    self._output_compression = value
+
+  @property
+  def log_container(self):
+    """
+    Returns:
+      (LogContainer) : the container of the output not written to files, None
+                       if captured
+    """
+    return self._log_container
+
+  @log_container.setter
+  def log_container(self, container):
+    """
+    Sets the LogContainer the stdout and stderr are written to when not written
+    to files. This avoids creating files per task for large sweeps.
+
+    Args:
+      container (LogContainer) : the container, None to capture the output
+    """
+    self._log_container = container
+
+  @property
+  def output_files(self):
+    """
+    Returns:
+      (dict<str,str>) : the stdout and stderr filenames mapped to the names of
+                        the files actually written
+    """
+    files = {}
+    for filename in (self._stdout_file, self._stderr_file):
+      if filename and filename.lower() != 'stdout':
+        files[filename] = compressed_name(filename, self._output_compression)
+    return files
+
+  @property
+  def capture_limit(self):
+    """
+    Returns:
+      (int) : the maximum number of bytes of stdout and stderr retained each
+              when not written to files, None for unbounded
+    """
+    return self._capture_limit
+
+  @capture_limit.setter
+  def capture_limit(self, value):
+    """
+    Sets the maximum number of bytes of stdout and stderr retained, only the
+    last bytes of output are kept (see OutputBuffer)
+
+    Args:
+      value (int) : the limit, None for unbounded
+    """
+    assert value is None or (isinstance(value, int) and value >= 0), \
+      'capture_limit must be None or an int >= 0, {} is not'.format(value)
+    self._capture_limit = value
+
+  @property
+  def capture_raw(self):
+    """
+    Returns:
+      (bool) : True if stdout and stderr are kept as bytes instead of decoded
+    """
+    return self._capture_raw
+
+  @capture_raw.setter
+  def capture_raw(self, value):
+    """
+    Sets whether stdout and stderr are kept as bytes instead of being decoded
+    as UTF-8
+
+    Args:
+      value (bool) : True to keep bytes
+    """
+    self._capture_raw = value
+
+  @property
+  def rlimits(self):
+    """
+    Returns:
+      (dict<int,int>) : the soft resource limits (resource.RLIMIT_*) of the
+                        process
+    """
+    return {action.limit: action.soft for action in self._prefuncs.values()
+            if isinstance(action, RLimit)}
+
+  def set_rlimit(self, limit, soft):
+    """
+    Sets a soft resource limit applied in the child process before it executes
+
+    Args:
+      limit (int) : the resource (resource.RLIMIT_*)
+      soft (int)  : the soft limit
+    """
+    self.add_prefunc(RLimit(limit, soft))
+
+  @property
+  def prefuncs(self):
+    """
+    Returns:
+      (list<ChildAction>) : the setup actions of the child process
+    """
+    return list(self._prefuncs.values())
+
   def add_prefunc(self, func):
     """
-    Adds a function (any callable) to be executed after the fork before the exec
+    Adds a setup action to be applied in the child process after the fork
+    before the exec. It replaces an existing action of the same kind (or of the
+    same resource for RLimit). Only the declarative actions in child_action.py
+    are supported as running arbitrary Python code in the child isn't safe.
 
     Args:
-      func (callable) : a callable to be executed
+      func (ChildAction) : the action to be applied
     """
-    # TODO(nicmcd): when will preexec_fn be supported?
-    raise NotImplementedError('ProcessTask does not yet support pre-execution '
-                              'functions due to Python subprocess limitations.')
-    #self._prefuncs.append(func)
+    if not isinstance(func, ChildAction):
+      raise TypeError('ProcessTask pre-execution functions must be '
+                      'ChildActions, not {}'.format(type(func).__name__))
+    self._prefuncs[func.key] = func
+
+  @property
+  def bundle(self):
+    """
+    Returns:
+      (ClusterBundle) : the bundle running this task, None if run locally
+    """
+    return self._bundle
+
+  @bundle.setter
+  def bundle(self, value):
+    """
+    Sets the ClusterBundle that runs this task in a cluster job instead of
+    running it locally. Setup actions, output compression, and the log
+    container are not used in bundles.
+
+    Args:
+      value (ClusterBundle) : the bundle, None to run locally
+    """
+    self._bundle = value
+
+  def bundle_finished(self, returncode, stdout, stderr):
+    """
+    This is called by the ClusterBundle when the command has finished
+
+    Args:
+      returncode (int) : the return code
+      stdout (bytes)   : the captured stdout, None if not captured
+      stderr (bytes)   : the captured stderr, None if not captured
+    """
+    def capture(data):
+      if data is None:
+        return None
+      buffer = OutputBuffer(self._capture_limit)
+      buffer.write(data)
+      return buffer
+    self.finish(self._collect(capture(stdout), capture(stderr), returncode))
 
   def describe(self):
     """
@@ -132,71 +322,187 @@ class ProcessTask(Task):
     """
 
     text = self._command
+    if not isinstance(text, str):
+      text = shlex.join(text)
+    files = self.output_files
     if self._stdout_file:
-      text += " 1> " + self._stdout_file
+      text += " 1> " + files[self._stdout_file]
+    elif self._log_container is not None:
+      text += " 1> " + self._log_container.path
     if self._stderr_file:
-      text += " 2> " + self._stderr_file
+      text += " 2> " + files.get(self._stderr_file, self._stderr_file)
+    elif self._log_container is not None:
+      text += " 2> " + self._log_container.path
     return text
 
-  def execute(self):
+  def _open_outputs(self):
     """
-    See Task.execute()
+    Returns:
+      (file or int, file or int, dict<str,sink>) : the stdout and stderr for
+        the process, and the sinks (CompressedSink or LogSink) of the
+        compressed output files and log container by stream name which are
+        fed from pipes
+    """
+    sinks = {}
+    compression = self._output_compression
+    container = self._log_container
+    if not self._stdout_file:
+      stdout_fd = subprocess.PIPE
+      if container is not None:
+        sinks['stdout'] = container.sink(self.name, 'stdout')
+    elif compression:
+      stdout_fd = subprocess.PIPE
+      sinks['stdout'] = CompressedSink(
+        compressed_name(self._stdout_file, compression), compression)
+    else:
+      stdout_fd = open(self._stdout_file, 'w')
+    if self._stderr_file:
+      if self._stderr_file.lower() == 'stdout':
+        stderr_fd = subprocess.STDOUT
+      elif self._stderr_file == self._stdout_file:
+        stderr_fd = subprocess.STDOUT if compression else stdout_fd
+      elif compression:
+        stderr_fd = subprocess.PIPE
+        sinks['stderr'] = CompressedSink(
+          compressed_name(self._stderr_file, compression), compression)
+      else:
+        stderr_fd = open(self._stderr_file, 'w')
+    else:
+      stderr_fd = subprocess.PIPE
+      if container is not None:
+        sinks['stderr'] = container.sink(self.name, 'stderr')
+    return stdout_fd, stderr_fd, sinks
+
+  @staticmethod
+  def _close_outputs(stdout_fd, stderr_fd):
+    """
+    Closes the output files opened by _open_outputs()
+    """
+    for fd in (stdout_fd, stderr_fd):
+      if not isinstance(fd, int):
+        #pylint: disable=maybe-no-member
+        fd.close()
+
+  def _collect(self, stdout, stderr, returncode):
+    """
+    Records the output and return code of the finished process
+
+    Args:
+      stdout (OutputBuffer) : the captured stdout, None if not captured
+      stderr (OutputBuffer) : the captured stderr, None if not captured
+      returncode (int)      : the return code
+
+    Returns:
+      (None or int) : None for success, the return code on failure
+    """
+    self.stdout_capture = stdout
+    self.stderr_capture = stderr
+    def output(capture):
+      if capture is None:
+        return None
+      if self._capture_raw:
+        return capture.getvalue()
+      return capture.text()
+    self.stdout = output(stdout)
+    self.stderr = output(stderr)
+
+    # get the return code
+    #with self._lock:
+    self.returncode = returncode
+
+    # check the return code
+    if self.returncode == 0:
+      return None
+    return self.returncode
+
+  def _launch(self, callback):
     """
+    Starts the process and has the manager's supervisor watch it
+
+    Args:
+      callback (callable) : called with the errors when the process finishes
 
+    Returns:
+      (bool) : True if started, False if already killed
+    """
     with self._lock:
       # If we're killed at this point, don't bother starting a new process.
       if self.killed:
         print('already killed {}'.format(self.name))
-        return None
+        return False
 
       # format stdout and stderr outputs
-      if self._stdout_file:
-        stdout_fd = open(self._stdout_file, 'w')
-      else:
-        stdout_fd = subprocess.PIPE
-      if self._stderr_file:
-        if self._stderr_file.lower() == 'stdout':
-          stderr_fd = subprocess.STDOUT
-        elif self._stderr_file == self._stdout_file:
-          stderr_fd = stdout_fd
-        else:
-          stderr_fd = open(self._stderr_file, 'w')
+      stdout_fd, stderr_fd, sinks = self._open_outputs()
+
+      # executes the task command, a string is run the same way as
+      #  Popen(shell=True)
+      if isinstance(self._command, str):
+        args = ['/bin/sh', '-c', self._command]
       else:
-        stderr_fd = subprocess.PIPE
+        args = list(self._command)
+      try:
+        self._proc = spawn(args, stdout_fd, stderr_fd,
+                           list(self._prefuncs.values()))
+      except BaseException:
+        self._close_outputs(stdout_fd, stderr_fd)
+        for sink in sinks.values():
+          sink.close()
+        raise
 
-      # executes the task command
-      self._proc = subprocess.Popen(
-        self._command, stdout=stdout_fd, stderr=stderr_fd, shell=True,
-        start_new_session=True)
+    # the output files are only needed by the child
+    self._close_outputs(stdout_fd, stderr_fd)
 
-    # wait for the process to finish, collect output
-    self.stdout, self.stderr = self._proc.communicate()
-    if self.stdout is not None:
-      self.stdout = self.stdout.decode('utf-8')
-    if self.stderr is not None:
-      self.stderr = self.stderr.decode('utf-8')
+    # wait for the process to finish and collect output without a thread
+    def exited(returncode, stdout, stderr, usage):
+      self.usage = usage
+      for sink in sinks.values():
+        sink.close()
+      errors = self._collect(None if 'stdout' in sinks else stdout,
+                             None if 'stderr' in sinks else stderr,
+                             returncode)
+      for sink in sinks.values():
+        if errors is None and sink.error is not None:
+          errors = 'couldn\'t write {}: {}'.format(sink.filename, sink.error)
+      callback(errors)
+    self._manager.supervisor().watch(
+      self._proc, exited,
+      sinks.get('stdout') or OutputBuffer(self._capture_limit),
+      sinks.get('stderr') or OutputBuffer(self._capture_limit),
+      self._manager.output_listener(self))
+    return True
 
-    # close the output files
-    if self._stdout_file:
-      #pylint: disable=maybe-no-member
-      stdout_fd.close()
-    if self._stderr_file and not self._stderr_file.lower() == 'stdout':
-      #pylint: disable=maybe-no-member
-      stderr_fd.close()
+  def execute(self):
+    """
+    See Task.execute()
+    This implementation completes the task by calling Task.finish() from the
+    manager's ProcessSupervisor when the process finishes.
+    """
 
-    # get the return code
-    #with self._lock:
-    self.returncode = self._proc.returncode
+    if self._bundle is not None:
+      return self._bundle.submit(self)
+    if not self._launch(self.finish):
+      return None
+    return Task.DEFERRED
 
-    # check the return code
-    if self.returncode == 0:
+  async def execute_async(self):
+    """
+    See Task.execute_async()
+    """
+
+    if self._bundle is not None:
+      return self._bundle.submit(self)
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    if not self._launch(functools.partial(loop.call_soon_threadsafe,
+                                          future.set_result)):
       return None
-    return self.returncode
+    return await future
 
   def kill(self):
     """
     See Task.kill()
-    This implementation calls Popen.terminate()
+    This implementation calls Popen.terminate(), or has the bundle finish the
+    task when bundled
     """
 
     with self._lock:
@@ -208,7 +514,30 @@ class ProcessTask(Task):
           try:
             # self._proc.terminate() doesn't work likely because the process is
             # a shell process and the SIGTERM isn't being properly propagated.
-            # Killing the whole process group seems to work.
-            os.killpg(os.getpgid(self._proc.pid), signal.SIGTERM)
+            # Killing the whole process group seems to work. The process is a
+            #  session leader so its pid is the process group id, the group
+            #  can outlive the leader being reaped by the supervisor while
+            #  the task is still collecting the output of the group.
+            os.killpg(self._proc.pid, signal.SIGTERM)
+          except ProcessLookupError:
+            pass
+
+    # a bundled task is finished by its bundle
+    if self._bundle is not None and self.killed:
+      self._bundle.kill(self)
+
+  def force_kill(self):
+    """
+    See Task.force_kill()
+    This implementation sends SIGKILL to the process group
+    """
+
+    with self._lock:
+      if self.returncode is None:
+        self.killed = True
+        # the group can outlive its reaped leader, see kill()
+        if self._proc is not None:
+          try:
+            os.killpg(self._proc.pid, signal.SIGKILL)
           except ProcessLookupError:
             pass
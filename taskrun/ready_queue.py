@@ -0,0 +1,140 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import collections
+import heapq
+
+
+class ReadyQueue:
+  """
+  This class holds the tasks that are ready to execute. Tasks are ordered by
+  priority (highest first) and in FIFO order within a priority. Each priority
+  has its own deque and a heap tracks the non-empty priorities so finding the
+  next task is O(1) and pushing/popping is at worst O(log P) in the number of
+  distinct priorities. Priorities are unbounded.
+  """
+
+  def __init__(self):
+    """
+    Constructs an empty ReadyQueue object
+    """
+    self._levels = {}
+    self._heap = []  # negated priorities of non-empty levels
+    self._members = set()
+
+  def __len__(self):
+    """
+    Returns:
+      (int) : the number of tasks in the queue
+    """
+    return len(self._members)
+
+  def __contains__(self, task):
+    """
+    Returns:
+      (bool) : True if the task is in the queue
+    """
+    return task in self._members
+
+  def __iter__(self):
+    """
+    Iterates the tasks in dispatch order
+    """
+    for priority in sorted((-p for p in self._heap), reverse=True):
+      yield from self._levels[priority]
+
+  def push(self, task):
+    """
+    Adds a task to the back of its priority level
+
+    Args:
+      task (Task) : the task to add
+    """
+    priority = task.priority
+    level = self._levels.get(priority)
+    if level is None:
+      level = collections.deque()
+      self._levels[priority] = level
+    if not level:
+      heapq.heappush(self._heap, -priority)
+    level.append(task)
+    self._members.add(task)
+
+  def peek(self):
+    """
+    Returns:
+      (Task) : the next task to be dispatched, None if empty
+    """
+    if not self._heap:
+      return None
+    return self._levels[-self._heap[0]][0]
+
+  def pop(self):
+    """
+    Removes and returns the next task to be dispatched
+
+    Returns:
+      (Task) : the next task
+    """
+    assert self._heap, 'pop from an empty ReadyQueue'
+    level = self._levels[-self._heap[0]]
+    task = level.popleft()
+    if not level:
+      heapq.heappop(self._heap)
+    self._members.remove(task)
+    return task
+
+  def remove(self, task):
+    """
+    Removes a specific task from the queue
+
+    Args:
+      task (Task) : the task to remove
+    """
+    priority = task.priority
+    level = self._levels[priority]
+    level.remove(task)
+    if not level:
+      self._heap.remove(-priority)
+      heapq.heapify(self._heap)
+    self._members.remove(task)
+
+  def clear(self):
+    """
+    Removes all tasks from the queue
+
+    Returns:
+      (list) : the removed tasks in dispatch order
+    """
+    tasks = list(self)
+    self._levels = {}
+    self._heap = []
+    self._members = set()
+    return tasks
@@ -0,0 +1,118 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+
+
+class Reservation:
+  """
+  This class is an EASY backfill reservation for the task at the head of the
+  ready queue that can't start because of insufficient resources. Using the
+  estimated runtimes of the running tasks it computes the "shadow time" at
+  which the head task will be able to start and the amount of each resource
+  the head task won't need at that time (the "extra"). Another task may be
+  backfilled if it fits now and either finishes before the shadow time or only
+  uses extra resources. Either way the head task starts no later than the
+  shadow time, provided that the estimates are upper bounds.
+  """
+
+  def __init__(self, resource_manager, task, running, now):
+    """
+    Constructs a Reservation object
+
+    Args:
+      resource_manager (ResourceManager) : the resources being used
+      task (Task)                        : the task being reserved for
+      running (dict<Task,num>)           : the running tasks and their start
+                                           times
+      now (num)                          : the current time
+    """
+    self._now = now
+    self._resources = [resource for resource in resource_manager.resources
+                       if resource.available() is not None]
+
+    # expected end times of the running tasks, unknown ones are ignored as if
+    #  they never end
+    releases = []
+    for other, start in running.items():
+      if other.estimated_runtime is not None and start is not None:
+        releases.append((max(now, start + other.estimated_runtime), other))
+    releases.sort(key=lambda release: release[0])
+
+    # release the running tasks in order until the task would fit
+    available = {resource: resource.available()
+                 for resource in self._resources}
+    self._shadow = None
+    for end, other in releases:
+      for resource in self._resources:
+        available[resource] += resource.amount(other)
+      if self._fits(task, available):
+        self._shadow = end
+        break
+
+    # without a shadow time, only what is unneeded right now is extra
+    if self._shadow is None:
+      available = {resource: resource.available()
+                   for resource in self._resources}
+    self._extra = {resource: max(0, available[resource] - resource.amount(task))
+                   for resource in self._resources}
+
+  @property
+  def shadow(self):
+    """
+    Returns:
+      (num) : the time the reserved task is expected to start, None if unknown
+    """
+    return self._shadow
+
+  @staticmethod
+  def _fits(task, available):
+    """
+    Returns:
+      (bool) : True if the task fits in the available resources
+    """
+    for resource, amount in available.items():
+      if resource.amount(task) > amount:
+        return False
+    return True
+
+  def permits(self, task):
+    """
+    Determines if a task may be backfilled without delaying the reserved task
+
+    Args:
+      task (Task) : the candidate task
+
+    Returns:
+      (bool) : True if the task may start now
+    """
+    if (self._shadow is not None and task.estimated_runtime is not None and
+        self._now + task.estimated_runtime <= self._shadow):
+      return True
+    return self._fits(task, self._extra)
@@ -81,6 +81,36 @@ class Resource:
     """
     self._default = value
 
+  def capacity(self):
+    """
+    This method estimates how many tasks can concurrently use this resource
+
+    Returns:
+      (int or None) : the number of tasks, None for unbounded
+    """
+    return None
+
+  def amount(self, task):
+    """
+    This method returns how much of this resource the specified task uses. This
+    is used to plan ahead of time (e.g., backfill reservations).
+
+    Args:
+      task (Task) : the task under question
+
+    Returns:
+      (num or None) : the amount, None if this isn't a counted resource
+    """
+    return None
+
+  def available(self):
+    """
+    Returns:
+      (num or None) : the amount currently available, None if this isn't a
+                      counted resource
+    """
+    return None
+
   def can_use(self, task):
     """
     This method checks if the specified task could use the resource
@@ -48,6 +48,28 @@ class ResourceManager:
       'All arguments to ResourceManager must be taskrun.Resources'
     self._resources = args
 
+  @property
+  def resources(self):
+    """
+    Returns:
+      (tuple<Resource>) : the resources being managed
+    """
+    return self._resources
+
+  def capacity(self):
+    """
+    Estimates how many tasks can concurrently run given all resources
+
+    Returns:
+      (int or None) : the number of tasks, None for unbounded
+    """
+    capacity = None
+    for resource in self._resources:
+      amount = resource.capacity()
+      if amount is not None and (capacity is None or amount < capacity):
+        capacity = amount
+    return capacity
+
   def can_start(self, task):
     """
     Determines if a task can start
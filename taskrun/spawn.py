@@ -0,0 +1,163 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import os
+import shutil
+import subprocess
+from .child_action import Cwd
+from .child_action import Umask
+
+
+class SpawnedProcess:
+  """
+  This is the subset of subprocess.Popen used by ProcessTask and
+  ProcessSupervisor for a process started by os.posix_spawn().
+  """
+
+  def __init__(self, pid, stdout, stderr):
+    """
+    Args:
+      pid (int)     : the process id
+      stdout (file) : the read end of the stdout pipe, None if not a pipe
+      stderr (file) : the read end of the stderr pipe, None if not a pipe
+    """
+    self.pid = pid
+    self.stdout = stdout
+    self.stderr = stderr
+    self.returncode = None
+
+
+# (program, PATH) -> executable
+_executables = {}
+
+
+def _executable(program):
+  """
+  Searches the PATH for a program once instead of trying every PATH entry in
+  each child like os.posix_spawnp() does. Only programs that were found are
+  remembered.
+
+  Returns:
+    (str) : the executable to run
+  """
+  if os.sep in program:
+    return program
+  key = (program, os.environ.get('PATH', os.defpath))
+  executable = _executables.get(key)
+  if executable is None:
+    executable = shutil.which(program, path=key[1])
+    if executable is None:
+      raise FileNotFoundError(2, 'No such file or directory', program)
+    _executables[key] = executable
+  return executable
+
+
+def _fileno(target):
+  """
+  Returns:
+    (int) : the file descriptor of a file object or the descriptor itself
+  """
+  if isinstance(target, int):
+    return target
+  return target.fileno()
+
+
+def spawn(args, stdout=None, stderr=None, actions=()):
+  """
+  This starts a process in a new session like subprocess.Popen(args,
+  start_new_session=True). Without actions it uses os.posix_spawn() which
+  avoids duplicating the parent process and the overhead of subprocess.Popen.
+  With actions the process is started by subprocess.Popen, the working
+  directory and umask are given as its arguments and the other actions are
+  applied by a preexec_fn in the child before it executes the program.
+
+  Args:
+    args (list<str>)       : the program and its arguments, searched in PATH
+    stdout (file or int)   : None to inherit, subprocess.PIPE, or a file
+    stderr (file or int)   : None to inherit, subprocess.PIPE,
+                             subprocess.STDOUT, or a file
+    actions (list<ChildAction>) : setup applied in the child before it
+                                  executes
+
+  Returns:
+    (subprocess.Popen or SpawnedProcess) : the running process
+  """
+  if actions:
+    cwd = None
+    umask = -1
+    preexec = []
+    for action in actions:
+      if isinstance(action, Cwd):
+        cwd = action.path
+      elif isinstance(action, Umask):
+        umask = action.mask
+      else:
+        preexec.append(action)
+    def preexec_fn():
+      for action in preexec:
+        action.apply()
+    return subprocess.Popen(args, executable=_executable(args[0]),
+                            stdout=stdout, stderr=stderr, cwd=cwd,
+                            umask=umask, start_new_session=True,
+                            preexec_fn=preexec_fn if preexec else None)
+
+  file_actions = []
+  parent_ends = []
+  child_ends = []
+  pipes = {}
+  try:
+    for fd, target in ((1, stdout), (2, stderr)):
+      if target is None:
+        continue
+      if target == subprocess.PIPE:
+        read_end, write_end = os.pipe()
+        parent_ends.append(read_end)
+        child_ends.append(write_end)
+        pipes[fd] = read_end
+        file_actions.append((os.POSIX_SPAWN_DUP2, write_end, fd))
+      elif target == subprocess.STDOUT:
+        file_actions.append((os.POSIX_SPAWN_DUP2, 1, fd))
+      else:
+        file_actions.append((os.POSIX_SPAWN_DUP2, _fileno(target), fd))
+    pid = os.posix_spawn(_executable(args[0]), args, os.environ,
+                         file_actions=file_actions, setsid=True)
+  except BaseException:
+    for fd in parent_ends:
+      os.close(fd)
+    raise
+  finally:
+    for fd in child_ends:
+      os.close(fd)
+
+  def reader(fd):
+    if fd not in pipes:
+      return None
+    return open(pipes[fd], 'rb', buffering=0)
+  return SpawnedProcess(pid, reader(1), reader(2))
@@ -28,9 +28,14 @@
  * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
  * POSSIBILITY OF SUCH DAMAGE.
 """
+import contextvars
 import threading
 
 
+# the task being executed by the current thread or coroutine
+_current = contextvars.ContextVar('taskrun_current_task', default=None)
+
+
 class Task(threading.Thread):
   """
   This defines one task to be executed
@@ -38,6 +43,11 @@ class Task(threading.Thread):
   Each task notifies all tasks that are dependent on it upon completion
   """
 
+  # returned by execute() or execute_async() when the task completes later by
+  #  calling finish(), for example when an external event source (see
+  #  ProcessSupervisor) completes it instead of the executing thread
+  DEFERRED = object()
+
   def __init__(self, manager, name):
     """
     This instantiates a Task object, which is "abstract"
@@ -48,16 +58,45 @@ class Task(threading.Thread):
     """
 
     threading.Thread.__init__(self, name=name)
+    # tasks aren't tracked as dangling threads, otherwise every child forked to
+    #  apply ChildActions (see spawn()) resets the locks of all the tasks before
+    #  it executes its program
+    threading._dangling.discard(self)  # pylint: disable=protected-access
     self._manager = manager
-    self._manager.add_task(self)
+    self._manager.add_task(self)  # also assigns self._order (see graph.py)
     self._resources = {}
     self._priority = 0
-    self._dependencies = []
+    self._estimated_runtime = None
+    self._timeout = None
+    self._dependencies = {}  # insertion ordered set
+    self._pending = 0
     self._dependents = []
     self.conditions = []
     self._bypass = None
     self._errors = None
+    self._finished = False
+    self._queued = False  # set by TaskManager.task_ready()
+    self._deferred_errors = None
+    self._arrivals = 0
     self.killed = False
+    self.kill_reason = None
+
+  @staticmethod
+  def current():
+    """
+    Returns:
+      (Task) : the task executing in the calling thread or coroutine, None if
+               not called from within Task.execute()
+    """
+    return _current.get()
+
+  @property
+  def manager(self):
+    """
+    Returns:
+      (TaskManager) : the task manager this task is associated with
+    """
+    return self._manager
 
   @property
   def priority(self):
@@ -79,6 +118,50 @@ class Task(threading.Thread):
       'priority must be an int >= 0, {} is not'.format(value)
     self._priority = value
 
+  @property
+  def estimated_runtime(self):
+    """
+    Returns:
+      (num) : the estimated runtime of this task in seconds, None if unknown
+    """
+    return self._estimated_runtime
+
+  @estimated_runtime.setter
+  def estimated_runtime(self, value):
+    """
+    Sets the estimated runtime of this task. This is used by backfill
+    scheduling and should be an upper bound.
+
+    Args:
+      value (num) : the estimate in seconds, None if unknown
+    """
+    assert value is None or value >= 0, \
+      'estimated_runtime must be None or >= 0, {} is not'.format(value)
+    self._estimated_runtime = value
+
+  @property
+  def timeout(self):
+    """
+    Returns:
+      (num) : the wall clock time limit of this task in seconds, None if none
+    """
+    return self._timeout
+
+  @timeout.setter
+  def timeout(self, value):
+    """
+    Sets the wall clock time limit of this task. When it expires the manager
+    kills the task, sets kill_reason, and force kills it after the manager's
+    kill grace period.
+
+    Args:
+      value (num) : the limit in seconds from when the task starts, None for
+                    no limit
+    """
+    assert value is None or value > 0, \
+      'timeout must be None or > 0, {} is not'.format(value)
+    self._timeout = value
+
   @property
   def resources(self):
     """
@@ -112,9 +195,17 @@ class Task(threading.Thread):
   def get_dependencies(self):
     """
     Returns:
-      (list) : the list of dependencies
+      (list) : the list of dependencies, including those already done
+    """
+    return list(self._dependencies)
+
+  @property
+  def pending(self):
+    """
+    Returns:
+      (int) : the number of dependencies not yet done
     """
-    return self._dependencies
+    return self._pending
 
   def add_dependency(self, task):
     """
@@ -122,26 +213,31 @@ class Task(threading.Thread):
 
     Args:
       task (Task) : a task dependency
+
+    Raises:
+      RuntimeError : if this task is already ready, running, or finished
     """
 
-    # perform a cyclic dependency check (BFS checking for self)
-    visit = [task]
-    visited = set()
-    while len(visit) > 0:
-      curr = visit.pop()
-      if curr is self:
-        raise ValueError('cyclic dependency found')
-      visited.add(curr)
-      for dep in curr._dependencies:  #pylint: disable=protected-access
-        if dep not in visited:
-          visit.append(dep)
+    # dependencies can be added by running tasks (see TaskManager.add_task())
+    with self._manager.condition_variable:
+      if self._queued or self._finished:
+        raise RuntimeError(
+          'task {} is already ready, running, or finished, dependencies can no '
+          'longer be added'.format(self.name))
 
-    # add the task as a dependency
-    assert task not in self._dependencies
-    self._dependencies.append(task)
+      # perform an incremental cyclic dependency check unless the manager is in
+      #  build mode and checks all dependencies at once later
+      if not self._manager.in_build_mode:
+        self._manager.check_dependency(self, task)
 
-    # add self to the task's dependent list
-    task.add_dependent(self)
+      # add the task as a dependency, a finished dependency is never pending
+      assert task not in self._dependencies
+      self._dependencies[task] = None
+      if not task._finished:  # pylint: disable=protected-access
+        self._pending += 1
+
+      # add self to the task's dependent list
+      task.add_dependent(self)
 
   def get_dependents(self):
     """
@@ -164,7 +260,7 @@ class Task(threading.Thread):
     Returns:
       (bool) : tests whether this task is ready to execute
     """
-    return not self._dependencies # test for empty
+    return self._pending == 0
 
   def add_condition(self, condition):
     """
@@ -180,15 +276,20 @@ class Task(threading.Thread):
 
   def task_done(self, task):
     """
-    Notification that a dependency is now done
+    Notification that a dependency is now done. This is called from the thread
+    that ran the dependency so all dependency counting is serialized by the
+    manager's condition variable.
 
     Args:
       task (Task) : the task that is now done
     """
 
-    self._dependencies.remove(task)
-    if len(self._dependencies) == 0:
-      self._manager.task_ready(self)
+    with self._manager.condition_variable:
+      assert task in self._dependencies
+      assert self._pending > 0
+      self._pending -= 1
+      if self._pending == 0:
+        self._manager.task_ready(self)
 
   @property
   def bypass(self):
@@ -220,10 +321,80 @@ class Task(threading.Thread):
     assert self._bypass is not None, "bypass was never set"
     if not self._bypass:
       # try to execute
+      token = _current.set(self)
       try:
         self._errors = self.execute()
       except Exception as ex:  # pylint: disable=broad-except
         self._errors = ex
+      if self._errors is not Task.DEFERRED or self._arrive():
+        self._finish()
+      _current.reset(token)
+    else:
+      self._finish()
+
+  async def run_async(self):
+    """
+    This is the coroutine counterpart of run() used by
+    TaskManager.run_tasks_async().
+    """
+
+    # execute the task
+    assert self._bypass is not None, "bypass was never set"
+    if not self._bypass:
+      # try to execute, this coroutine runs in its own context
+      _current.set(self)
+      try:
+        self._errors = await self.execute_async()
+      except Exception as ex:  # pylint: disable=broad-except
+        self._errors = ex
+      if self._errors is Task.DEFERRED and not self._arrive():
+        return
+    self._finish()
+
+  def finish(self, errors):
+    """
+    This completes a task whose execution returned Task.DEFERRED. It may be
+    called from any thread.
+
+    Args:
+      errors (None or errors) : None for success, errors on failure
+    """
+    self._deferred_errors = errors
+    if self._arrive():
+      token = _current.set(self)
+      try:
+        self._finish()
+      finally:
+        _current.reset(token)
+
+  def _arrive(self):
+    """
+    Both the execution returning Task.DEFERRED and finish() arrive here as
+    either can happen first. The second to arrive finishes the task.
+
+    Returns:
+      (bool) : True if the caller should finish the task
+    """
+    with self._manager.condition_variable:
+      self._arrivals += 1
+      assert self._arrivals <= 2, 'finish() called more than once'
+      if self._arrivals < 2:
+        return False
+    self._errors = self._deferred_errors
+    return True
+
+  def _finish(self):
+    """
+    This reports the result of the execution and informs the dependents.
+    """
+
+    if not self._bypass:
+      # release the tasks this task added to the manager while running
+      try:
+        self._manager.commit_tasks()
+      except ValueError as ex:
+        if self._errors is None:
+          self._errors = ex
 
       # report to the task manager
       if self.killed:
@@ -233,8 +404,12 @@ class Task(threading.Thread):
       else:
         self._manager.task_failed(self, self._errors)
 
-    # inform all dependents of task completion/bypass
-    for dependent in self._dependents:
+    # inform all dependents of task completion/bypass, dependents added after
+    #  this point don't wait on this task
+    with self._manager.condition_variable:
+      self._finished = True
+      dependents = list(self._dependents)
+    for dependent in dependents:
       dependent.task_done(self)
 
   def describe(self):
@@ -255,6 +430,17 @@ class Task(threading.Thread):
     """
     raise NotImplementedError('subclasses should override this!')
 
+  async def execute_async(self):
+    """
+    Executes this task from the event loop of TaskManager.run_tasks_async().
+    This default runs execute() on the manager's thread pool. Subclasses that
+    can await their work should override this.
+
+    Returns:
+      (None or errors) : None for success, errors on failure,
+    """
+    return await self._manager.run_blocking(self.execute)
+
   def kill(self):
     """
     Kills this task. This may or may not be possible, but when it is, it must be
@@ -264,3 +450,24 @@ class Task(threading.Thread):
     was actually killed.
     """
     raise NotImplementedError('subclasses should override this!')
+
+  @classmethod
+  def kill_all(cls, tasks):
+    """
+    Kills many tasks of this class at once. The manager uses this to fan out
+    kills when shutting down so that subclasses can batch the work, for
+    example into one scheduler call. By default this calls kill() on each.
+
+    Args:
+      tasks (list<Task>) : the tasks to kill, all instances of this class
+    """
+    for task in tasks:
+      task.kill()
+
+  def force_kill(self):
+    """
+    Kills this task without allowing it to clean up. This is called by the
+    manager when a task is still running a grace period after kill(). By
+    default this does nothing more than kill().
+    """
+    self.kill()
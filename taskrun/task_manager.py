@@ -28,14 +28,30 @@
  * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
  * POSSIBILITY OF SUCH DAMAGE.
 """
+import asyncio
+import concurrent.futures
+import contextlib
+import contextvars
 import datetime
+import functools
 import os
 import random
 import signal
 import threading
 import time
+from .cluster_backend import ClusterBackend
+from .execution_engine import ExecutionEngine
 from .failure_mode import FailureMode
+from .graph import add_edge
+from .graph import find_cycles
+from .graph import topological_sort
+from .job_journal import JobJournal
+from .process_supervisor import ProcessSupervisor
+from .ready_queue import ReadyQueue
+from .reservation import Reservation
 from .task import Task
+from .timer_wheel import TimerWheel
+from .worker_pool import WorkerPool
 
 
 class TaskManager:
@@ -45,23 +61,51 @@ class TaskManager:
 
   def __init__(self, resource_manager=None, observers=None,
                failure_mode=FailureMode.AGGRESSIVE_FAIL,
-               priority_levels=16):
+               priority_levels=None,
+               engine=ExecutionEngine.THREAD_PER_TASK, workers=None,
+               backfill=False, backfill_window=1000, capture_limit=None,
+               capture_raw=False, kill_grace=5.0, journal=None):
     """
     Constructs a TaskManager object
 
     Args:
       resource_manager (ResourceManager) : the resource manager to use
       observers (Observer)               : a collection of observers to user
+      priority_levels (int)              : tasks must have priority less than
+                                           this, None for unbounded
+      engine (ExecutionEngine)           : how tasks are executed
+      workers (int)                      : maximum number of workers for the
+                                           WORKER_POOL engine, None to size
+                                           from the resource manager
+      backfill (bool)                    : start lower priority tasks when
+                                           the next task doesn't fit, see
+                                           Reservation
+      backfill_window (int)              : maximum number of ready tasks
+                                           scanned for backfill, including
+                                           the head of the queue
+      capture_limit (int)                : default ProcessTask.capture_limit
+      capture_raw (bool)                 : default ProcessTask.capture_raw
+      kill_grace (num)                   : seconds between killing a task
+                                           (on timeout, failure, or signal)
+                                           and force killing it
+      journal (str)                      : the file of a JobJournal used by
+                                           asynchronous ClusterTasks to
+                                           reattach to their jobs after a
+                                           restart, None for no journal
     """
 
     self._running = False
-    self._waiting_tasks = []
-    assert isinstance(priority_levels, int) and priority_levels > 0, \
-      'priority_levels must be an int > 0'
+    # waiting and running tasks use dicts as insertion ordered sets
+    self._waiting_tasks = {}
+    assert priority_levels is None or (
+      isinstance(priority_levels, int) and priority_levels > 0), \
+      'priority_levels must be None or an int > 0'
     self._priority_levels = priority_levels
-    self._ready_tasks = [[] for x in range(self._priority_levels)]
-    self._running_tasks = []
-    self._filter_tasks = []
+    self._ready_tasks = ReadyQueue()
+    self._running_tasks = {}
+    self._filter_tasks = set()
+    self._staged_tasks = {}  # thread ident -> list of tasks added while running
+    self._cleared = False
     self._resource_manager = resource_manager
     self._observers = []
     if observers:
@@ -73,6 +117,156 @@ class TaskManager:
     self._last_sigint_time = (datetime.datetime.now() -
                               datetime.timedelta(seconds = 5))
     self._pid = os.getpid()
+    self._engine = ExecutionEngine.create(engine)
+    assert workers is None or (isinstance(workers, int) and workers > 0), \
+      'workers must be None or an int > 0'
+    self._workers = workers
+    self._pool = None
+    self._backfill = backfill
+    self._backfill_window = backfill_window
+    assert capture_limit is None or (
+      isinstance(capture_limit, int) and capture_limit >= 0), \
+      'capture_limit must be None or an int >= 0'
+    self._capture_limit = capture_limit
+    self._capture_raw = capture_raw
+    self._build_mode = False
+    self._unchecked = False
+    self._next_order = 0
+    self._loop = None
+    self._loop_thread = None
+    self._wakeup = None
+    self._executor = None
+    self._process_pool = None
+    self._supervisor = None
+    assert kill_grace >= 0, 'kill_grace must be >= 0'
+    self._kill_grace = kill_grace
+    self._timer_wheel = None
+    self._timers = {}  # task -> timeout or force kill timer
+    self._cluster_backends = {}  # scheduler name -> ClusterBackend
+    self._journal = None if journal is None else JobJournal(journal)
+
+  @property
+  def engine(self):
+    """
+    Returns:
+      (ExecutionEngine) : the execution engine of this manager
+    """
+    return self._engine
+
+  @property
+  def failure_mode(self):
+    """
+    Returns:
+      (FailureMode) : the failure mode of this manager
+    """
+    return self._failure_mode
+
+  @property
+  def journal(self):
+    """
+    Returns:
+      (JobJournal) : the journal of the cluster jobs, None if none
+    """
+    return self._journal
+
+  @property
+  def capture_limit(self):
+    """
+    Returns:
+      (int) : the default output capture limit of ProcessTasks in bytes, None
+              for unbounded
+    """
+    return self._capture_limit
+
+  @property
+  def capture_raw(self):
+    """
+    Returns:
+      (bool) : the default output capture mode of ProcessTasks, True for bytes
+    """
+    return self._capture_raw
+
+  @property
+  def condition_variable(self):
+    """
+    Returns:
+      (threading.Condition) : the condition variable that serializes all
+                              changes to task state during a run
+    """
+    return self._condition_variable
+
+  def pool_size(self):
+    """
+    Returns the maximum number of worker threads used by the WORKER_POOL
+    engine. When not explicitly given this is sized from the resource manager's
+    capacity.
+
+    Returns:
+      (int) : number of worker threads, None for unbounded
+    """
+    if self._workers is not None:
+      return self._workers
+    if self._resource_manager is not None:
+      return self._resource_manager.capacity()
+    return None
+
+  def process_pool(self):
+    """
+    Returns the process pool used by ProcessPoolFunctionTask. It is created on
+    first use with pool_size() processes (the CPU count when unbounded) and
+    is shut down when the run completes.
+
+    Returns:
+      (concurrent.futures.ProcessPoolExecutor) : the process pool
+    """
+    with self._condition_variable:
+      if self._process_pool is None:
+        self._process_pool = concurrent.futures.ProcessPoolExecutor(
+          max_workers=self.pool_size())
+      return self._process_pool
+
+  def supervisor(self):
+    """
+    Returns the process supervisor used by ProcessTask. It is created on first
+    use and is shut down when the run completes.
+
+    Returns:
+      (ProcessSupervisor) : the process supervisor
+    """
+    with self._condition_variable:
+      if self._supervisor is None:
+        self._supervisor = ProcessSupervisor()
+      return self._supervisor
+
+  def cluster_backend(self, mode):
+    """
+    Returns the cluster backend that tracks the asynchronous ClusterTasks of a
+    scheduler. It is created on first use and is shut down when the run
+    completes.
+
+    Args:
+      mode (str) : name of cluster scheduler (see ClusterTask)
+
+    Returns:
+      (ClusterBackend) : the cluster backend
+    """
+    with self._condition_variable:
+      if mode not in self._cluster_backends:
+        self._cluster_backends[mode] = ClusterBackend(mode)
+      return self._cluster_backends[mode]
+
+  def timer_wheel(self):
+    """
+    Returns the timer wheel used to enforce task timeouts. It is created on
+    first use and is shut down when the run completes.
+
+    Returns:
+      (TimerWheel) : the timer wheel
+    """
+    with self._condition_variable:
+      if self._timer_wheel is None:
+        self._timer_wheel = TimerWheel()
+      return self._timer_wheel
 
   def add_observer(self, observer):
     """
@@ -84,16 +278,178 @@ class TaskManager:
     """
     This adds a task to this manager
 
+    Tasks can be added while running. These are staged per thread so they can
+    be given dependencies before any of them starts, then released by
+    commit_tasks(). A running task commits the tasks it added when it finishes
+    executing. Dependencies can only be added to tasks that aren't yet ready.
+
     Args:
       task (Task) : the task to add
     """
     assert isinstance(task, Task)
-    assert self._running is False
-    self._waiting_tasks.append(task)
+    with self._condition_variable:
+      if self._running:
+        self._staged_tasks.setdefault(self._stage_key(), []).append(task)
+      else:
+        self._waiting_tasks[task] = None
 
-    # pass info to the observer
-    for observer in self._observers:
-      observer.task_added(task)
+      # new tasks go at the end of the topological order
+      task._order = self._next_order  # pylint: disable=protected-access
+      self._next_order += 1
+
+      # pass info to the observer
+      for observer in self._observers:
+        observer.task_added(task)
+
+  def commit_tasks(self):
+    """
+    This releases the tasks added by the calling thread while running so they
+    can be executed. Tasks that depend on a task that won't run (or that failed
+    when using ACTIVE_CONTINUE) are filtered as are all tasks committed after a
+    failure clears the run.
+
+    Raises:
+      ValueError : if deferred cyclic dependency checks find a cycle
+    """
+    with self._condition_variable:
+      tasks = self._staged_tasks.pop(self._stage_key(), None)
+      if not tasks:
+        return
+
+      # perform the cyclic dependency checks deferred by build mode
+      if self._unchecked and not self._build_mode:
+        self._waiting_tasks.update(dict.fromkeys(tasks))
+        try:
+          self.check_cycles()
+        except ValueError:
+          for task in tasks:
+            del self._waiting_tasks[task]
+          self._filter_tasks.update(tasks)
+          raise
+      else:
+        self._waiting_tasks.update(dict.fromkeys(tasks))
+
+      # the run is stopping, none of these can execute
+      if self._cleared:
+        self._clear_waiting_and_ready()
+        return
+
+      # filter the tasks that can never become ready
+      for task in tasks:
+        if task in self._waiting_tasks and any(
+            self._blocked_by(dependency)
+            for dependency in task.get_dependencies()):
+          del self._waiting_tasks[task]
+          self._filter_tasks.add(task)
+          self._remove_dependent_tasks(task)
+
+      # release the tasks that have no pending dependencies
+      for task in tasks:
+        if task in self._waiting_tasks and task.ready():
+          self.task_ready(task)
+
+  @staticmethod
+  def _stage_key():
+    """
+    Returns:
+      (object) : the executing task or else the calling thread's identifier,
+                 tasks added while running are staged under this key
+    """
+    task = Task.current()
+    if task is not None:
+      return task
+    return threading.get_ident()
+
+  def _blocked_by(self, dependency):
+    """
+    WARNING: this method must be called while locked on the condition variable
+
+    Args:
+      dependency (Task) : a dependency of a task being committed
+
+    Returns:
+      (bool) : True if the dependency prevents its dependents from executing
+    """
+    if dependency in self._filter_tasks:
+      return True
+    # pylint: disable=protected-access
+    return (dependency._finished and
+            self._failure_mode is FailureMode.ACTIVE_CONTINUE and
+            (dependency.killed or dependency._errors is not None))
+
+  @property
+  def in_build_mode(self):
+    """
+    Returns:
+      (bool) : True if cyclic dependency checks are currently deferred
+    """
+    return self._build_mode
+
+  @contextlib.contextmanager
+  def build_mode(self):
+    """
+    This is a context manager that defers cyclic dependency checks. Within it
+    Task.add_dependency() doesn't check for cycles, instead a single
+    topological sort is performed by check_cycles() when run_tasks() starts.
+    """
+    previous = self._build_mode
+    self._build_mode = True
+    self._unchecked = True
+    try:
+      yield self
+    finally:
+      self._build_mode = previous
+
+  def add_dependencies(self, edges):
+    """
+    This adds many dependencies at once deferring the cyclic dependency checks
+    until run_tasks() starts (see build_mode()).
+
+    Args:
+      edges (iterable<(Task, Task)>) : pairs of (task, dependency)
+    """
+    with self.build_mode():
+      for task, dependency in edges:
+        task.add_dependency(dependency)
+
+  def check_cycles(self):
+    """
+    This checks all waiting tasks for cyclic dependencies using a single
+    topological sort. All cycles found are reported (one per strongly
+    connected component). On success the topological order used by
+    check_dependency() is rebuilt.
+
+    Raises:
+      ValueError : if any cycle exists
+    """
+    staged = [task for tasks in self._staged_tasks.values() for task in tasks]
+    order, remaining = topological_sort(list(self._waiting_tasks) + staged)
+    if remaining:
+      cycles = find_cycles(remaining)
+      raise ValueError('cyclic dependency found: {}'.format('; '.join(
+        ' -> '.join(task.name for task in cycle + cycle[:1])
+        for cycle in cycles)))
+    for task in order:
+      task._order = self._next_order  # pylint: disable=protected-access
+      self._next_order += 1
+    self._unchecked = False
+
+  def check_dependency(self, task, dependency):
+    """
+    This checks that a dependency can be added without creating a cycle. The
+    topological order of the tasks is incrementally updated so only the tasks
+    between the two in the order are visited.
+
+    Args:
+      task (Task)       : the task that will depend on the dependency
+      dependency (Task) : the dependency
+
+    Raises:
+      ValueError : if the dependency would create a cycle
+    """
+    if self._unchecked:
+      self.check_cycles()
+    add_edge(task, dependency)
 
   def get_task(self, name):
     """
@@ -116,30 +472,34 @@ class TaskManager:
     assert self._running is False
 
     if len(self._waiting_tasks) > 1:
+      waiting_tasks = list(self._waiting_tasks)
+
       # get random samples
       random_indices = []
       random_samples = []
-      for _ in range(min(5, len(self._waiting_tasks))):
-        random_index = random.choice(range(len(self._waiting_tasks)))
+      for _ in range(min(5, len(waiting_tasks))):
+        random_index = random.choice(range(len(waiting_tasks)))
         random_indices.append(random_index)
-        random_samples.append(self._waiting_tasks[random_index].name)
+        random_samples.append(waiting_tasks[random_index].name)
 
       # shuffles until unique
       while True:
         # shuffle
-        random.shuffle(self._waiting_tasks)
+        random.shuffle(waiting_tasks)
 
         # compare samples
         match = True
         for index, random_index in enumerate(random_indices):
           random_sample = random_samples[index]
-          shuffled_sample = self._waiting_tasks[random_index].name
+          shuffled_sample = waiting_tasks[random_index].name
           if shuffled_sample != random_sample:
             match = False
             break
         if not match:
           break
 
+      self._waiting_tasks = dict.fromkeys(waiting_tasks)
+
   def _probe_ready(self):
     """
     This method probes the waiting tasks to see if they are ready
@@ -162,20 +522,78 @@ class TaskManager:
 
     assert self._running is True
     with self._condition_variable:
-      # check if this task is in the filter list
+      # check if this task is in the filter list, filtered tasks are kept there
+      #  so tasks added later can't depend on them (see commit_tasks())
       if task in self._filter_tasks:
         assert task not in self._waiting_tasks
-        self._filter_tasks.remove(task)
 
-      else:
+      elif task in self._waiting_tasks:
         # transfer from waiting to ready list
-        self._waiting_tasks.remove(task)
-        assert task.priority < self._priority_levels, \
+        del self._waiting_tasks[task]
+        assert (self._priority_levels is None or
+                task.priority < self._priority_levels), \
           'task.priority must be less than priority_levels'
-        self._ready_tasks[task.priority].append(task)
+        self._ready_tasks.push(task)
+        task._queued = True  # pylint: disable=protected-access
+
+      # otherwise the task is staged and is checked when committed
 
       # notify waiting threads
-      self._condition_variable.notify()
+      self._notify()
+
+  def _notify(self):
+    """
+    Wakes up the dispatch loop of run_tasks() or run_tasks_async().
+
+    WARNING: this method must be called while locked on the condition variable
+    """
+    self._condition_variable.notify()
+    if self._loop is not None:
+      if threading.get_ident() == self._loop_thread:
+        self._wakeup.set()
+      else:
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+
+  def _try_start(self, task):
+    """
+    Checks if a task can be dispatched now. If the task isn't being bypassed
+    its resources are used on success.
+
+    WARNING: this method must be called while locked on the condition variable
+
+    Args:
+      task (Task) : the task to start
+
+    Returns:
+      (bool) : True if the task can be dispatched
+    """
+    return (task.bypass or
+            self._resource_manager is None or
+            self._resource_manager.start(task))
+
+  def _find_backfill(self):
+    """
+    Finds a ready task that can be dispatched ahead of the task at the head of
+    the ready queue without delaying its reservation.
+
+    WARNING: this method must be called while locked on the condition variable
+
+    Returns:
+      (Task) : the task that can be dispatched, None if none
+    """
+    head = self._ready_tasks.peek()
+    reservation = Reservation(self._resource_manager, head, self._running_tasks,
+                              time.monotonic())
+    for index, task in enumerate(self._ready_tasks):
+      if index >= self._backfill_window:
+        break
+      if task is head:
+        continue
+      if task.bypass:
+        return task
+      if reservation.permits(task) and self._resource_manager.start(task):
+        return task
+    return None
 
   def _task_started(self, task):
     """
@@ -188,10 +606,49 @@ class TaskManager:
     """
     assert self._running is True
 
+    # start the clock on the time limit
+    if task.timeout is not None:
+      self._timers[task] = self.timer_wheel().schedule(
+        task.timeout, functools.partial(self._task_timeout, task))
+
     # notify observer
     for observer in self._observers:
       observer.task_started(task)
 
+  def _task_timeout(self, task):
+    """
+    This is called by the timer wheel when a task's time limit expires. The
+    task is killed and then force killed if it is still running after the
+    kill grace period. Tasks that can't be killed keep running.
+
+    Args:
+      task (Task) : the task that timed out
+    """
+    with self._condition_variable:
+      if task not in self._running_tasks or task.killed:
+        return
+      task.kill_reason = 'timed out after {}s'.format(task.timeout)
+      task.kill()
+      if not task.killed:
+        # e.g., a FunctionTask can't be stopped once started
+        task.kill_reason = None
+        return
+      self._timers[task] = self._timer_wheel.schedule(
+        self._kill_grace, functools.partial(self._task_force_kill, task))
+
+  def _task_force_kill(self, task):
+    """
+    This is called by the timer wheel when a killed task is still running after
+    the kill grace period.
+
+    Args:
+      task (Task) : the task to force kill
+    """
+    with self._condition_variable:
+      if task in self._running_tasks:
+        self._timers.pop(task, None)
+        task.force_kill()
+
   def _task_bypassed(self, task):
     """
     This is called when a Task has been bypassed
@@ -210,6 +667,36 @@ class TaskManager:
     # clean up the task
     self._task_done(task)
 
+  def output_listener(self, task):
+    """
+    This returns the function used to deliver live output of a task to the
+    observers.
+
+    Args:
+      task (Task) : the task producing the output
+
+    Returns:
+      (callable) : listener(stream, chunk), None if no observer wants output
+    """
+    if not any(observer.wants_output() for observer in self._observers):
+      return None
+    return functools.partial(self.task_output, task)
+
+  def task_output(self, task, stream, chunk):
+    """
+    This is called when a running Task has produced output
+
+    Args:
+      task (Task)   : the task that produced the output
+      stream (str)  : 'stdout' or 'stderr'
+      chunk (bytes) : the output
+    """
+    with self._condition_variable:
+      # pass info to the observer
+      for observer in self._observers:
+        if observer.wants_output():
+          observer.task_output(task, stream, chunk)
+
   def task_completed(self, task):
     """
     This is called when a Task has completed execution
@@ -287,13 +774,32 @@ class TaskManager:
 
   def _kill_running(self):
     """
-    Kills all running tasks
+    Kills all running tasks. The kills are fanned out by task class (see
+    Task.kill_all()) without waiting for the tasks to exit, then the tasks
+    still running after the kill grace period are force killed.
+
+    WARNING: this method must be called while locked on the condition variable
     """
     # kill all the currently running tasks
     if not self._killed:
       self._killed = True
+      by_class = {}
       for task in self._running_tasks:
-        task.kill()
+        by_class.setdefault(type(task), []).append(task)
+      for cls, tasks in by_class.items():
+        cls.kill_all(tasks)
+      if self._running_tasks:
+        self.timer_wheel().schedule(self._kill_grace, self._force_kill_running)
+
+  def _force_kill_running(self):
+    """
+    This is called by the timer wheel a kill grace period after the running
+    tasks were killed to force kill the ones that are still running.
+    """
+    with self._condition_variable:
+      for task in list(self._running_tasks):
+        if task.killed:
+          task.force_kill()
 
   def _clear_waiting_and_ready(self):
     """
@@ -301,11 +807,10 @@ class TaskManager:
     list.
     """
     # clear out waiting and ready lists
-    self._filter_tasks.extend(self._waiting_tasks)
-    self._waiting_tasks = []
-    for priority in range(self._priority_levels):
-      self._filter_tasks.extend(self._ready_tasks[priority])
-      self._ready_tasks[priority] = []
+    self._cleared = True
+    self._filter_tasks.update(self._waiting_tasks)
+    self._waiting_tasks = {}
+    self._filter_tasks.update(self._ready_tasks.clear())
 
   def _remove_dependent_tasks(self, task):
     """
@@ -318,16 +823,19 @@ class TaskManager:
     visited = set()
     while len(visit) > 0:
       curr = visit.pop()
-      for priority in range(self._priority_levels):
-        assert curr not in self._ready_tasks[priority]
-      assert curr not in self._running_tasks
       visited.add(curr)
       for dep in curr.get_dependents():
         if dep not in visited:
           visit.append(dep)
+      # tasks can become ready or start before their dependencies finish (see
+      #  ClusterTask.native_dependencies), the started ones stop themselves
+      #  when informed of the failure
       if curr in self._waiting_tasks:
-        self._waiting_tasks.remove(curr)
-        self._filter_tasks.append(curr)
+        del self._waiting_tasks[curr]
+        self._filter_tasks.add(curr)
+      elif curr in self._ready_tasks:
+        self._ready_tasks.remove(curr)
+        self._filter_tasks.add(curr)
 
   def _task_done(self, task):
     """
@@ -343,7 +851,12 @@ class TaskManager:
     assert self._running is True
 
     # remove task from running lists
-    self._running_tasks.remove(task)
+    del self._running_tasks[task]
+
+    # stop the clock on the time limit
+    timer = self._timers.pop(task, None)
+    if timer is not None:
+      self._timer_wheel.cancel(timer)
 
     # give back resources
     if not task.bypass:
@@ -351,7 +864,7 @@ class TaskManager:
         self._resource_manager.done(task)
 
     # notify waiting thread
-    self._condition_variable.notify()
+    self._notify()
 
   def _terminate(self):
     """
@@ -362,7 +875,7 @@ class TaskManager:
     with self._condition_variable:
       self._kill_running()
       self._clear_waiting_and_ready()
-      self._condition_variable.notify()
+      self._notify()
 
   def _handle_signal(self, signum):
     # Kills the process if the task manager's known pid does not match the pid
@@ -423,17 +936,20 @@ class TaskManager:
     signal.signal(signal.SIGTERM, signal.SIG_DFL)
 
 
-  def run_tasks(self):
+  def _begin_run(self):
     """
-    This runs all tasks in dependency order and executing with the
-    ResourceManager's discretion.
-
-    This must be run by the main thread. Will overwrite SIGINT and SIGTERM
-    signal handlers.
+    This prepares a run and finds the root tasks. It is shared by run_tasks()
+    and run_tasks_async().
     """
     assert self._running is False
+
+    # perform the cyclic dependency checks deferred by build mode
+    if self._unchecked:
+      self.check_cycles()
+
     self._running = True
     self._failed = False
+    self._cleared = False
 
     # sets the signal handlers for graceful shutdown
     self._set_signal_handlers()
@@ -441,6 +957,111 @@ class TaskManager:
     # ask the tasks if they are ready to run (find root tasks)
     self._probe_ready()
 
+  def _end_run(self):
+    """
+    This finishes a run. It is shared by run_tasks() and run_tasks_async().
+
+    Returns:
+      (bool) : True iff all tasks reported success, False otherwise
+    """
+    # turn off, tasks that were never committed wait for the next run
+    with self._condition_variable:
+      self._running = False
+      for tasks in self._staged_tasks.values():
+        self._waiting_tasks.update(dict.fromkeys(tasks))
+      self._staged_tasks = {}
+
+    # stop the worker processes and the process supervisor
+    if self._process_pool is not None:
+      self._process_pool.shutdown()
+      self._process_pool = None
+    if self._supervisor is not None:
+      self._supervisor.shutdown()
+      self._supervisor = None
+    for backend in self._cluster_backends.values():
+      backend.shutdown()
+    self._cluster_backends = {}
+    if self._journal is not None:
+      self._journal.close()
+    if self._timer_wheel is not None:
+      self._timer_wheel.shutdown()
+      self._timer_wheel = None
+      self._timers = {}
+
+    # inform all observers of run completion
+    for observer in self._observers:
+      observer.run_complete()
+
+    # resets the signal handlers to the defaults
+    TaskManager._reset_signal_handlers()
+
+    # return True iff all tasks reported success, False otherwise
+    return not self._failed
+
+  def _run_done(self):
+    """
+    WARNING: this method must be called while locked on the condition variable
+
+    Returns:
+      (bool) : True if there is nothing left to run
+    """
+    return (len(self._waiting_tasks) == 0 and
+            len(self._ready_tasks) == 0 and
+            len(self._running_tasks) == 0)
+
+  def _dispatch(self):
+    """
+    This transfers the next task that can start from the ready queue to the
+    running tasks and informs the observers.
+
+    WARNING: this method must be called while locked on the condition variable
+
+    Returns:
+      (Task) : the task to run or bypass, None if none can start now
+    """
+    if len(self._ready_tasks) == 0:
+      return None
+
+    # find the highest priority task in FIFO order within priority levels
+    next_task = self._ready_tasks.peek()
+
+    # if not being bypassed, check if there enough resources to run the task
+    #  on success, the resource will have been used
+    if not self._try_start(next_task):
+      next_task = None
+      if self._backfill:
+        next_task = self._find_backfill()
+      if next_task is None:
+        return None
+
+    # transfer from ready to running
+    if next_task is self._ready_tasks.peek():
+      self._ready_tasks.pop()
+    else:
+      self._ready_tasks.remove(next_task)
+    self._running_tasks[next_task] = time.monotonic()
+
+    # signal started or bypassed
+    if not next_task.bypass:
+      self._task_started(next_task)
+    else:
+      self._task_bypassed(next_task)
+    return next_task
+
+  def run_tasks(self):
+    """
+    This runs all tasks in dependency order and executing with the
+    ResourceManager's discretion.
+
+    This must be run by the main thread. Will overwrite SIGINT and SIGTERM
+    signal handlers.
+    """
+    self._begin_run()
+
+    # start the worker threads
+    if self._engine is ExecutionEngine.WORKER_POOL:
+      self._pool = WorkerPool(self.pool_size())
+
     # inform all observers of run starting
     for observer in self._observers:
       observer.run_starting()
@@ -450,62 +1071,107 @@ class TaskManager:
       # use the condition variable for pausing/resuming and locking
       with self._condition_variable:
         # check if we are done
-        if (len(self._waiting_tasks) == 0 and
-            sum(map(len, self._ready_tasks)) == 0 and
-            len(self._running_tasks) == 0): # and
-            #len(self._filter_tasks) == 0):
+        if self._run_done():
           break
 
-        # wait for a ready task
-        if sum(map(len, self._ready_tasks)) == 0:
+        # wait for a task that can start
+        next_task = self._dispatch()
+        if next_task is None:
           self._condition_variable.wait()
           continue
 
-        # find the highest priority task in FIFO order within priority levels
-        next_task = None
-        for priority in reversed(range(self._priority_levels)):
-          if len(self._ready_tasks[priority]) > 0:
-            next_task = self._ready_tasks[priority][0]
-            break
-        assert next_task is not None
+      # at this point, the next_task is either being bypassed or there is enough
+      #  resources to execute the task
 
-        # if not being bypassed, check if there enough resources to run the task
-        #  on success, the resource will have been used
-        if (not next_task.bypass and
-            self._resource_manager is not None and
-            self._resource_manager.start(next_task) is False):
-          self._condition_variable.wait()
-          continue
+      # run it, then give up execution to other threads/processes
+      #  this allows tasks to start
+      if self._pool is not None:
+        self._pool.submit(next_task)
+        os.sched_yield()
+      else:
+        next_task.start()
+        time.sleep(0.000001)
 
-        # transfer from ready to running
-        self._ready_tasks[next_task.priority].remove(next_task)
-        self._running_tasks.append(next_task)
+    # stop the worker threads
+    if self._pool is not None:
+      self._pool.shutdown()
+      self._pool = None
 
-        # signal started or bypassed
-        if not next_task.bypass:
-          self._task_started(next_task)
-        else:
-          self._task_bypassed(next_task)
+    return self._end_run()
 
-      # at this point, the next_task is either being bypassed or there is enough
-      #  resources to execute the task
+  async def run_tasks_async(self):
+    """
+    This is the asyncio counterpart of run_tasks(). Tasks are run as coroutines
+    on the calling event loop (see Task.run_async()) so tasks that await their
+    work, like AsyncFunctionTask and ProcessTask, don't need a thread each.
+    Other tasks execute on a thread pool sized like the WORKER_POOL engine's.
 
-      # run it
-      next_task.start()
+    This must be run by the main thread. Will overwrite SIGINT and SIGTERM
+    signal handlers.
 
-      # give up execution to other threads/processes
-      #  this allows tasks to start
-      time.sleep(0.000001)
+    Returns:
+      (bool) : True iff all tasks reported success, False otherwise
+    """
+    # the loop state is reset even when the run can't start, e.g., on a cycle
+    runs = set()
+    try:
+      self._loop = asyncio.get_running_loop()
+      self._loop_thread = threading.get_ident()
+      self._wakeup = asyncio.Event()
+      self._executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=self.pool_size(), thread_name_prefix='taskrun')
+      self._begin_run()
+
+      # inform all observers of run starting
+      for observer in self._observers:
+        observer.run_starting()
 
-    # turn off
-    self._running = False
+      # run all tasks until there is none left
+      while True:
+        with self._condition_variable:
+          # check if we are done
+          if self._run_done():
+            break
 
-    # inform all observers of run completion
-    for observer in self._observers:
-      observer.run_complete()
+          # wait for a task that can start
+          next_task = self._dispatch()
+          if next_task is None:
+            self._wakeup.clear()
+        if next_task is None:
+          await self._wakeup.wait()
+          continue
 
-    # resets the signal handlers to the defaults
-    TaskManager._reset_signal_handlers()
+        # run it, then let it start
+        run = self._loop.create_task(next_task.run_async())
+        runs.add(run)
+        run.add_done_callback(runs.discard)
+        await asyncio.sleep(0)
+
+      # let the last tasks finish informing their dependents
+      if runs:
+        await asyncio.gather(*runs)
+    finally:
+      if self._executor is not None:
+        self._executor.shutdown()
+      self._executor = None
+      self._loop = None
+      self._loop_thread = None
+      self._wakeup = None
+
+    return self._end_run()
+
+  async def run_blocking(self, func, *args):
+    """
+    This runs a blocking function from within run_tasks_async() without
+    stalling the event loop.
 
-    # return True iff all tasks reported success, False otherwise
-    return not self._failed
+    Args:
+      func (callable) : the function to call
+      *args           : passed to func
+
+    Returns:
+      the return value of func
+    """
+    context = contextvars.copy_context()
+    return await self._loop.run_in_executor(
+      self._executor, functools.partial(context.run, func, *args))
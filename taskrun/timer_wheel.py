@@ -0,0 +1,184 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import math
+import threading
+import time
+import traceback
+
+
+class _Timer:
+  """
+  A scheduled callback of a TimerWheel
+  """
+
+  __slots__ = ('tick', 'callback')
+
+  def __init__(self, tick, callback):
+    self.tick = tick
+    self.callback = callback
+
+
+class TimerWheel:
+  """
+  This class runs callbacks after delays from a single thread using a hashed
+  timing wheel. Timers are hashed into slots by their expiration tick so that
+  scheduling and cancelling are O(1) regardless of how many timers exist. The
+  thread sleeps while no timers are scheduled. Callbacks are run on the timer
+  thread and must be short.
+  """
+
+  RESOLUTION_DEFAULT = 0.05
+  SLOTS_DEFAULT = 1024
+
+  def __init__(self, resolution=RESOLUTION_DEFAULT, slots=SLOTS_DEFAULT):
+    """
+    Constructs a TimerWheel object
+
+    Args:
+      resolution (float) : the duration of a tick in seconds, callbacks run
+                           up to one tick late
+      slots (int)        : the number of slots of the wheel
+    """
+    assert resolution > 0, 'resolution must be > 0'
+    assert isinstance(slots, int) and slots > 0, 'slots must be an int > 0'
+    self._resolution = resolution
+    self._slots = [{} for _ in range(slots)]  # insertion ordered sets
+    self._count = 0
+    self._start = time.monotonic()
+    self._tick = 0  # the last tick processed
+    self._condition_variable = threading.Condition()
+    self._stop = False
+    self._thread = threading.Thread(target=self._loop, daemon=True,
+                                    name='taskrun-timers')
+    self._thread.start()
+
+  def __len__(self):
+    """
+    Returns:
+      (int) : the number of scheduled timers
+    """
+    return self._count
+
+  def schedule(self, delay, callback):
+    """
+    Schedules a callback
+
+    Args:
+      delay (float)       : the delay in seconds
+      callback (callable) : called without arguments on the timer thread
+
+    Returns:
+      (object) : a handle for cancel()
+    """
+    with self._condition_variable:
+      assert not self._stop, 'timer wheel is shut down'
+      tick = math.ceil((time.monotonic() - self._start + delay) /
+                       self._resolution)
+      timer = _Timer(max(tick, self._tick + 1), callback)
+      self._slots[timer.tick % len(self._slots)][timer] = None
+      self._count += 1
+      self._condition_variable.notify()
+      return timer
+
+  def cancel(self, timer):
+    """
+    Cancels a scheduled callback, this does nothing if it already ran
+
+    Args:
+      timer (object) : the handle returned by schedule()
+    """
+    with self._condition_variable:
+      if self._slots[timer.tick % len(self._slots)].pop(timer, 1) is None:
+        self._count -= 1
+
+  def shutdown(self):
+    """
+    Stops the timer thread, scheduled callbacks are dropped
+    """
+    with self._condition_variable:
+      self._stop = True
+      self._condition_variable.notify()
+    self._thread.join()
+
+  def _expire(self):
+    """
+    Removes the timers that are due
+
+    WARNING: this method must be called while locked on the condition variable
+
+    Returns:
+      (list<callable>) : the callbacks to run
+    """
+    now = int((time.monotonic() - self._start) / self._resolution)
+    if now <= self._tick:
+      return []
+    if self._count == 0:
+      self._tick = now
+      return []
+    if now - self._tick >= len(self._slots):
+      slots = self._slots
+    else:
+      slots = [self._slots[tick % len(self._slots)]
+               for tick in range(self._tick + 1, now + 1)]
+    self._tick = now
+    callbacks = []
+    for slot in slots:
+      due = [timer for timer in slot if timer.tick <= now]
+      for timer in due:
+        del slot[timer]
+        callbacks.append(timer.callback)
+    self._count -= len(callbacks)
+    return callbacks
+
+  def _loop(self):
+    """
+    This is the main loop of the timer thread
+    """
+    while True:
+      with self._condition_variable:
+        while True:
+          if self._stop:
+            return
+          callbacks = self._expire()
+          if callbacks:
+            break
+          if self._count == 0:
+            self._condition_variable.wait()
+          else:
+            self._condition_variable.wait(
+              self._start + (self._tick + 1) * self._resolution -
+              time.monotonic())
+      for callback in callbacks:
+        try:
+          callback()
+        except Exception:  # pylint: disable=broad-except
+          # keep running the other timers
+          traceback.print_exc()
@@ -28,6 +28,7 @@
  * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
  * POSSIBILITY OF SUCH DAMAGE.
 """
+import collections
 import datetime
 import sys
 import time
@@ -60,6 +61,9 @@ class VerboseObserver(Observer):
   SHOW_SUMMARY_DEFAULT = True
   SHOW_DESCRIPTIONS_DEFAULT = False
   SHOW_CURRENT_TIME_DEFAULT = False
+  TAIL_FAILURES_DEFAULT = 0
+  TAIL_LINE_BYTES_DEFAULT = 4096
+  SHOW_USAGE_DEFAULT = False
 
   def __init__(self, timer=TIMER_DEFAULT, log=LOG_DEFAULT,
                show_starts=SHOW_STARTS_DEFAULT,
@@ -70,12 +74,25 @@ class VerboseObserver(Observer):
                show_progress=SHOW_PROGRESS_DEFAULT,
                show_summary=SHOW_SUMMARY_DEFAULT,
                show_descriptions=SHOW_DESCRIPTIONS_DEFAULT,
-               show_current_time=SHOW_CURRENT_TIME_DEFAULT):
+               show_current_time=SHOW_CURRENT_TIME_DEFAULT,
+               tail_failures=TAIL_FAILURES_DEFAULT,
+               tail_line_bytes=TAIL_LINE_BYTES_DEFAULT,
+               show_usage=SHOW_USAGE_DEFAULT):
     """
     Constructs an Observer
 
     Note: if a task fails or is killed and it is set to be shown, the
           description is always added
+
+    Args:
+      tail_failures (int)   : the number of last output lines of a failed or
+                              killed ProcessTask to show, 0 disables this.
+                              The output is followed live while the task
+                              runs.
+      tail_line_bytes (int) : the number of last bytes kept of each of these
+                              lines, longer lines are truncated
+      show_usage (bool)     : show the resource usage of finished
+                              ProcessTasks
     """
     super().__init__()
     self._total_tasks = 0
@@ -98,6 +115,10 @@ class VerboseObserver(Observer):
     self._show_summary = show_summary
     self._show_descriptions = show_descriptions
     self._show_current_time = show_current_time
+    self._tail_failures = tail_failures
+    self._tail_line_bytes = tail_line_bytes
+    self._show_usage = show_usage
+    self._tails = {}  # task -> (lines, {stream: partial line})
 
   def task_added(self, task):
     """
@@ -153,6 +174,7 @@ class VerboseObserver(Observer):
 
     if self._timer:
       task_time = time.time() - self._times.pop(task)
+    self._tails.pop(task, None)
 
     self._finished_tasks += 1
     self._successful_tasks += 1
@@ -166,6 +188,7 @@ class VerboseObserver(Observer):
       text += ']'
       if self._show_descriptions:
         text += f'\n  {task.describe()}'
+      text += self._usage(task)
       if self._log:
         print(text, file=self._log)
       if USE_TERM_COLOR:
@@ -180,6 +203,7 @@ class VerboseObserver(Observer):
 
     if self._timer:
       task_time = time.time() - self._times.pop(task)
+    tail = self._tail(task)
 
     self._finished_tasks += 1
     self._failed_tasks += 1
@@ -196,6 +220,8 @@ class VerboseObserver(Observer):
         text += f'\n  Return: {str(errors)}'
       else:
         text += f'\n  Message: {str(errors)}'
+      text += self._usage(task)
+      text += tail
       if self._log:
         print(text, file=self._log)
       if USE_TERM_COLOR:
@@ -210,10 +236,12 @@ class VerboseObserver(Observer):
 
     if self._timer:
       task_time = time.time() - self._times.pop(task)
+    tail = self._tail(task)
 
     self._finished_tasks += 1
     self._killed_tasks += 1
-    if self._show_kills:
+    # tasks killed for their own reason (e.g., a timeout) are failures
+    if self._show_kills or (task.kill_reason and self._show_failures):
       text = ''
       if self._show_current_time:
         text += f'{_now_string()} '
@@ -222,6 +250,9 @@ class VerboseObserver(Observer):
         text += f' {_time_string(task_time)}'
       text += ']'
       text += f'\n  Description: {task.describe()}'
+      if task.kill_reason:
+        text += f'\n  Reason: {task.kill_reason}'
+      text += tail
       if self._log:
         print(text, file=self._log)
       if USE_TERM_COLOR:
@@ -229,6 +260,69 @@ class VerboseObserver(Observer):
       print(text)
       self._progress()
 
+  def task_output(self, task, stream, chunk):
+    """
+    See Observer.task_output()
+    This class uses this to follow the last lines of output of each task
+    """
+    lines, partials = self._tails.setdefault(
+      task, (collections.deque(maxlen=self._tail_failures), {}))
+    data = partials.pop(stream, b'') + chunk
+    *complete, partial = data.split(b'\n')
+    for line in complete[-self._tail_failures:]:
+      lines.append((stream, self._truncate(line)))
+    if partial:
+      # output without newlines must not grow the partial line without bound
+      partials[stream] = self._truncate(partial)
+
+  def _truncate(self, line):
+    """
+    Returns:
+      (bytes) : the line limited to its last tail_line_bytes bytes
+    """
+    if len(line) <= self._tail_line_bytes:
+      return line
+    return b'...' + line[-self._tail_line_bytes:]
+
+  def wants_output(self):
+    """
+    See Observer.wants_output()
+    """
+    return self._tail_failures > 0
+
+  def _usage(self, task):
+    """
+    Returns:
+      (str) : the formatted resource usage of the task if shown and known
+    """
+    usage = getattr(task, 'usage', None)
+    if not self._show_usage or usage is None:
+      return ''
+    return (f'\n  Usage: user {usage.ru_utime:.3f}s'
+            f' sys {usage.ru_stime:.3f}s'
+            f' maxrss {usage.ru_maxrss}KiB'
+            f' faults {usage.ru_majflt}/{usage.ru_minflt}'
+            f' switches {usage.ru_nvcsw}/{usage.ru_nivcsw}'
+            f' blocks {usage.ru_inblock}/{usage.ru_oublock}')
+
+  def _tail(self, task):
+    """
+    This removes the tracked output of a task
+
+    Returns:
+      (str) : the formatted last lines of output of the task
+    """
+    lines, partials = self._tails.pop(task, ((), {}))
+    lines = list(lines)
+    for stream, partial in partials.items():
+      lines.append((stream, partial))
+    lines = lines[-self._tail_failures:]
+    text = ''
+    for stream, line in lines:
+      line = line.decode('utf-8', errors='replace')
+      text += f'\n  {stream}| {line}'
+    return text
+
   def run_starting(self):
     """
     See Observer.run_starting()
@@ -0,0 +1,124 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import queue
+import threading
+import traceback
+
+
+class WorkerPool:
+  """
+  This class is a pool of worker threads that execute tasks. Tasks submitted
+  to the pool are run by calling Task.run() directly on a worker thread instead
+  of starting the task as its own thread. Workers are created on demand and
+  then reused, never exceeding the size of the pool.
+  """
+
+  def __init__(self, size=None):
+    """
+    Constructs a WorkerPool object
+
+    Args:
+      size (int) : the maximum number of worker threads, None for unbounded
+    """
+    assert size is None or (isinstance(size, int) and size > 0), \
+      'size must be None or an int > 0, {} is not'.format(size)
+    self._size = size
+    self._queue = queue.SimpleQueue()
+    self._lock = threading.Lock()
+    self._workers = []
+    self._idle = 0
+    self._backlog = 0
+
+  @property
+  def size(self):
+    """
+    Returns:
+      (int) : the maximum number of worker threads, None for unbounded
+    """
+    return self._size
+
+  @property
+  def workers(self):
+    """
+    Returns:
+      (int) : the number of worker threads created
+    """
+    return len(self._workers)
+
+  def submit(self, task):
+    """
+    Queues a task to be run by the next available worker
+
+    Args:
+      task (Task) : the task to be run
+    """
+    with self._lock:
+      self._backlog += 1
+      if (self._backlog > self._idle and
+          (self._size is None or len(self._workers) < self._size)):
+        worker = threading.Thread(
+          target=self._work, daemon=True,
+          name='taskrun-worker-{}'.format(len(self._workers)))
+        self._workers.append(worker)
+        self._idle += 1
+        worker.start()
+    self._queue.put(task)
+
+  def shutdown(self):
+    """
+    Stops all worker threads after all submitted tasks have been run
+    """
+    with self._lock:
+      workers = self._workers
+      self._workers = []
+    for _ in workers:
+      self._queue.put(None)
+    for worker in workers:
+      worker.join()
+
+  def _work(self):
+    """
+    This is the main loop of each worker thread
+    """
+    while True:
+      task = self._queue.get()
+      if task is None:
+        return
+      with self._lock:
+        self._idle -= 1
+        self._backlog -= 1
+      try:
+        task.run()
+      except Exception:  # pylint: disable=broad-except
+        # keep the worker alive, a thread per task would have died here
+        traceback.print_exc()
+      with self._lock:
+        self._idle += 1
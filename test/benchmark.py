@@ -47,64 +47,92 @@ def func(first, second, *args, **kwargs):
   assert 'dad' in kwargs
   assert kwargs['dad'] == False
 
+def burn(count):
+  total = 0
+  for value in range(count):
+    total += value * value
+  return 0 if total >= 0 else 1
+
 num = 3000
 cpus = os.cpu_count()
 print('Using {} cpus for benchmarking'.format(cpus))
 assert cpus > 0
 
-def get_tm():
-  rm = taskrun.ResourceManager(taskrun.CounterResource('cpu', 1, cpus))
-  tm = taskrun.TaskManager(resource_manager=rm)
+def get_tm(engine=taskrun.ExecutionEngine.THREAD_PER_TASK, limited=False):
+  resources = [taskrun.CounterResource('cpu', 1, cpus)]
+  if limited:
+    # the memory limit is set in each process like standard_task_manager()
+    resources.append(taskrun.MemoryResource('mem', 1, cpus))
+  rm = taskrun.ResourceManager(*resources)
+  tm = taskrun.TaskManager(resource_manager=rm, engine=engine)
   return tm
 
-# Process task
-print('\n*** ProcessTask ***')
-start = time.time()
-tm = get_tm()
-for idx in range(num):
-  taskrun.ProcessTask(tm, 'Task_{0:04d}'.format(idx), 'true')
-stop = time.time()
-elapsed = stop - start
-print('setup time: {0:.3f}s'.format(elapsed))
-start = time.time()
-tm.run_tasks()
-stop = time.time()
-elapsed = stop - start
-print('tasks per second: {0:.3f}'
-      .format(num / elapsed))
+# Process task with shell and argv commands, with and without memory limits
+for command, limited in [('true', False), (['true'], False), ('true', True),
+                         (['true'], True)]:
+  print('\n*** ProcessTask ({}{}) ***'.format(
+    'shell' if isinstance(command, str) else 'argv',
+    ', limited' if limited else ''))
+  start = time.time()
+  tm = get_tm(limited=limited)
+  for idx in range(num):
+    taskrun.ProcessTask(tm, 'Task_{0:04d}'.format(idx), command)
+  stop = time.time()
+  elapsed = stop - start
+  print('setup time: {0:.3f}s'.format(elapsed))
+  start = time.time()
+  tm.run_tasks()
+  stop = time.time()
+  elapsed = stop - start
+  print('tasks per second: {0:.3f}'
+        .format(num / elapsed))
 
-# Function task
-print('\n*** FunctionTask ***')
-start = time.time()
-tm = get_tm()
-for idx in range(num):
-  taskrun.FunctionTask(tm, 'Task_{0:04d}'.format(idx),
-                       func, 'you', 'me', 'yall', mom=True, dad=False)
-stop = time.time()
-elapsed = stop - start
-print('setup time: {0:.3f}s'.format(elapsed))
-start = time.time()
-tm.run_tasks()
-stop = time.time()
-elapsed = stop - start
-print('tasks per second: {0:.3f}'
-      .format(num / elapsed))
+# Function task and Nop task for each execution engine
+for engine in taskrun.ExecutionEngine:
+  print('\n*** FunctionTask ({}) ***'.format(engine.name))
+  start = time.time()
+  tm = get_tm(engine)
+  for idx in range(num):
+    taskrun.FunctionTask(tm, 'Task_{0:04d}'.format(idx),
+                         func, 'you', 'me', 'yall', mom=True, dad=False)
+  stop = time.time()
+  elapsed = stop - start
+  print('setup time: {0:.3f}s'.format(elapsed))
+  start = time.time()
+  tm.run_tasks()
+  stop = time.time()
+  elapsed = stop - start
+  print('tasks per second: {0:.3f}'
+        .format(num / elapsed))
 
-# Nop task
-print('\n*** NopTask ***')
-start = time.time()
-tm = get_tm()
-for idx in range(num):
-  taskrun.NopTask(tm, 'Task_{0:04d}'.format(idx))
-stop = time.time()
-elapsed = stop - start
-print('setup time: {0:.3f}s'.format(elapsed))
-start = time.time()
-tm.run_tasks()
-stop = time.time()
-elapsed = stop - start
-print('tasks per second: {0:.3f}'
-      .format(num / elapsed))
+  print('\n*** NopTask ({}) ***'.format(engine.name))
+  start = time.time()
+  tm = get_tm(engine)
+  for idx in range(num):
+    taskrun.NopTask(tm, 'Task_{0:04d}'.format(idx))
+  stop = time.time()
+  elapsed = stop - start
+  print('setup time: {0:.3f}s'.format(elapsed))
+  start = time.time()
+  tm.run_tasks()
+  stop = time.time()
+  elapsed = stop - start
+  print('tasks per second: {0:.3f}'
+        .format(num / elapsed))
+
+# CPU bound function calls in threads vs the process pool
+for task_type in [taskrun.FunctionTask, taskrun.ProcessPoolFunctionTask]:
+  print('\n*** CPU bound {} ***'.format(task_type.__name__))
+  cnum = 200
+  tm = get_tm()
+  for idx in range(cnum):
+    task_type(tm, 'Task_{0:04d}'.format(idx), burn, 200000)
+  start = time.time()
+  tm.run_tasks()
+  stop = time.time()
+  elapsed = stop - start
+  print('tasks per second: {0:.3f}'
+        .format(cnum / elapsed))
 
 # Cluster task
 print('\n*** ClusterTask ***')
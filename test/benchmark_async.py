@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import asyncio
+import threading
+import time
+
+import taskrun
+
+
+NUM = 10000
+SLEEP = 0.5
+
+
+def threaded(engine):
+  tm = taskrun.TaskManager(engine=engine)
+  for idx in range(NUM):
+    taskrun.FunctionTask(tm, 'Task_{0:06d}'.format(idx), time.sleep, SLEEP)
+  peak = threading.active_count()
+  def watch():
+    nonlocal peak
+    while not done.is_set():
+      peak = max(peak, threading.active_count())
+      time.sleep(0.01)
+  done = threading.Event()
+  watcher = threading.Thread(target=watch)
+  watcher.start()
+  start = time.time()
+  tm.run_tasks()
+  elapsed = time.time() - start
+  done.set()
+  watcher.join()
+  return elapsed, peak
+
+
+def coroutines():
+  tm = taskrun.TaskManager()
+  for idx in range(NUM):
+    taskrun.AsyncFunctionTask(tm, 'Task_{0:06d}'.format(idx), asyncio.sleep,
+                              SLEEP)
+  start = time.time()
+  asyncio.run(tm.run_tasks_async())
+  return time.time() - start, threading.active_count()
+
+
+print('\n*** {} concurrent {}s sleeps ***'.format(NUM, SLEEP))
+print('{0:>30} {1:>10} {2:>12}'.format('mode', 'seconds', 'peak threads'))
+for engine in taskrun.ExecutionEngine:
+  elapsed, peak = threaded(engine)
+  print('{0:>30} {1:>10.3f} {2:>12}'.format(
+    'run_tasks ' + engine.name, elapsed, peak))
+elapsed, peak = coroutines()
+print('{0:>30} {1:>10.3f} {2:>12}'.format('run_tasks_async', elapsed, peak))
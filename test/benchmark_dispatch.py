@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import random
+import time
+
+import taskrun
+
+
+class Item:
+  def __init__(self, priority):
+    self.priority = priority
+
+
+class ListOfLists:
+  """The ready list structure TaskManager used before ReadyQueue."""
+
+  def __init__(self, levels):
+    self._levels = levels
+    self._lists = [[] for _ in range(levels)]
+
+  def push(self, task):
+    self._lists[task.priority].append(task)
+
+  def pop(self):
+    assert sum(map(len, self._lists)) > 0
+    for priority in reversed(range(self._levels)):
+      if len(self._lists[priority]) > 0:
+        task = self._lists[priority][0]
+        break
+    self._lists[task.priority].remove(task)
+    return task
+
+
+def bench(queue, levels, count, pops=2000):
+  rnd = random.Random(12345)
+  for _ in range(count):
+    queue.push(Item(rnd.randrange(levels)))
+  start = time.perf_counter()
+  for _ in range(pops):
+    # keep the queue size constant while dispatching
+    queue.push(Item(rnd.randrange(levels)))
+    queue.pop()
+  stop = time.perf_counter()
+  return (stop - start) / pops * 1e6
+
+
+print('dispatch cost in microseconds per task (push + pop)')
+print('{0:>8} {1:>8} {2:>12} {3:>12}'.format(
+  'levels', 'ready', 'ReadyQueue', 'list-of-lists'))
+for levels in [16, 64, 256]:
+  for count in [1000, 10000, 100000]:
+    rq = bench(taskrun.ReadyQueue(), levels, count)
+    ll = bench(ListOfLists(levels), levels, count)
+    print('{0:>8} {1:>8} {2:>12.3f} {3:>12.3f}'.format(levels, count, rq, ll))
+
+# full TaskManager dispatch with 100k ready tasks over 64 priorities
+num = 100000
+print('\n*** NopTask dispatch, {} tasks, 64 priorities ***'.format(num))
+rnd = random.Random(12345)
+rm = taskrun.ResourceManager(taskrun.CounterResource('slots', 1, 4))
+tm = taskrun.TaskManager(resource_manager=rm, engine='worker_pool')
+for idx in range(num):
+  taskrun.NopTask(tm, 'Task_{0:06d}'.format(idx)).priority = rnd.randrange(64)
+start = time.time()
+tm.run_tasks()
+elapsed = time.time() - start
+print('tasks per second: {0:.3f}'.format(num / elapsed))
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import random
+import time
+
+import taskrun
+
+
+num_tasks = 100000
+num_edges = 1000000
+checked_edges = 2000
+
+
+def make_edges(tasks, count, seed=12345):
+  # random DAG: each task depends on tasks created before it
+  rnd = random.Random(seed)
+  edges = set()
+  while len(edges) < count:
+    idx = rnd.randrange(1, len(tasks))
+    dep = rnd.randrange(idx)
+    edges.add((idx, dep))
+  return [(tasks[idx], tasks[dep]) for idx, dep in sorted(edges)]
+
+
+print('*** Graph construction, {} tasks, {} edges ***'.format(
+  num_tasks, num_edges))
+tm = taskrun.TaskManager()
+start = time.time()
+tasks = [taskrun.NopTask(tm, 'Task_{0:06d}'.format(idx))
+         for idx in range(num_tasks)]
+print('task creation time: {0:.3f}s'.format(time.time() - start))
+edges = make_edges(tasks, num_edges)
+
+start = time.time()
+tm.add_dependencies(edges[:-checked_edges])
+elapsed = time.time() - start
+print('add_dependencies() build time: {0:.3f}s ({1:.3f}us per edge)'.format(
+  elapsed, elapsed / (num_edges - checked_edges) * 1e6))
+
+start = time.time()
+tm.check_cycles()
+elapsed = time.time() - start
+print('check_cycles() time: {0:.3f}s'.format(elapsed))
+
+# per edge checks on the rest, the full graph would take far too long
+start = time.time()
+for task, dep in edges[-checked_edges:]:
+  task.add_dependency(dep)
+elapsed = time.time() - start
+print('add_dependency() with checks: {0:.3f}us per edge ({1} edges)'.format(
+  elapsed / checked_edges * 1e6, checked_edges))
+
+
+def bfs_check(task, dep):
+  # the per-edge BFS cycle check add_dependency() used to perform
+  visit = [dep]
+  visited = set()
+  while visit:
+    curr = visit.pop()
+    if curr is task:
+      raise ValueError('cyclic dependency found')
+    visited.add(curr)
+    for other in curr.get_dependencies():
+      if other not in visited:
+        visit.append(other)
+
+
+chain = 200000
+print('\n*** Incremental checks, chain of {} edges ***'.format(chain))
+tm = taskrun.TaskManager()
+tasks = [taskrun.NopTask(tm, 'Task_{0:06d}'.format(idx))
+         for idx in range(chain + 1)]
+print('{0:>8} {1:>12}'.format('edges', 'us per edge'))
+start = time.time()
+last = start
+for idx in range(1, chain + 1):
+  tasks[idx].add_dependency(tasks[idx - 1])
+  if idx % (chain // 5) == 0:
+    now = time.time()
+    print('{0:>8} {1:>12.3f}'.format(idx, (now - last) / (chain // 5) * 1e6))
+    last = now
+print('total time: {0:.3f}s'.format(time.time() - start))
+
+bfs_edges = 5000
+start = time.time()
+for idx in range(1, bfs_edges + 1):
+  bfs_check(tasks[idx], tasks[idx - 1])
+print('old BFS check over the first {0} edges: {1:.3f}s'.format(
+  bfs_edges, time.time() - start))
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import asyncio
+import os
+import subprocess
+import threading
+import time
+
+import taskrun
+
+
+NUM = 5000
+
+
+def blocking(command):
+  # the previous ProcessTask behavior, a thread blocked per process
+  proc = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, start_new_session=True)
+  proc.communicate()
+  return proc.returncode
+
+
+def measure(tm, run):
+  peak = threading.active_count()
+  done = threading.Event()
+  def watch():
+    nonlocal peak
+    while not done.is_set():
+      peak = max(peak, threading.active_count())
+      done.wait(0.001)
+  watcher = threading.Thread(target=watch)
+  watcher.start()
+  start = time.time()
+  run()
+  elapsed = time.time() - start
+  done.set()
+  watcher.join()
+  return elapsed, peak - 1  # exclude the watcher
+
+
+def get_tm(engine):
+  rm = taskrun.ResourceManager(taskrun.CounterResource(
+    'cpus', 1, os.cpu_count() * 8))
+  return taskrun.TaskManager(resource_manager=rm, engine=engine)
+
+
+print('\n*** {} true commands ***'.format(NUM))
+print('{0:>36} {1:>12} {2:>12}'.format('mode', 'tasks/second',
+                                       'peak threads'))
+for engine in taskrun.ExecutionEngine:
+  tm = get_tm(engine)
+  for idx in range(NUM):
+    taskrun.FunctionTask(tm, 'Task_{0:05d}'.format(idx), blocking, 'true')
+  elapsed, peak = measure(tm, tm.run_tasks)
+  print('{0:>36} {1:>12.1f} {2:>12}'.format(
+    'blocking threads ' + engine.name, NUM / elapsed, peak))
+
+  tm = get_tm(engine)
+  for idx in range(NUM):
+    taskrun.ProcessTask(tm, 'Task_{0:05d}'.format(idx), 'true')
+  elapsed, peak = measure(tm, tm.run_tasks)
+  print('{0:>36} {1:>12.1f} {2:>12}'.format(
+    'supervised ' + engine.name, NUM / elapsed, peak))
+
+tm = get_tm(taskrun.ExecutionEngine.THREAD_PER_TASK)
+for idx in range(NUM):
+  taskrun.ProcessTask(tm, 'Task_{0:05d}'.format(idx), 'true')
+elapsed, peak = measure(tm, lambda: asyncio.run(tm.run_tasks_async()))
+print('{0:>36} {1:>12.1f} {2:>12}'.format(
+  'supervised run_tasks_async', NUM / elapsed, peak))
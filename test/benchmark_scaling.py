@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import time
+
+import taskrun
+
+
+def run(num, engine):
+  rm = taskrun.ResourceManager(taskrun.CounterResource('slots', 1, 4))
+  tm = taskrun.TaskManager(resource_manager=rm, engine=engine)
+  for idx in range(num):
+    taskrun.NopTask(tm, 'Task_{0:06d}'.format(idx))
+  start = time.time()
+  tm.run_tasks()
+  return time.time() - start
+
+
+for engine in taskrun.ExecutionEngine:
+  print('\n*** NopTask scaling ({}) ***'.format(engine.name))
+  print('{0:>8} {1:>10} {2:>12}'.format('tasks', 'seconds', 'us per task'))
+  for num in [10000, 50000, 100000, 500000]:
+    elapsed = run(num, engine)
+    print('{0:>8} {1:>10.3f} {2:>12.3f}'.format(
+      num, elapsed, elapsed / num * 1e6))
@@ -0,0 +1,147 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import asyncio
+import unittest
+from unittest import mock
+import taskrun
+from .OrderCheckObserver import OrderCheckObserver
+
+
+def get_cond_func(execute):
+  def cond(*args, **kwargs):
+    return execute
+  return cond
+
+
+class AsyncTestCase(unittest.TestCase):
+  def test_dependencies(self):
+    ob = OrderCheckObserver(['@t1', '@t2', '@t3', '+t1', '-t1', '+t2', '-t2',
+                             '+t3', '-t3'])
+    tm = taskrun.TaskManager(observers=[ob])
+    t1 = taskrun.AsyncFunctionTask(tm, 't1', asyncio.sleep, 0.01)
+    t2 = taskrun.FunctionTask(tm, 't2', lambda: None)
+    t3 = taskrun.NopTask(tm, 't3')
+    t3.add_dependency(t2)
+    t2.add_dependency(t1)
+    self.assertTrue(asyncio.run(tm.run_tasks_async()))
+    self.assertTrue(ob.ok())
+
+  def test_resources_and_priorities(self):
+    ob = OrderCheckObserver(['@t1', '@t2', '@t3', '@t4', '+t1', '-t1', '+t4',
+                             '*t3', '-t4', '+t2', '-t2'])
+    rm = taskrun.ResourceManager(taskrun.CounterResource('slots', 1, 1))
+    tm = taskrun.TaskManager(resource_manager=rm, observers=[ob])
+    t1 = taskrun.AsyncFunctionTask(tm, 't1', asyncio.sleep, 0.01)
+    t2 = taskrun.AsyncFunctionTask(tm, 't2', asyncio.sleep, 0.01)
+    t3 = taskrun.AsyncFunctionTask(tm, 't3', asyncio.sleep, 0.01)
+    t3.priority = 1
+    t3.add_condition(taskrun.FunctionCondition(get_cond_func(False)))
+    t4 = taskrun.AsyncFunctionTask(tm, 't4', asyncio.sleep, 0.01)
+    t4.priority = 2
+    for task in (t2, t3, t4):
+      task.add_dependency(t1)
+    self.assertTrue(asyncio.run(tm.run_tasks_async()))
+    self.assertTrue(ob.ok())
+
+  def test_concurrency(self):
+    rm = taskrun.ResourceManager(taskrun.CounterResource('slots', 1, 5))
+    tm = taskrun.TaskManager(resource_manager=rm)
+    active = [0, 0]  # current, max
+
+    async def work():
+      active[0] += 1
+      active[1] = max(active)
+      await asyncio.sleep(0.01)
+      active[0] -= 1
+
+    for index in range(50):
+      taskrun.AsyncFunctionTask(tm, 't{}'.format(index), work)
+    self.assertTrue(asyncio.run(tm.run_tasks_async()))
+    self.assertEqual(active[1], 5)
+
+  def test_process(self):
+    ob = OrderCheckObserver(['@t1', '@t2', '+t1', '-t1', '+t2', '!t2'])
+    tm = taskrun.TaskManager(observers=[ob])
+    t1 = taskrun.ProcessTask(tm, 't1', 'echo hello')
+    t2 = taskrun.ProcessTask(tm, 't2', 'exit 3')
+    t2.add_dependency(t1)
+    self.assertFalse(asyncio.run(tm.run_tasks_async()))
+    self.assertTrue(ob.ok())
+    self.assertEqual(t1.stdout, 'hello\n')
+    self.assertEqual(t2.returncode, 3)
+
+  def test_aggressive_kill(self):
+    tm = taskrun.TaskManager()
+    t1 = taskrun.AsyncFunctionTask(tm, 't1', asyncio.sleep, 10)
+    t2 = taskrun.ProcessTask(tm, 't2', 'sleep 10')
+
+    async def fail():
+      await asyncio.sleep(0.1)
+      return 1
+    taskrun.AsyncFunctionTask(tm, 't3', fail)
+
+    self.assertFalse(asyncio.run(asyncio.wait_for(tm.run_tasks_async(), 5)))
+    self.assertTrue(t1.killed)
+    self.assertTrue(t2.killed)
+
+  def test_spawn(self):
+    tm = taskrun.TaskManager()
+    results = []
+
+    async def scan():
+      for index in range(10):
+        taskrun.AsyncFunctionTask(tm, 'c{}'.format(index), collect, index)
+      await asyncio.sleep(0)
+
+    async def collect(index):
+      results.append(index)
+
+    taskrun.AsyncFunctionTask(tm, 'scan', scan)
+    self.assertTrue(asyncio.run(tm.run_tasks_async()))
+    self.assertEqual(sorted(results), list(range(10)))
+
+  def test_threaded(self):
+    ob = OrderCheckObserver(['@t1', '+t1', '-t1'])
+    tm = taskrun.TaskManager(observers=[ob])
+    taskrun.AsyncFunctionTask(tm, 't1', asyncio.sleep, 0.01)
+    self.assertTrue(tm.run_tasks())
+    self.assertTrue(ob.ok())
+
+  def test_failed_start(self):
+    tm = taskrun.TaskManager()
+    t1 = taskrun.FunctionTask(tm, 't1', lambda: None)
+    t2 = taskrun.AsyncFunctionTask(tm, 't2', asyncio.sleep, 0.01)
+    tm.add_dependencies([(t2, t1)])
+    # the deferred cycle check fails before the run starts
+    with mock.patch.object(tm, 'check_cycles', side_effect=ValueError):
+      with self.assertRaises(ValueError):
+        asyncio.run(tm.run_tasks_async())
+    self.assertTrue(tm.run_tasks())
@@ -0,0 +1,113 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import time
+import unittest
+import taskrun
+from .OrderCheckObserver import OrderCheckObserver
+
+
+def sleeper(secs):
+  def func():
+    time.sleep(secs)
+  return func
+
+def make_task(tm, name, slots, secs, priority, estimate=True):
+  task = taskrun.FunctionTask(tm, name, sleeper(secs))
+  task.resources = {'slots': slots}
+  task.priority = priority
+  if estimate:
+    task.estimated_runtime = secs
+  return task
+
+def starts(ob):
+  return [event[1:] for event in ob.actual() if event.startswith('+')]
+
+class BackfillTestCase(unittest.TestCase):
+  def build(self, backfill, backfill_window=1000):
+    ob = OrderCheckObserver([])
+    rm = taskrun.ResourceManager(taskrun.CounterResource('slots', 1, 4))
+    tm = taskrun.TaskManager(resource_manager=rm, observers=[ob],
+                             backfill=backfill, backfill_window=backfill_window)
+    make_task(tm, 'long', 2, 0.6, 4)
+    make_task(tm, 'big', 4, 0.05, 3)
+    make_task(tm, 'short1', 1, 0.05, 2)
+    make_task(tm, 'short2', 1, 0.05, 2)
+    make_task(tm, 'short3', 1, 0.05, 2)
+    make_task(tm, 'forever', 1, 0.05, 1, estimate=False)
+    make_task(tm, 'toolong', 1, 2.0, 1)
+    return tm, ob
+
+  def test_no_backfill(self):
+    tm, ob = self.build(False)
+    self.assertTrue(tm.run_tasks())
+    self.assertEqual(starts(ob), ['long', 'big', 'short1', 'short2', 'short3',
+                                  'forever', 'toolong'])
+
+  def test_backfill(self):
+    tm, ob = self.build(True)
+    start = time.time()
+    self.assertTrue(tm.run_tasks())
+    elapsed = time.time() - start
+    # the short tasks fill the idle slots, the others would delay 'big'
+    self.assertEqual(starts(ob), ['long', 'short1', 'short2', 'short3', 'big',
+                                  'forever', 'toolong'])
+    self.assertLess(elapsed, 0.6 + 0.05 + 2.0 + 0.5)
+
+  def test_window(self):
+    # a window of one only holds the head, nothing is backfilled
+    tm, ob = self.build(True, 1)
+    self.assertTrue(tm.run_tasks())
+    self.assertEqual(starts(ob), ['long', 'big', 'short1', 'short2', 'short3',
+                                  'forever', 'toolong'])
+    # a window of two reaches the next task
+    tm, ob = self.build(True, 2)
+    self.assertTrue(tm.run_tasks())
+    self.assertEqual(starts(ob)[:2], ['long', 'short1'])
+
+  def test_reservation(self):
+    cr = taskrun.CounterResource('slots', 1, 4)
+    rm = taskrun.ResourceManager(cr)
+    tm = taskrun.TaskManager(resource_manager=rm)
+    running1 = make_task(tm, 'r1', 1, 10, 0)
+    running2 = make_task(tm, 'r2', 2, 5, 0)
+    head = make_task(tm, 'head', 3, 1, 0)
+    self.assertTrue(rm.start(running1))
+    self.assertTrue(rm.start(running2))
+    res = taskrun.Reservation(rm, head, {running1: 0, running2: 0}, 0)
+    # r2 releases at 5 leaving 3 available, exactly enough
+    self.assertEqual(res.shadow, 5)
+    self.assertTrue(res.permits(make_task(tm, 'ok', 1, 5, 0)))
+    self.assertFalse(res.permits(make_task(tm, 'late', 1, 6, 0)))
+    self.assertFalse(res.permits(make_task(tm, 'unknown', 1, 1, 0, False)))
+    # with an unknown end time there is no shadow, nothing is extra
+    res = taskrun.Reservation(rm, head, {running1: 0, running2: None}, 0)
+    self.assertIsNone(res.shadow)
+    self.assertFalse(res.permits(make_task(tm, 'short', 1, 0.1, 0)))
@@ -0,0 +1,79 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import unittest
+import taskrun
+
+
+class CaptureTestCase(unittest.TestCase):
+  def test_buffer(self):
+    buf = taskrun.OutputBuffer(10)
+    for chunk in [b'0123', b'4567', b'89ab']:
+      buf.write(chunk)
+    self.assertEqual(buf.getvalue(), b'23456789ab')
+    self.assertEqual(buf.total, 12)
+    self.assertTrue(buf.truncated)
+    buf.write(b'cdefghijklmnop')
+    self.assertEqual(buf.getvalue(), b'ghijklmnop')
+    self.assertEqual(buf.total, 26)
+
+    buf = taskrun.OutputBuffer()
+    buf.write(b'\xffabc')
+    self.assertEqual(buf.text(), '�abc')
+    self.assertFalse(buf.truncated)
+
+  def test_bounded(self):
+    tm = taskrun.TaskManager(capture_limit=1024)
+    t1 = taskrun.ProcessTask(
+      tm, 't1', 'head -c 1000000 /dev/zero | tr "\\0" a; echo -n end 1>&2')
+    t2 = taskrun.ProcessTask(tm, 't2', 'printf "\\377ok"')
+    t2.capture_limit = None
+    self.assertTrue(tm.run_tasks())
+    self.assertEqual(t1.stdout, 'a' * 1024)
+    self.assertEqual(t1.stdout_capture.total, 1000000)
+    self.assertTrue(t1.stdout_capture.truncated)
+    self.assertEqual(t1.stderr, 'end')
+    self.assertEqual(t2.stdout, '�ok')
+
+  def test_raw(self):
+    tm = taskrun.TaskManager()
+    t1 = taskrun.ProcessTask(tm, 't1', 'printf "\\377ok"')
+    t1.capture_raw = True
+    t1.capture_limit = 2
+    self.assertTrue(tm.run_tasks())
+    self.assertEqual(t1.stdout, b'ok')
+    self.assertEqual(t1.stderr, b'')
+
+  def test_standard(self):
+    tm = taskrun.standard_task_manager(verbosity=0, capture_limit=64,
+                                       capture_raw=True)
+    t1 = taskrun.ProcessTask(tm, 't1', 'true')
+    self.assertEqual(t1.capture_limit, 64)
+    self.assertTrue(t1.capture_raw)
@@ -0,0 +1,266 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import os
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock
+import taskrun
+from taskrun import cluster_backend
+from .OccurredCheckObserver import OccurredCheckObserver
+
+
+FAKESLURM = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'testprogs', 'fakeslurm')
+
+
+class ClusterBackendTestCase(unittest.TestCase):
+  def setUp(self):
+    # put the fake scheduler commands first in the PATH
+    self._state = tempfile.mkdtemp()
+    bindir = tempfile.mkdtemp()
+    for command in ['sbatch', 'sacct', 'scancel']:
+      os.symlink(FAKESLURM, os.path.join(bindir, command))
+    patches = [
+      unittest.mock.patch.dict(os.environ, {
+        'PATH': bindir + os.pathsep + os.environ['PATH'],
+        'FAKESLURM_DIR': self._state}),
+      unittest.mock.patch.object(taskrun.ClusterBackend, 'POLL_MIN', 0.05),
+      unittest.mock.patch.object(taskrun.ClusterBackend, 'POLL_MAX', 0.2)]
+    for patch in patches:
+      patch.start()
+      self.addCleanup(patch.stop)
+
+  def _polls(self):
+    with open(os.path.join(self._state, 'sacct.log')) as fd:
+      return len(fd.readlines())
+
+  def test_submit(self):
+    tm = taskrun.TaskManager(failure_mode='blind_continue')
+    out = tempfile.mkdtemp()
+    tasks = []
+    for idx in range(40):
+      task = taskrun.ClusterTask(tm, f'job{idx}',
+                                 f'sleep 0.2; echo {idx}; exit {idx % 3}',
+                                 'slurm')
+      task.asynchronous = True
+      task.stdout_file = os.path.join(out, f'job{idx}.out')
+      tasks.append(task)
+    self.assertEqual(
+      tasks[0].describe(),
+      'sbatch --parsable -J job0 -o {} -e /dev/null '
+      '--wrap=\'sleep 0.2; echo 0; exit 0\''.format(tasks[0].stdout_file))
+    threads = threading.active_count()
+    self.assertFalse(tm.run_tasks())
+    self.assertLessEqual(threading.active_count(), threads)
+    for idx, task in enumerate(tasks):
+      self.assertIsNotNone(task.job_id)
+      self.assertEqual(task.returncode, idx % 3)
+      with open(task.stdout_file) as fd:
+        self.assertEqual(fd.read(), f'{idx}\n')
+    # all the jobs are tracked by batched queries
+    self.assertLess(self._polls(), len(tasks))
+
+  def test_kill(self):
+    tm = taskrun.TaskManager()
+    t1 = taskrun.ClusterTask(tm, 't1', 'sleep 60', 'slurm')
+    t1.asynchronous = True
+    t2 = taskrun.ProcessTask(tm, 't2', 'sleep 0.5; false')
+    self.assertFalse(tm.run_tasks())
+    self.assertTrue(t1.killed)
+    self.assertEqual(t1.returncode, -15)
+    self.assertTrue(os.path.exists(
+      os.path.join(self._state, t1.job_id + '.cancelled')))
+
+  def test_submit_failure(self):
+    tm = taskrun.TaskManager()
+    t1 = taskrun.ClusterTask(tm, 't1', 'true', 'slurm')
+    t1.asynchronous = True
+    with unittest.mock.patch.dict(os.environ, {'FAKESLURM_DIR': '/nonexistent'}):
+      self.assertFalse(tm.run_tasks())
+    self.assertIsNone(t1.job_id)
+    self.assertNotEqual(t1.returncode, 0)
+
+  def test_parsers(self):
+    self.assertEqual(taskrun.ClusterBackend.parse_job_id('slurm', '12;c\n'),
+                     '12')
+    self.assertEqual(taskrun.ClusterBackend.parse_job_id('sge', '34\n'), '34')
+    self.assertEqual(taskrun.ClusterBackend.parse_job_id(
+      'lsf', 'Job <56> is submitted to queue <normal>.\n'), '56')
+    self.assertEqual(cluster_backend.parse_sacct(
+      '1|RUNNING|0:0\n2|COMPLETED|0:0\n3|FAILED|2:0\n4|TIMEOUT|0:0\n'),
+      {None: {'1', '2', '3', '4'}, '2': 0, '3': 2, '4': 1})
+    self.assertEqual(cluster_backend.parse_sacct(
+      '5_1|COMPLETED|0:0\n5_2|CANCELLED by 1|0:15\n5_[3-5%2]|PENDING|0:0\n'),
+      {None: {'5_1', '5_2', '5_3', '5_4', '5_5'}, '5_1': 0, '5_2': -15})
+    self.assertEqual(cluster_backend.parse_bjobs(
+      '1 0 RUN -\n2 0 DONE -\n3 0 EXIT 4\n6 1 DONE -\n6 2 PEND -\n'),
+      {None: {'1', '2', '3', '6[1]', '6[2]'}, '2': 0, '3': 4, '6[1]': 0})
+    self.assertEqual(cluster_backend.parse_qstat(
+      'job-ID prior name user state submit/start at queue slots ja-task-ID\n'
+      '-----\n'
+      ' 7 0.5 a u r 01/01/2020 10:00:00 all.q@h1 1\n'
+      ' 8 0.5 b u qw 01/01/2020 10:00:00 1\n'
+      ' 9 0.5 c u r 01/01/2020 10:00:00 all.q@h1 1 2\n'
+      ' 9 0.5 c u qw 01/01/2020 10:00:00 1 3-7:2\n'),
+      {'7', '8', '9', '9.2', '9.3', '9.5', '9.7'})
+    self.assertEqual(cluster_backend.parse_qacct(
+      'jobnumber    9\ntaskid       undefined\nfailed       0\n'
+      'exit_status  3\n'
+      'jobnumber    10\ntaskid       4\n'
+      'failed       100 : assumedly after job\nexit_status  0\n'),
+      {'9': 3, '10.4': 1})
+
+  def test_array(self):
+    tm = taskrun.TaskManager(failure_mode='blind_continue')
+    out = tempfile.mkdtemp()
+    tasks = []
+    for idx in range(30):
+      task = taskrun.ClusterTask(tm, f'sweep{idx}',
+                                 f"echo 'arg {idx}'; exit {idx % 4}", 'slurm')
+      task.asynchronous = True
+      task.stdout_file = os.path.join(out, f'sweep{idx}.out')
+      tasks.append(task)
+    other = taskrun.ClusterTask(tm, 'other', 'true', 'slurm')
+    other.asynchronous = True
+    other.cluster_options = ['--exclusive']
+    ob = OccurredCheckObserver(
+      [f'+sweep{idx}' for idx in range(30)] +
+      [f'-sweep{idx}' for idx in range(0, 30, 4)] +
+      [f'!sweep{idx}' for idx in range(30) if idx % 4] + ['+other', '-other'])
+    tm.add_observer(ob)
+    script_dir = tempfile.mkdtemp()
+    with unittest.mock.patch.object(taskrun.ClusterBackend, 'SCRIPT_DIR',
+                                    script_dir):
+      self.assertFalse(tm.run_tasks())
+    self.assertTrue(ob.ok())
+    with open(os.path.join(self._state, 'sbatch.log')) as fd:
+      submissions = fd.readlines()
+    self.assertEqual(len(submissions), 2)
+    self.assertIn('--array=1-30', ''.join(submissions))
+    for idx, task in enumerate(tasks):
+      self.assertEqual(task.job_id, f'{tasks[0].job_id.split("_")[0]}_{idx + 1}')
+      self.assertEqual(task.returncode, idx % 4)
+      with open(task.stdout_file) as fd:
+        self.assertEqual(fd.read(), f'arg {idx}\n')
+    self.assertEqual(other.returncode, 0)
+    # the array script is removed when the array finishes
+    self.assertEqual(os.listdir(script_dir), [])
+
+  def test_array_kill(self):
+    tm = taskrun.TaskManager()
+    tasks = []
+    for idx in range(5):
+      task = taskrun.ClusterTask(tm, f'long{idx}', 'sleep 60', 'slurm')
+      task.asynchronous = True
+      tasks.append(task)
+    taskrun.ProcessTask(tm, 'fail', 'sleep 0.5; false')
+    script_dir = tempfile.mkdtemp()
+    with unittest.mock.patch.object(taskrun.ClusterBackend, 'SCRIPT_DIR',
+                                    script_dir):
+      self.assertFalse(tm.run_tasks())
+    for task in tasks:
+      self.assertTrue(task.killed)
+      self.assertTrue(os.path.exists(
+        os.path.join(self._state, task.job_id + '.cancelled')))
+
+  def _chain(self, count, queue_wait):
+    tm = taskrun.TaskManager()
+    out = os.path.join(tempfile.mkdtemp(), 'chain.out')
+    prev = None
+    for idx in range(count):
+      task = taskrun.ClusterTask(tm, f'link{idx}', f'echo {idx} >> {out}',
+                                 'slurm')
+      task.asynchronous = True
+      task.native_dependencies = True
+      if prev is not None:
+        task.add_dependency(prev)
+      prev = task
+    start = time.monotonic()
+    with unittest.mock.patch.dict(os.environ,
+                                  {'FAKESLURM_QUEUE_WAIT': queue_wait}):
+      self.assertTrue(tm.run_tasks())
+    elapsed = time.monotonic() - start
+    with open(out) as fd:
+      self.assertEqual(fd.read(), ''.join(f'{idx}\n' for idx in range(count)))
+    return elapsed
+
+  def test_native_dependencies(self):
+    with unittest.mock.patch.object(taskrun.ClusterBackend, 'ARRAY_WINDOW',
+                                    0.01):
+      base = self._chain(50, '0')
+      waited = self._chain(50, '1')
+    # the queue waits overlap instead of adding up to 50 seconds
+    self.assertLess(waited - base, 3.0)
+    with open(os.path.join(self._state, 'sbatch.log')) as fd:
+      self.assertIn('--dependency=afterok:', fd.read())
+
+  def test_native_dependency_failure(self):
+    tm = taskrun.TaskManager(failure_mode='active_continue')
+    t1 = taskrun.ClusterTask(tm, 't1', 'sleep 0.5; exit 1', 'slurm')
+    t2 = taskrun.ClusterTask(tm, 't2', 'true', 'slurm')
+    t3 = taskrun.ClusterTask(tm, 't3', 'true', 'slurm')
+    t4 = taskrun.ClusterTask(tm, 't4', 'true', 'slurm')
+    t5 = taskrun.NopTask(tm, 't5')
+    t2.add_dependency(t1)
+    t3.add_dependency(t2)
+    t5.add_dependency(t3)
+    for task in [t1, t2, t3, t4]:
+      task.asynchronous = True
+      task.native_dependencies = True
+    # killed tasks aren't reported as failed
+    ob = OccurredCheckObserver(['+t1', '!t1', '+t2', '+t3', '+t4', '-t4'])
+    tm.add_observer(ob)
+    self.assertFalse(tm.run_tasks())
+    self.assertTrue(ob.ok())
+    self.assertEqual(t1.returncode, 1)
+    for task in [t2, t3]:
+      # submitted before t1 failed then cancelled
+      self.assertIsNotNone(task.job_id)
+      self.assertTrue(task.killed)
+      self.assertEqual(task.kill_reason,
+                       'dependency {} failed'.format(task.get_dependencies()[0]
+                                                     .name))
+
+  def test_native_dependency_blind(self):
+    tm = taskrun.TaskManager(failure_mode='blind_continue')
+    t1 = taskrun.ClusterTask(tm, 't1', 'sleep 0.2; exit 1', 'slurm')
+    t2 = taskrun.ClusterTask(tm, 't2', 'true', 'slurm')
+    t2.add_dependency(t1)
+    for task in [t1, t2]:
+      task.asynchronous = True
+      task.native_dependencies = True
+    self.assertFalse(tm.run_tasks())
+    self.assertEqual(t1.returncode, 1)
+    self.assertEqual(t2.returncode, 0)
+    self.assertEqual(t2.describe().split()[4],
+                     '--dependency=afterany:' + t1.job_id)
@@ -0,0 +1,168 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import os
+import tempfile
+import time
+import unittest
+import unittest.mock
+import taskrun
+from .OccurredCheckObserver import OccurredCheckObserver
+
+
+FAKESLURM = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'testprogs', 'fakeslurm')
+
+
+class TimeObserver(taskrun.Observer):
+  def __init__(self):
+    self.times = {}
+
+  def task_completed(self, task):
+    self.times[task.name] = time.monotonic()
+
+
+class ClusterBundleTestCase(unittest.TestCase):
+  def setUp(self):
+    # put the fake scheduler commands first in the PATH
+    self._state = tempfile.mkdtemp()
+    self._dir = tempfile.mkdtemp()
+    bindir = tempfile.mkdtemp()
+    for command in ['sbatch', 'sacct', 'scancel']:
+      os.symlink(FAKESLURM, os.path.join(bindir, command))
+    patches = [
+      unittest.mock.patch.dict(os.environ, {
+        'PATH': bindir + os.pathsep + os.environ['PATH'],
+        'FAKESLURM_DIR': self._state}),
+      unittest.mock.patch.object(taskrun.ClusterBackend, 'POLL_MIN', 0.05),
+      unittest.mock.patch.object(taskrun.ClusterBackend, 'POLL_MAX', 0.2),
+      unittest.mock.patch.object(taskrun.ClusterBundle, 'WINDOW', 0.1)]
+    for patch in patches:
+      patch.start()
+      self.addCleanup(patch.stop)
+
+  def _submissions(self):
+    with open(os.path.join(self._state, 'sbatch.log')) as fd:
+      return fd.readlines()
+
+  def test_pack(self):
+    bundle = taskrun.ClusterBundle('slurm', parallelism=2, runtime=10)
+    tm = taskrun.TaskManager()
+    tasks = []
+    for idx, estimate in enumerate([8, 3, 12, 5, 9, None, 2]):
+      task = taskrun.ProcessTask(tm, f't{idx}', 'true')
+      task.estimated_runtime = estimate
+      tasks.append(task)
+    # unknown estimates count as the whole runtime, first fit decreasing
+    self.assertEqual([[task.name for task in job]
+                      for job in bundle.pack(tasks)],
+                     [['t2', 't0'], ['t5', 't4'], ['t3', 't1', 't6']])
+
+  def test_bundle(self):
+    tm = taskrun.TaskManager(failure_mode='blind_continue')
+    bundle = taskrun.ClusterBundle('slurm', parallelism=4, runtime=5,
+                                   directory=self._dir)
+    tasks = []
+    for idx in range(40):
+      task = taskrun.ProcessTask(tm, f'p{idx}', f'echo {idx}; exit {idx % 3}')
+      task.estimated_runtime = 1
+      task.bundle = bundle
+      tasks.append(task)
+    out = os.path.join(tempfile.mkdtemp(), 'c.out')
+    ctask = taskrun.ClusterTask(tm, 'c', 'echo cluster', 'slurm')
+    ctask.stdout_file = out
+    ctask.estimated_runtime = 1
+    ctask.bundle = bundle
+    after = taskrun.ProcessTask(tm, 'after', 'true')
+    after.add_dependency(tasks[0])
+    ob = OccurredCheckObserver(
+      [f'+p{idx}' for idx in range(40)] +
+      [f'-p{idx}' for idx in range(0, 40, 3)] +
+      [f'!p{idx}' for idx in range(40) if idx % 3] +
+      ['+c', '-c', '+after', '-after'])
+    tm.add_observer(ob)
+    self.assertFalse(tm.run_tasks())
+    self.assertTrue(ob.ok())
+    # 41 seconds of work in jobs of 4 slots for 5 seconds
+    self.assertEqual(len(self._submissions()), 3)
+    for idx, task in enumerate(tasks):
+      self.assertEqual(task.returncode, idx % 3)
+      self.assertEqual(task.stdout, f'{idx}\n')
+      self.assertEqual(task.stderr, '')
+    self.assertEqual(ctask.returncode, 0)
+    with open(out) as fd:
+      self.assertEqual(fd.read(), 'cluster\n')
+    # the directories of successful jobs are removed
+    self.assertEqual(os.listdir(self._dir), [])
+
+  def test_streaming(self):
+    tm = taskrun.TaskManager()
+    bundle = taskrun.ClusterBundle('slurm', parallelism=2,
+                                   directory=self._dir)
+    fast = taskrun.ProcessTask(tm, 'fast', 'true')
+    slow = taskrun.ProcessTask(tm, 'slow', 'sleep 1.5')
+    for task in [fast, slow]:
+      task.bundle = bundle
+    ob = TimeObserver()
+    tm.add_observer(ob)
+    self.assertTrue(tm.run_tasks())
+    self.assertEqual(len(self._submissions()), 1)
+    # each task completes when its command finishes, not with the job
+    self.assertLess(ob.times['fast'], ob.times['slow'] - 1.0)
+
+  def test_kill(self):
+    tm = taskrun.TaskManager()
+    bundle = taskrun.ClusterBundle('slurm', parallelism=2,
+                                   directory=self._dir)
+    tasks = []
+    for idx in range(2):
+      task = taskrun.ProcessTask(tm, f'long{idx}', 'sleep 60')
+      task.bundle = bundle
+      tasks.append(task)
+    taskrun.ProcessTask(tm, 'fail', 'sleep 1; false')
+    start = time.monotonic()
+    self.assertFalse(tm.run_tasks())
+    self.assertLess(time.monotonic() - start, 30)
+    for task in tasks:
+      self.assertTrue(task.killed)
+      self.assertIsNone(task.returncode)
+    # the job is cancelled once all its tasks are killed
+    self.assertEqual(
+      len([name for name in os.listdir(self._state)
+           if name.endswith('.cancelled')]), 1)
+
+  def test_submit_failure(self):
+    tm = taskrun.TaskManager()
+    bundle = taskrun.ClusterBundle('slurm', directory=self._dir)
+    task = taskrun.ProcessTask(tm, 't1', 'true')
+    task.bundle = bundle
+    with unittest.mock.patch.dict(os.environ, {'FAKESLURM_DIR': '/nonexistent'}):
+      self.assertFalse(tm.run_tasks())
+    self.assertIsNone(task.returncode)
@@ -28,10 +28,24 @@
  * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
  * POSSIBILITY OF SUCH DAMAGE.
 """
+import random
 import unittest
 import taskrun
 
 
+def reaches(src, dst):
+  # does src (transitively) depend on dst
+  visit = [src]
+  visited = set()
+  while visit:
+    curr = visit.pop()
+    if curr is dst:
+      return True
+    visited.add(curr)
+    visit.extend(d for d in curr.get_dependencies() if d not in visited)
+  return False
+
+
 class CyclicTestCase(unittest.TestCase):
   def test_selfcyclic(self):
     tm = taskrun.TaskManager()
@@ -64,3 +78,69 @@ class CyclicTestCase(unittest.TestCase):
     t2.add_dependency(t3)
     t3.add_dependency(t4)
     t4.add_dependency(t5)
+
+  def test_buildmode_nocycle(self):
+    tm = taskrun.TaskManager()
+    tasks = [taskrun.NopTask(tm, 't{}'.format(idx)) for idx in range(100)]
+    tm.add_dependencies((tasks[idx], tasks[idx - 1])
+                        for idx in range(1, len(tasks)))
+    with tm.build_mode():
+      self.assertTrue(tm.in_build_mode)
+      tasks[99].add_dependency(tasks[0])
+    self.assertFalse(tm.in_build_mode)
+    self.assertTrue(tm.run_tasks())
+
+  def test_buildmode_cycles(self):
+    tm = taskrun.TaskManager()
+    t1 = taskrun.NopTask(tm, 't1')
+    t2 = taskrun.NopTask(tm, 't2')
+    t3 = taskrun.NopTask(tm, 't3')
+    t4 = taskrun.NopTask(tm, 't4')
+    t5 = taskrun.NopTask(tm, 't5')
+    t6 = taskrun.NopTask(tm, 't6')
+    tm.add_dependencies([(t1, t2), (t2, t3), (t3, t1), (t4, t3),
+                         (t5, t5), (t6, t4)])
+    with self.assertRaises(ValueError) as context:
+      tm.run_tasks()
+    message = str(context.exception)
+    self.assertTrue(message.startswith('cyclic dependency found'))
+    self.assertEqual(message.count(';'), 1)
+    self.assertIn('t5 -> t5', message)
+    for name in ['t1', 't2', 't3']:
+      self.assertIn(name, message)
+    for name in ['t4', 't6']:
+      self.assertNotIn(name, message)
+    with self.assertRaises(ValueError):
+      tm.check_cycles()
+
+  def test_incremental_random(self):
+    rnd = random.Random(1234)
+    tm = taskrun.TaskManager()
+    tasks = [taskrun.NopTask(tm, 't{}'.format(idx)) for idx in range(60)]
+    for _ in range(600):
+      task = rnd.choice(tasks)
+      dep = rnd.choice(tasks)
+      if dep in task.get_dependencies():
+        continue
+      cyclic = reaches(dep, task)
+      if cyclic:
+        with self.assertRaises(ValueError):
+          task.add_dependency(dep)
+      else:
+        task.add_dependency(dep)
+      # the maintained order must be topological
+      for curr in tasks:
+        for dep in curr.get_dependencies():
+          self.assertLess(dep._order, curr._order)
+    self.assertTrue(tm.run_tasks())
+
+  def test_incremental_after_buildmode(self):
+    tm = taskrun.TaskManager()
+    t1 = taskrun.NopTask(tm, 't1')
+    t2 = taskrun.NopTask(tm, 't2')
+    t3 = taskrun.NopTask(tm, 't3')
+    tm.add_dependencies([(t1, t2), (t2, t3)])
+    with self.assertRaises(ValueError):
+      t3.add_dependency(t1)
+    t1.add_dependency(t3)
+    self.assertTrue(tm.run_tasks())
@@ -0,0 +1,65 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import time
+import unittest
+import taskrun
+
+
+class FanInTestCase(unittest.TestCase):
+  def test_fanin_100k(self):
+    num = 100000
+    rm = taskrun.ResourceManager(taskrun.CounterResource('slots', 1, 8))
+    tm = taskrun.TaskManager(resource_manager=rm, engine='worker_pool')
+    done = []
+    sink = taskrun.FunctionTask(tm, 'sink', lambda: done.append(True))
+    start = time.time()
+    for idx in range(num):
+      sink.add_dependency(taskrun.NopTask(tm, 't{}'.format(idx)))
+    self.assertEqual(sink.pending, num)
+    self.assertEqual(len(sink.get_dependencies()), num)
+    self.assertTrue(tm.run_tasks())
+    elapsed = time.time() - start
+    self.assertEqual(done, [True])
+    self.assertEqual(sink.pending, 0)
+    self.assertEqual(len(sink.get_dependencies()), num)
+    # quadratic dependency removal took minutes here
+    self.assertLess(elapsed, 60)
+
+  def test_concurrent_completions(self):
+    # many dependencies completing at the same time on different threads
+    for _ in range(10):
+      tm = taskrun.TaskManager()
+      done = []
+      sink = taskrun.FunctionTask(tm, 'sink', lambda: done.append(True))
+      for idx in range(64):
+        sink.add_dependency(taskrun.NopTask(tm, 't{}'.format(idx)))
+      self.assertTrue(tm.run_tasks())
+      self.assertEqual(done, [True])
@@ -143,3 +143,20 @@ class FileCleanupObserverTestCase(unittest.TestCase):
     self.assertFalse(os.path.isfile(file1))
     self.assertFalse(os.path.isfile(file2))
     self.assertFalse(os.path.isfile(file3))
+
+  def test_compressed(self):
+    fd, file1 = tempfile.mkstemp()
+    os.close(fd)
+    os.remove(file1)
+
+    ob = taskrun.FileCleanupObserver()
+    tm = taskrun.TaskManager(observers=[ob])
+    t1 = taskrun.ProcessTask(tm, 't1', 'echo hello; false')
+    t1.stdout_file = file1
+    t1.output_compression = 'gzip'
+    t1.add_condition(taskrun.FileModificationCondition([], [file1]))
+
+    tm.run_tasks()
+    self.assertEqual(t1.output_files, {file1: file1 + '.gz'})
+    self.assertFalse(os.path.isfile(file1))
+    self.assertFalse(os.path.isfile(file1 + '.gz'))
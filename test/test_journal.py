@@ -0,0 +1,155 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import unittest.mock
+import taskrun
+
+
+FAKESLURM = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'testprogs', 'fakeslurm')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# a manager that prints the results of its tasks
+MANAGER = '''
+import sys
+import taskrun
+taskrun.ClusterBackend.POLL_MIN = 0.05
+taskrun.ClusterBackend.POLL_MAX = 0.2
+tm = taskrun.TaskManager(failure_mode='blind_continue', journal=sys.argv[1])
+tasks = []
+for name, command in [('quick', 'echo quick'),
+                      ('slow', 'sleep 2; exit 3'),
+                      ('later', 'echo later')]:
+  task = taskrun.ClusterTask(tm, name, command, 'slurm')
+  task.asynchronous = True
+  tasks.append(task)
+tasks[2].add_dependency(tasks[1])
+tm.run_tasks()
+for task in tasks:
+  print(task.name, task.returncode, task.job_id)
+'''
+
+
+class JournalTestCase(unittest.TestCase):
+  def setUp(self):
+    # put the fake scheduler commands first in the PATH
+    self._state = tempfile.mkdtemp()
+    self._journal = os.path.join(tempfile.mkdtemp(), 'journal')
+    bindir = tempfile.mkdtemp()
+    for command in ['sbatch', 'sacct', 'scancel']:
+      os.symlink(FAKESLURM, os.path.join(bindir, command))
+    patches = [
+      unittest.mock.patch.dict(os.environ, {
+        'PATH': bindir + os.pathsep + os.environ['PATH'],
+        'FAKESLURM_DIR': self._state,
+        'PYTHONPATH': ROOT}),
+      unittest.mock.patch.object(taskrun.ClusterBackend, 'POLL_MIN', 0.05),
+      unittest.mock.patch.object(taskrun.ClusterBackend, 'POLL_MAX', 0.2),
+      unittest.mock.patch.object(taskrun.ClusterBackend, 'MISSING_LIMIT', 2),
+      unittest.mock.patch.object(taskrun.ClusterBackend, 'SCRIPT_DIR',
+                                 tempfile.mkdtemp())]
+    for patch in patches:
+      patch.start()
+      self.addCleanup(patch.stop)
+
+  def _submissions(self):
+    with open(os.path.join(self._state, 'sbatch.log')) as fd:
+      return len(fd.readlines())
+
+  def _records(self):
+    if not os.path.exists(self._journal):
+      return []
+    with open(self._journal) as fd:
+      return [json.loads(line) for line in fd if line.endswith('\n')]
+
+  def test_reattach(self):
+    cwd = tempfile.mkdtemp()
+    manager = subprocess.Popen([sys.executable, '-c', MANAGER, self._journal],
+                               stdout=subprocess.DEVNULL, cwd=cwd)
+    # the manager dies once quick finished and slow was submitted
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+      records = self._records()
+      if {'quick', 'slow'} <= {record['name'] for record in records} and \
+         any(record['name'] == 'quick' and 'returncode' in record
+             for record in records):
+        break
+      time.sleep(0.02)
+    os.kill(manager.pid, signal.SIGKILL)
+    manager.wait()
+    # quick and slow may have been submitted as one array job
+    submissions = self._submissions()
+    jobs = {record['name']: record['job_id'] for record in self._records()}
+
+    # the restarted manager reattaches instead of resubmitting
+    proc = subprocess.run([sys.executable, '-c', MANAGER, self._journal],
+                          stdout=subprocess.PIPE, check=True, timeout=60,
+                          cwd=cwd)
+    results = {name: (returncode, job_id) for name, returncode, job_id in
+               (line.split() for line in proc.stdout.decode().splitlines())}
+    self.assertEqual(results['quick'], ('0', jobs['quick']))
+    self.assertEqual(results['slow'], ('3', jobs['slow']))
+    self.assertEqual(results['later'][0], '0')
+    self.assertEqual(self._submissions(), submissions + 1)
+
+  def test_resubmit(self):
+    with open(self._journal, 'w') as fd:
+      # a job unknown to the scheduler, a failed job, and a truncated line
+      fd.write(json.dumps({'name': 'lost', 'mode': 'slurm',
+                           'command': 'true', 'job_id': '999'}) + '\n')
+      fd.write(json.dumps({'name': 'failed', 'mode': 'slurm',
+                           'command': 'true', 'job_id': '998'}) + '\n')
+      fd.write(json.dumps({'name': 'failed', 'job_id': '998',
+                           'returncode': 1}) + '\n')
+      fd.write(json.dumps({'name': 'changed', 'mode': 'slurm',
+                           'command': 'false', 'job_id': '997'}) + '\n')
+      fd.write('{"name": "changed", "job_')
+    tm = taskrun.TaskManager(journal=self._journal)
+    tasks = []
+    for name in ['lost', 'failed', 'changed']:
+      task = taskrun.ClusterTask(tm, name, 'true', 'slurm')
+      task.asynchronous = True
+      tasks.append(task)
+    self.assertTrue(tm.run_tasks())
+    for task in tasks:
+      self.assertEqual(task.returncode, 0)
+      self.assertNotIn(task.job_id, ['997', '998', '999'])
+    # the journal records the new jobs
+    journal = taskrun.JobJournal(self._journal)
+    for task in tasks:
+      self.assertEqual(journal.lookup(task), (task.job_id, 0))
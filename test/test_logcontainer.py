@@ -0,0 +1,109 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+import taskrun
+from taskrun import log_container
+
+
+class LogContainerTestCase(unittest.TestCase):
+  def test_tasks(self):
+    path = os.path.join(tempfile.mkdtemp(), 'logs')
+    with taskrun.LogContainer(path) as logs:
+      tm = taskrun.TaskManager()
+      for idx in range(20):
+        task = taskrun.ProcessTask(
+          tm, f't{idx}', f'seq {idx} 1000; echo e{idx} 1>&2')
+        task.log_container = logs
+      t20 = taskrun.ProcessTask(tm, 't20', 'echo file; echo err 1>&2')
+      t20.log_container = logs
+      t20.stdout_file = os.path.join(path, 't20.stdout')
+      self.assertTrue(tm.run_tasks())
+      self.assertIsNone(t20.stdout)
+
+      # readable before the container is closed once flushed
+      logs.flush()
+      reader = taskrun.LogReader(path)
+      self.assertEqual(reader.read('t3', 'stderr'), b'e3\n')
+
+    self.assertEqual(len(os.listdir(path)), 3)
+    reader = taskrun.LogReader(path)
+    self.assertEqual(sorted(reader.names()), sorted(f't{i}' for i in range(21)))
+    for idx in range(20):
+      expected = ''.join(f'{i}\n' for i in range(idx, 1001)).encode()
+      self.assertEqual(reader.read(f't{idx}'), expected)
+      self.assertEqual(reader.read(f't{idx}', 'stderr'), f'e{idx}\n'.encode())
+    self.assertEqual(reader.streams('t20'), ['stderr'])
+    self.assertEqual(reader.read('t20'), b'')
+
+  def test_segments(self):
+    path = tempfile.mkdtemp()
+    with taskrun.LogContainer(path, segment_size=10) as logs:
+      for idx in range(10):
+        logs.write('a', 'stdout', b'0123456789')
+        logs.write('b', 'stdout', bytes([65 + idx]))
+    with taskrun.LogContainer(path) as logs:
+      logs.write('c', 'stderr', b'more')
+    self.assertEqual(len(os.listdir(path)), 13)
+    reader = taskrun.LogReader(path)
+    self.assertEqual(reader.read('a'), b'0123456789' * 10)
+    self.assertEqual(reader.read('b'), b'ABCDEFGHIJ')
+    self.assertEqual(reader.read('c', 'stderr'), b'more')
+
+  def test_sink_close(self):
+    path = tempfile.mkdtemp()
+    with taskrun.LogContainer(path) as logs:
+      sink = logs.sink('a', 'stdout')
+      sink.write(b'out')
+      sink.close()
+      self.assertIsNone(sink.error)
+      # the segment is flushed, the index waits for the container
+      with open(os.path.join(path, 'segment-00000.log'), 'rb') as fd:
+        self.assertEqual(fd.read(), b'out')
+      self.assertEqual(taskrun.LogReader(path).names(), [])
+      logs.flush()
+      self.assertEqual(taskrun.LogReader(path).read('a'), b'out')
+
+  def test_cli(self):
+    path = tempfile.mkdtemp()
+    with taskrun.LogContainer(path) as logs:
+      logs.write('x', 'stdout', b'hi\n')
+    out = io.TextIOWrapper(io.BytesIO())
+    with contextlib.redirect_stdout(out):
+      self.assertEqual(log_container.main([path, 'x']), 0)
+      self.assertEqual(log_container.main([path]), 0)
+    out.seek(0)
+    self.assertEqual(out.read(), 'hi\nx\n')
+    with contextlib.redirect_stderr(io.StringIO()):
+      self.assertEqual(log_container.main([path, 'x', '-s', 'stderr']), 1)
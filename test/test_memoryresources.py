@@ -36,6 +36,24 @@ import taskrun
 
 
 class MemoryResourcesTestCase(unittest.TestCase):
+  def test_limit(self):
+    # the limit is set in the child process, soft and hard
+    rm = taskrun.ResourceManager(
+      taskrun.MemoryResource('ram', 9999, 1))
+    tm = taskrun.TaskManager(resource_manager=rm)
+    t1 = taskrun.ProcessTask(tm, 't1', 'ulimit -v; ulimit -Hv')
+    t1.resources = {'ram': 0.5}
+    self.assertTrue(tm.run_tasks())
+    self.assertEqual(t1.stdout, '524288\n524288\n')
+
+    # and enforced for argv commands too
+    t2 = taskrun.ProcessTask(tm, 't2', ['test/testprogs/alloclots',
+                                        '104857600', '1000', '10'])
+    t2.resources = {'ram': 0.25}
+    self.assertFalse(tm.run_tasks())
+    self.assertNotEqual(t2.returncode, 0)
+    self.assertTrue(t2.stdout.find('all allocated') < 0)
+
   def test_mem1(self):
     rm = taskrun.ResourceManager(
       taskrun.MemoryResource('ram', 9999, 1))
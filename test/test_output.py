@@ -0,0 +1,117 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import contextlib
+import io
+import unittest
+import taskrun
+
+
+class OutputObserver(taskrun.Observer):
+  def __init__(self):
+    self.calls = []
+    self.live = False
+
+  def task_output(self, task, stream, chunk):
+    self.calls.append((task.name, stream, chunk))
+    if not task.stdout_capture:
+      self.live = True
+
+
+class OutputTestCase(unittest.TestCase):
+  def test_live(self):
+    ob = OutputObserver()
+    tm = taskrun.TaskManager(observers=[ob])
+    t1 = taskrun.ProcessTask(
+      tm, 't1', 'echo one; sleep 0.2; echo two; echo err 1>&2')
+    self.assertTrue(tm.run_tasks())
+    self.assertTrue(ob.live)
+    self.assertEqual(
+      b''.join(c for n, s, c in ob.calls if s == 'stdout'), b'one\ntwo\n')
+    self.assertEqual(
+      b''.join(c for n, s, c in ob.calls if s == 'stderr'), b'err\n')
+    self.assertEqual(t1.stdout, 'one\ntwo\n')
+
+  def test_batching(self):
+    ob = OutputObserver()
+    tm = taskrun.TaskManager(observers=[ob])
+    lines = 100000
+    taskrun.ProcessTask(tm, 't1', f'seq 1 {lines}')
+    self.assertTrue(tm.run_tasks())
+    data = b''.join(c for n, s, c in ob.calls)
+    self.assertEqual(data.count(b'\n'), lines)
+    self.assertLess(len(ob.calls), 100)
+
+  def test_not_wanted(self):
+    ob = taskrun.Observer()
+    self.assertFalse(ob.wants_output())
+    tm = taskrun.TaskManager(observers=[ob])
+    t1 = taskrun.ProcessTask(tm, 't1', 'echo hi')
+    self.assertIsNone(tm.output_listener(t1))
+    self.assertTrue(tm.run_tasks())
+    self.assertEqual(t1.stdout, 'hi\n')
+
+  def test_verbose_tail(self):
+    ob = taskrun.VerboseObserver(show_starts=False, show_progress=False,
+                                 show_summary=False, tail_failures=2)
+    self.assertTrue(ob.wants_output())
+    tm = taskrun.TaskManager(observers=[ob])
+    taskrun.ProcessTask(tm, 't1', 'echo a; echo b; echo c 1>&2; printf d; '
+                        'exit 1')
+    taskrun.ProcessTask(tm, 't2', 'echo hidden')
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+      self.assertFalse(tm.run_tasks())
+    text = out.getvalue()
+    self.assertIn('  stderr| c\n  stdout| d', text)
+    self.assertNotIn('stdout| b', text)
+    self.assertNotIn('hidden', text)
+
+  def test_verbose_tail_long_line(self):
+    ob = taskrun.VerboseObserver(show_starts=False, show_progress=False,
+                                 show_summary=False, tail_failures=1,
+                                 tail_line_bytes=8)
+    tm = taskrun.TaskManager(observers=[ob])
+    taskrun.ProcessTask(tm, 't1', 'for i in $(seq 1000); do printf abcdef; '
+                        'done; printf 12345678; exit 1')
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+      self.assertFalse(tm.run_tasks())
+    self.assertIn('  stdout| ...12345678\n', out.getvalue())
+
+  def test_verbose_usage(self):
+    ob = taskrun.VerboseObserver(show_starts=False, show_progress=False,
+                                 show_summary=False, show_usage=True)
+    tm = taskrun.TaskManager(observers=[ob])
+    taskrun.ProcessTask(tm, 't1', 'true')
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+      self.assertTrue(tm.run_tasks())
+    self.assertIn('  Usage: user ', out.getvalue())
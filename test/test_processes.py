@@ -28,8 +28,14 @@
  * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
  * POSSIBILITY OF SUCH DAMAGE.
 """
+import gzip
 import os
+import resource
+import subprocess
+import sys
+import time
 import unittest
+import unittest.mock
 import taskrun
 import tempfile
 
@@ -47,3 +53,131 @@ class ProcessesTestCase(unittest.TestCase):
 
   def test_proc2(self):
     pass  # needs a good error mode
+
+  def test_argv(self):
+    tm = taskrun.TaskManager(failure_mode='blind_continue')
+    t1 = taskrun.ProcessTask(tm, 't1', ['echo', 'a  b', '$HOME'])
+    t2 = taskrun.ProcessTask(tm, 't2', [sys.executable, '-c',
+                                        'import sys; sys.stderr.write("e")'])
+    t2.stderr_file = 'stdout'
+    t3 = taskrun.ProcessTask(tm, 't3', ['taskrun-does-not-exist'])
+    self.assertEqual(t1.describe(), "echo 'a  b' '$HOME'")
+    self.assertFalse(tm.run_tasks())
+    self.assertEqual(t1.stdout, 'a  b $HOME\n')
+    self.assertEqual(t2.stdout, 'e')
+    self.assertIsNone(t2.stderr)
+    self.assertIsInstance(t3._errors, FileNotFoundError)
+
+  def test_rlimits(self):
+    rm = taskrun.ResourceManager(taskrun.CpuTimeResource('time', 7))
+    tm = taskrun.TaskManager(resource_manager=rm)
+    t1 = taskrun.ProcessTask(tm, 't1', [
+      sys.executable, '-c',
+      'import resource; print(resource.getrlimit(resource.RLIMIT_CPU)[0])'])
+    t2 = taskrun.ProcessTask(tm, 't2', 'ulimit -t; ulimit -Ht')
+    t2.add_dependency(t1)
+    self.assertTrue(tm.run_tasks())
+    self.assertEqual(t1.rlimits, {resource.RLIMIT_CPU: 7})
+    self.assertEqual(t1.stdout, '7\n')
+    self.assertEqual(t2.stdout, '7\n7\n')
+    self.assertEqual(t2.command, 'ulimit -t; ulimit -Ht')
+
+  def test_prefuncs(self):
+    tmpdir = tempfile.mkdtemp()
+    tm = taskrun.TaskManager()
+    script = ('import os, resource; print(os.getcwd(), os.nice(0), '
+              'oct(os.umask(0)), sorted(os.sched_getaffinity(0)), '
+              'resource.getrlimit(resource.RLIMIT_NOFILE)[0])')
+    cpu = min(os.sched_getaffinity(0))
+    expected = '{} {} 0o27 [{}] 100\n'.format(tmpdir, os.nice(0) + 3, cpu)
+    tasks = []
+    for command in ([sys.executable, '-c', script],
+                    '"{}" -c "{}"'.format(sys.executable, script)):
+      task = taskrun.ProcessTask(tm, 't{}'.format(len(tasks)), command)
+      task.add_prefunc(taskrun.Cwd(tmpdir))
+      task.add_prefunc(taskrun.Nice(3))
+      task.add_prefunc(taskrun.Umask(0o027))
+      task.add_prefunc(taskrun.Affinity([cpu]))
+      task.add_prefunc(taskrun.RLimit(resource.RLIMIT_NOFILE, 50))
+      task.add_prefunc(taskrun.RLimit(resource.RLIMIT_NOFILE, 100))
+      tasks.append(task)
+    with self.assertRaises(TypeError):
+      tasks[0].add_prefunc(lambda: None)
+    self.assertEqual(len(tasks[0].prefuncs), 5)
+    self.assertTrue(tm.run_tasks())
+    for task in tasks:
+      self.assertEqual(task.stdout, expected)
+    os.rmdir(tmpdir)
+
+  def test_compressed(self):
+    tmp = tempfile.mkdtemp()
+    tm = taskrun.TaskManager()
+    t1 = taskrun.ProcessTask(tm, 't1', 'seq 1 100000; echo err 1>&2')
+    t1.stdout_file = os.path.join(tmp, 'out')
+    t1.stderr_file = os.path.join(tmp, 'err.gz')
+    t1.output_compression = 'gzip'
+    t2 = taskrun.ProcessTask(tm, 't2', 'echo out; echo err 1>&2')
+    t2.stdout_file = os.path.join(tmp, 'both')
+    t2.stderr_file = t2.stdout_file
+    t2.output_compression = 'gzip'
+    self.assertEqual(t1.describe(), 'seq 1 100000; echo err 1>&2 1> {} 2> {}'
+                     .format(t1.stdout_file + '.gz', t1.stderr_file))
+    self.assertTrue(tm.run_tasks())
+    self.assertIsNone(t1.stdout)
+    with gzip.open(t1.stdout_file + '.gz') as fd:
+      data = fd.read()
+    self.assertEqual(data.count(b'\n'), 100000)
+    self.assertLess(os.path.getsize(t1.stdout_file + '.gz'), len(data) / 2)
+    with gzip.open(t1.stderr_file) as fd:
+      self.assertEqual(fd.read(), b'err\n')
+    with gzip.open(t2.stdout_file + '.gz') as fd:
+      self.assertEqual(sorted(fd.read().split()), [b'err', b'out'])
+    self.assertEqual(sorted(os.listdir(tmp)), ['both.gz', 'err.gz', 'out.gz'])
+    self.assertIn('gzip', taskrun.compressions())
+
+  def test_usage(self):
+    tm = taskrun.TaskManager()
+    t1 = taskrun.ProcessTask(
+      tm, 't1', [sys.executable, '-c', 'sum(range(1000000))'])
+    t2 = taskrun.ProcessTask(tm, 't2', 'exec 1>&-; sleep 0.01')
+    self.assertIsNone(t1.usage)
+    self.assertTrue(tm.run_tasks())
+    self.assertGreater(t1.usage.ru_utime + t1.usage.ru_stime, 0)
+    self.assertGreater(t1.usage.ru_maxrss, 0)
+    self.assertGreater(t2.usage.ru_nvcsw, 0)
+
+  def test_kill_background(self):
+    # the shell exits right away, the backgrounded child keeps the output
+    #  pipe of the task open until the process group is killed
+    tm = taskrun.TaskManager()
+    t1 = taskrun.ProcessTask(tm, 't1', 'sleep 6 & echo started')
+    taskrun.ProcessTask(tm, 't2', 'sleep 0.3; false')
+    start = time.monotonic()
+    self.assertFalse(tm.run_tasks())
+    self.assertLess(time.monotonic() - start, 3)
+    self.assertTrue(t1.killed)
+
+  def test_spawn_paths(self):
+    # the memory limits of the standard manager are set in the child without
+    #  running another program first, unlimited tasks use posix_spawn
+    tm = taskrun.standard_task_manager(
+      max_cpus=4, default_cpus=1, max_memory=8, default_memory=1, verbosity=0)
+    tasks = [taskrun.ProcessTask(tm, f't{idx}', 'ulimit -v; ulimit -Hv')
+             for idx in range(5)]
+    tm2 = taskrun.TaskManager()
+    taskrun.ProcessTask(tm2, 'free', 'true')
+    with unittest.mock.patch('os.posix_spawn', wraps=os.posix_spawn) as ps, \
+         unittest.mock.patch('subprocess.Popen',
+                             wraps=subprocess.Popen) as popen:
+      self.assertTrue(tm.run_tasks())
+      self.assertEqual(ps.call_count, 0)
+      self.assertTrue(tm2.run_tasks())
+      self.assertEqual(ps.call_count, 1)
+    self.assertEqual(popen.call_count, 5)
+    for call in popen.call_args_list:
+      self.assertEqual(call.kwargs['executable'], '/bin/sh')
+      self.assertIsNotNone(call.kwargs['preexec_fn'])
+    for task in tasks:
+      # both limits are set like 'ulimit -v' did
+      self.assertEqual(task.stdout, '{0}\n{0}\n'.format(1024 * 1024))
+
@@ -0,0 +1,87 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import asyncio
+import os
+import unittest
+import taskrun
+from .OrderCheckObserver import OrderCheckObserver
+
+
+def other_process(pid):
+  return 0 if os.getpid() != pid else 1
+
+
+def add(a, b, expected=0):
+  return 0 if a + b == expected else a + b
+
+
+def raise_error():
+  raise ValueError('bad')
+
+
+class ProcessPoolTestCase(unittest.TestCase):
+  def test_success(self):
+    ob = OrderCheckObserver(['@t1', '@t2', '+t1', '-t1', '+t2', '-t2'])
+    rm = taskrun.ResourceManager(taskrun.CounterResource('cpus', 1, 2))
+    tm = taskrun.TaskManager(resource_manager=rm, observers=[ob])
+    t1 = taskrun.ProcessPoolFunctionTask(tm, 't1', other_process, os.getpid())
+    t2 = taskrun.ProcessPoolFunctionTask(tm, 't2', add, 1, 2, expected=3)
+    t2.add_dependency(t1)
+    self.assertTrue(tm.run_tasks())
+    self.assertTrue(ob.ok())
+
+  def test_errors(self):
+    ob = OrderCheckObserver(['@t1', '+t1', '!t1'])
+    tm = taskrun.TaskManager(observers=[ob])
+    t1 = taskrun.ProcessPoolFunctionTask(tm, 't1', add, 1, 2)
+    self.assertFalse(tm.run_tasks())
+    self.assertTrue(ob.ok())
+    self.assertEqual(t1._errors, 3)
+
+  def test_exception(self):
+    tm = taskrun.TaskManager(failure_mode='blind_continue')
+    t1 = taskrun.ProcessPoolFunctionTask(tm, 't1', raise_error)
+    self.assertFalse(tm.run_tasks())
+    self.assertIsInstance(t1._errors, ValueError)
+
+  def test_async(self):
+    ob = OrderCheckObserver(['@t1', '+t1', '-t1'])
+    tm = taskrun.TaskManager(observers=[ob])
+    taskrun.ProcessPoolFunctionTask(tm, 't1', other_process, os.getpid())
+    self.assertTrue(asyncio.run(tm.run_tasks_async()))
+    self.assertTrue(ob.ok())
+
+  def test_pool_size(self):
+    rm = taskrun.ResourceManager(taskrun.CounterResource('cpus', 1, 3))
+    tm = taskrun.TaskManager(resource_manager=rm)
+    pool = tm.process_pool()
+    self.assertEqual(pool._max_workers, 3)
+    pool.shutdown()
@@ -0,0 +1,95 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import unittest
+import taskrun
+
+
+class Item:
+  def __init__(self, name, priority):
+    self.name = name
+    self.priority = priority
+
+class ReadyQueueTestCase(unittest.TestCase):
+  def test_order(self):
+    rq = taskrun.ReadyQueue()
+    self.assertEqual(len(rq), 0)
+    self.assertIsNone(rq.peek())
+    items = [Item('a', 1), Item('b', 5), Item('c', 1), Item('d', 1000000),
+             Item('e', 5), Item('f', 0)]
+    for item in items:
+      rq.push(item)
+    self.assertEqual(len(rq), 6)
+    self.assertEqual([x.name for x in rq], ['d', 'b', 'e', 'a', 'c', 'f'])
+    names = []
+    while len(rq) > 0:
+      self.assertIs(rq.peek(), rq.peek())
+      names.append(rq.pop().name)
+    self.assertEqual(names, ['d', 'b', 'e', 'a', 'c', 'f'])
+
+  def test_interleaved(self):
+    rq = taskrun.ReadyQueue()
+    rq.push(Item('a', 2))
+    rq.push(Item('b', 1))
+    self.assertEqual(rq.pop().name, 'a')
+    rq.push(Item('c', 3))
+    rq.push(Item('d', 2))
+    self.assertEqual(rq.pop().name, 'c')
+    self.assertEqual(rq.pop().name, 'd')
+    rq.push(Item('e', 1))
+    self.assertEqual(rq.pop().name, 'b')
+    self.assertEqual(rq.pop().name, 'e')
+    self.assertEqual(len(rq), 0)
+
+  def test_remove_and_clear(self):
+    rq = taskrun.ReadyQueue()
+    a = Item('a', 3)
+    b = Item('b', 2)
+    c = Item('c', 2)
+    for item in [a, b, c]:
+      rq.push(item)
+    self.assertIn(b, rq)
+    rq.remove(a)
+    self.assertNotIn(a, rq)
+    self.assertIs(rq.peek(), b)
+    rq.remove(c)
+    self.assertEqual(len(rq), 1)
+    self.assertEqual(rq.clear(), [b])
+    self.assertEqual(len(rq), 0)
+    self.assertIsNone(rq.peek())
+
+  def test_unbounded_priorities(self):
+    tm = taskrun.TaskManager()
+    order = []
+    for pri in [3, 100, 17, 64000]:
+      t = taskrun.FunctionTask(tm, 't{}'.format(pri), order.append, pri)
+      t.priority = pri
+    tm.run_tasks()
+    self.assertEqual(order, [64000, 100, 17, 3])
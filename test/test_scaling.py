@@ -0,0 +1,57 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import time
+import unittest
+import taskrun
+
+
+def run_time(num):
+  rm = taskrun.ResourceManager(taskrun.CounterResource('slots', 1, 4))
+  tm = taskrun.TaskManager(resource_manager=rm, engine='worker_pool')
+  tasks = [taskrun.NopTask(tm, 't{}'.format(idx)) for idx in range(num)]
+  # some tasks wait on others so the waiting set is exercised too
+  for idx in range(1, num, 100):
+    tasks[idx].add_dependency(tasks[idx - 1])
+  start = time.time()
+  assert tm.run_tasks()
+  return time.time() - start
+
+class ScalingTestCase(unittest.TestCase):
+  def test_linear(self):
+    small = 10000
+    large = 100000
+    small_time = run_time(small)
+    large_time = run_time(large)
+    # per task cost must not grow with the number of tasks, quadratic
+    #  bookkeeping would make it grow by 10x here
+    per_small = small_time / small
+    per_large = large_time / large
+    self.assertLess(per_large, per_small * 3)
@@ -0,0 +1,128 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+import taskrun
+
+
+def wait_for_children(tm, count):
+  # fails once all the processes are running
+  deadline = time.monotonic() + 60
+  while tm.supervisor().children < count:
+    if time.monotonic() > deadline:
+      return 2
+    time.sleep(0.01)
+  return 1
+
+
+class ShutdownTestCase(unittest.TestCase):
+  def _shutdown(self, count, command, kill_grace):
+    rm = taskrun.ResourceManager(
+      taskrun.CounterResource('slots', 1, count + 1))
+    tm = taskrun.TaskManager(resource_manager=rm, kill_grace=kill_grace)
+    tasks = [taskrun.ProcessTask(tm, f'p{idx}', command)
+             for idx in range(count)]
+    failer = taskrun.FunctionTask(tm, 'failer', wait_for_children, tm, count)
+    failer.priority = 0
+    for task in tasks:
+      task.priority = 1
+    times = {}
+    class Timer(taskrun.Observer):
+      def task_failed(self, task, errors):
+        times['failed'] = time.monotonic()
+    tm.add_observer(Timer())
+    self.assertFalse(tm.run_tasks())
+    elapsed = time.monotonic() - times['failed']
+    self.assertTrue(all(task.killed for task in tasks))
+    return tasks, elapsed
+
+  def test_many(self):
+    tasks, elapsed = self._shutdown(1000, 'exec sleep 60', 30)
+    self.assertTrue(all(task.returncode == -15 for task in tasks))
+    self.assertLess(elapsed, 15)
+
+  def test_escalation(self):
+    tasks, elapsed = self._shutdown(200, 'trap "" TERM; sleep 60', 0.5)
+    self.assertTrue(all(task.returncode == -9 for task in tasks))
+    self.assertGreaterEqual(elapsed, 0.5)
+    self.assertLess(elapsed, 15)
+
+  def test_cluster_cancel(self):
+    self.assertEqual(
+      taskrun.ClusterTask.cancel_command('sge', ['1', '2.3']),
+      ['qdel', '1,2.3'])
+    self.assertEqual(
+      taskrun.ClusterTask.cancel_command('slurm', ['1', '2_3']),
+      ['scancel', '1', '2_3'])
+    self.assertEqual(
+      taskrun.ClusterTask.cancel_command('lsf', ['1', '2[3]']),
+      ['bkill', '1', '2[3]'])
+
+  def test_cluster_cancel_sync(self):
+    # a fake synchronous client reports its job id then waits for the job
+    with tempfile.TemporaryDirectory() as bindir:
+      log = os.path.join(bindir, 'qdel.log')
+      with open(os.path.join(bindir, 'qsub'), 'w') as fd:
+        fd.write('#!/bin/sh\n'
+                 'echo \'Your job 41 ("a") has been submitted\'\n'
+                 'exec sleep 30\n')
+      with open(os.path.join(bindir, 'qdel'), 'w') as fd:
+        fd.write('#!/bin/sh\necho "$@" >> {}\n'.format(log))
+      for name in ['qsub', 'qdel']:
+        os.chmod(os.path.join(bindir, name), 0o755)
+      path = bindir + os.pathsep + os.environ['PATH']
+      with mock.patch.dict(os.environ, {'PATH': path}):
+        tm = taskrun.TaskManager()
+        task = taskrun.ClusterTask(tm, 'a', 'true', 'sge')
+        failer = taskrun.FunctionTask(tm, 'failer', self._fail_on_job, task)
+        start = time.monotonic()
+        self.assertFalse(tm.run_tasks())
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertTrue(task.killed)
+        self.assertEqual(task.job_id, '41')
+        deadline = time.monotonic() + 10
+        while not os.path.exists(log) and time.monotonic() < deadline:
+          time.sleep(0.01)
+        with open(log) as fd:
+          self.assertEqual(fd.read(), '41\n')
+      del failer
+
+  @staticmethod
+  def _fail_on_job(task):
+    # fails once the client has reported the job id
+    deadline = time.monotonic() + 10
+    while task.job_id is None and time.monotonic() < deadline:
+      time.sleep(0.01)
+    return 1
+
@@ -0,0 +1,211 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import threading
+import unittest
+import taskrun
+
+
+class CountObserver(taskrun.Observer):
+  def __init__(self):
+    super().__init__()
+    self.added = 0
+    self.completed = 0
+
+  def task_added(self, task):
+    self.added += 1
+
+  def task_completed(self, task):
+    self.completed += 1
+
+
+class SpawnTestCase(unittest.TestCase):
+  def _fan_out(self, engine):
+    ob = CountObserver()
+    rm = taskrun.ResourceManager(taskrun.CounterResource('slots', 1, 2))
+    tm = taskrun.TaskManager(resource_manager=rm, observers=[ob],
+                             engine=engine)
+    lock = threading.Lock()
+    results = []
+    active = [0, 0]  # current, max
+
+    def work(index):
+      with lock:
+        active[0] += 1
+        active[1] = max(active)
+      results.append(index)
+      with lock:
+        active[0] -= 1
+
+    def scan():
+      for index in range(20):
+        child = taskrun.FunctionTask(tm, 'w{}'.format(index), work, index)
+        child.add_dependency(scan_task)
+        report.add_dependency(child)
+
+    def check():
+      self.assertEqual(sorted(results), list(range(20)))
+
+    scan_task = taskrun.FunctionTask(tm, 'scan', scan)
+    report = taskrun.FunctionTask(tm, 'report', check)
+    report.add_dependency(scan_task)
+
+    self.assertTrue(tm.run_tasks())
+    self.assertEqual(ob.added, 22)
+    self.assertEqual(ob.completed, 22)
+    self.assertLessEqual(active[1], 2)
+
+  def test_fan_out(self):
+    self._fan_out('thread_per_task')
+
+  def test_fan_out_pool(self):
+    self._fan_out('worker_pool')
+
+  def test_finished_dependency(self):
+    tm = taskrun.TaskManager()
+    order = []
+
+    def spawn():
+      order.append('spawn')
+      child = taskrun.FunctionTask(tm, 'child', order.append, 'child')
+      child.add_dependency(first)
+
+    first = taskrun.FunctionTask(tm, 'first', order.append, 'first')
+    spawner = taskrun.FunctionTask(tm, 'spawner', spawn)
+    spawner.add_dependency(first)
+
+    self.assertTrue(tm.run_tasks())
+    self.assertEqual(order, ['first', 'spawn', 'child'])
+
+  def test_passive_fail(self):
+    tm = taskrun.TaskManager(failure_mode='passive_fail')
+    ran = []
+
+    def spawn():
+      bad = taskrun.FunctionTask(tm, 'bad', lambda: 1)
+      later = taskrun.FunctionTask(tm, 'later', ran.append, 'later')
+      later.add_dependency(bad)
+
+    def spawn_after():
+      taskrun.FunctionTask(tm, 'late', ran.append, 'late')
+
+    spawner = taskrun.FunctionTask(tm, 'spawner', spawn)
+    after = taskrun.FunctionTask(tm, 'after', spawn_after)
+    after.add_dependency(spawner)
+
+    self.assertFalse(tm.run_tasks())
+    self.assertEqual(ran, [])
+
+  def test_active_continue(self):
+    failed = threading.Event()
+    class FailObserver(taskrun.Observer):
+      def task_failed(self, task, errors):
+        failed.set()
+    tm = taskrun.TaskManager(failure_mode='active_continue',
+                             observers=[FailObserver()])
+    ran = []
+
+    bad = []
+    def spawn_bad():
+      bad.append(taskrun.FunctionTask(tm, 'bad', lambda: 1))
+
+    # make sure the failing task has finished before its dependent is added
+    def wait_bad():
+      failed.wait()
+      bad[0].join()
+
+    def spawn_after():
+      blocked = taskrun.FunctionTask(tm, 'blocked', ran.append, 'blocked')
+      blocked.add_dependency(bad[0])
+      taskrun.FunctionTask(tm, 'free', ran.append, 'free')
+
+    spawner = taskrun.FunctionTask(tm, 'spawner', spawn_bad)
+    wait = taskrun.FunctionTask(tm, 'wait', wait_bad)
+    wait.add_dependency(spawner)
+    after = taskrun.FunctionTask(tm, 'after', spawn_after)
+    after.add_dependency(wait)
+
+    self.assertFalse(tm.run_tasks())
+    self.assertEqual(ran, ['free'])
+
+  def test_started_dependency(self):
+    tm = taskrun.TaskManager()
+    errors = []
+
+    def add_late():
+      # the running task, a queued task, and a finished task
+      for task in [running, queued, first]:
+        try:
+          task.add_dependency(other)
+        except RuntimeError as ex:
+          errors.append(str(ex))
+
+    first = taskrun.FunctionTask(tm, 'first', lambda: None)
+    running = taskrun.FunctionTask(tm, 'running', add_late)
+    running.add_dependency(first)
+    queued = taskrun.FunctionTask(tm, 'queued', lambda: None)
+    queued.add_dependency(first)
+    other = taskrun.FunctionTask(tm, 'other', lambda: None)
+
+    self.assertTrue(tm.run_tasks())
+    self.assertEqual(len(errors), 3)
+    with self.assertRaises(RuntimeError):
+      running.add_dependency(taskrun.FunctionTask(tm, 'new', lambda: None))
+    for task in [running, queued, first]:
+      self.assertNotIn(other, task.get_dependencies())
+
+  def test_cycle(self):
+    tm = taskrun.TaskManager(failure_mode='blind_continue')
+    ran = []
+
+    def spawn():
+      one = taskrun.FunctionTask(tm, 'one', ran.append, 'one')
+      two = taskrun.FunctionTask(tm, 'two', ran.append, 'two')
+      tm.add_dependencies([(one, two), (two, one)])
+
+    taskrun.FunctionTask(tm, 'spawner', spawn)
+    self.assertFalse(tm.run_tasks())
+    self.assertEqual(ran, [])
+
+  def test_commit(self):
+    tm = taskrun.TaskManager()
+    ran = []
+
+    def spawn():
+      def other():
+        taskrun.FunctionTask(tm, 'other', ran.append, 'other')
+        tm.commit_tasks()
+      thread = threading.Thread(target=other)
+      thread.start()
+      thread.join()
+
+    taskrun.FunctionTask(tm, 'spawner', spawn)
+    self.assertTrue(tm.run_tasks())
+    self.assertEqual(ran, ['other'])
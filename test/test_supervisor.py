@@ -0,0 +1,88 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import os
+import subprocess
+import threading
+import unittest
+import unittest.mock
+import taskrun
+
+
+class SupervisorTestCase(unittest.TestCase):
+  def _watch(self, supervisor, command):
+    result = []
+    done = threading.Event()
+    def callback(returncode, stdout, stderr, usage):
+      self.assertGreaterEqual(usage.ru_maxrss, 0)
+      result.extend([returncode, stdout.getvalue(), stderr.getvalue()])
+      done.set()
+    proc = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE)
+    supervisor.watch(proc, callback)
+    self.assertTrue(done.wait(10))
+    return result
+
+  def test_output(self):
+    supervisor = taskrun.ProcessSupervisor()
+    self.assertEqual(self._watch(supervisor, 'echo out; echo err 1>&2; exit 3'),
+                     [3, b'out\n', b'err\n'])
+    # more than a pipe buffer of output
+    returncode, stdout, _ = self._watch(supervisor, 'head -c 1000000 /dev/zero')
+    self.assertEqual(returncode, 0)
+    self.assertEqual(len(stdout), 1000000)
+    supervisor.shutdown()
+
+  def test_polling(self):
+    with unittest.mock.patch('os.pidfd_open', side_effect=OSError):
+      supervisor = taskrun.ProcessSupervisor()
+      self.assertEqual(self._watch(supervisor, 'echo hi'), [0, b'hi\n', b''])
+      self.assertEqual(self._watch(supervisor, 'kill -9 $$')[0], -9)
+      supervisor.shutdown()
+
+  def test_threads(self):
+    tm = taskrun.TaskManager(engine='worker_pool', workers=4)
+    for idx in range(100):
+      taskrun.ProcessTask(tm, 't{}'.format(idx), 'sleep 0.5')
+    base = threading.active_count()
+    peak = 0
+    done = threading.Event()
+    def watch():
+      nonlocal peak
+      while not done.is_set():
+        peak = max(peak, threading.active_count())
+        done.wait(0.01)
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+    self.assertTrue(tm.run_tasks())
+    done.set()
+    watcher.join()
+    # watcher, supervisor, and the workers
+    self.assertLessEqual(peak - base, 6)
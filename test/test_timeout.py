@@ -0,0 +1,110 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import contextlib
+import io
+import threading
+import time
+import unittest
+import taskrun
+
+
+class TimeoutTestCase(unittest.TestCase):
+  def test_wheel(self):
+    wheel = taskrun.TimerWheel(resolution=0.01, slots=8)
+    fired = []
+    done = threading.Event()
+    start = time.monotonic()
+    def fire(name):
+      fired.append((name, time.monotonic() - start))
+      if name == 'last':
+        done.set()
+    wheel.schedule(0.05, lambda: fire('a'))
+    cancelled = wheel.schedule(0.06, lambda: fire('cancelled'))
+    wheel.schedule(0.02, lambda: fire('b'))
+    wheel.schedule(0.3, lambda: fire('last'))  # more than a rotation
+    wheel.cancel(cancelled)
+    self.assertEqual(len(wheel), 3)
+    self.assertTrue(done.wait(5))
+    self.assertEqual([name for name, _ in fired], ['b', 'a', 'last'])
+    for (name, elapsed), delay in zip(fired, [0.02, 0.05, 0.3]):
+      self.assertGreaterEqual(elapsed, delay)
+    self.assertEqual(len(wheel), 0)
+    wheel.shutdown()
+
+  def test_timeout(self):
+    ob = taskrun.VerboseObserver(show_starts=False, show_progress=False,
+                                 show_summary=False)
+    tm = taskrun.TaskManager(observers=[ob], failure_mode='blind_continue')
+    t1 = taskrun.ProcessTask(tm, 't1', 'sleep 10')
+    t1.timeout = 0.2
+    t2 = taskrun.ProcessTask(tm, 't2', 'sleep 0.1')
+    t2.timeout = 5
+    start = time.monotonic()
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+      self.assertFalse(tm.run_tasks())
+    self.assertLess(time.monotonic() - start, 5)
+    self.assertTrue(t1.killed)
+    self.assertEqual(t1.kill_reason, 'timed out after 0.2s')
+    self.assertEqual(t1.returncode, -15)
+    self.assertFalse(t2.killed)
+    self.assertIsNone(t2.kill_reason)
+    self.assertIn('Reason: timed out after 0.2s', out.getvalue())
+
+  def test_escalation(self):
+    tm = taskrun.TaskManager(failure_mode='blind_continue', kill_grace=0.2)
+    t1 = taskrun.ProcessTask(tm, 't1', 'trap "" TERM; sleep 10')
+    t1.timeout = 0.1
+    start = time.monotonic()
+    self.assertFalse(tm.run_tasks())
+    self.assertLess(time.monotonic() - start, 5)
+    self.assertTrue(t1.killed)
+    self.assertEqual(t1.returncode, -9)
+
+  def test_unkillable(self):
+    # a running function can't be killed
+    tm = taskrun.TaskManager(kill_grace=0)
+    t1 = taskrun.FunctionTask(tm, 't1', time.sleep, 0.3)
+    t1.timeout = 0.05
+    self.assertTrue(tm.run_tasks())
+    self.assertFalse(t1.killed)
+    self.assertIsNone(t1.kill_reason)
+
+  def test_force_kill_group(self):
+    # the shell is reaped once killed but a member of its process group
+    #  ignores SIGTERM and holds the output pipe until it gets SIGKILL
+    tm = taskrun.TaskManager(kill_grace=0.5)
+    t1 = taskrun.ProcessTask(tm, 't1', "(trap '' TERM; sleep 8); echo done")
+    t1.timeout = 0.5
+    start = time.monotonic()
+    self.assertFalse(tm.run_tasks())
+    self.assertLess(time.monotonic() - start, 4)
+    self.assertTrue(t1.killed)
@@ -0,0 +1,93 @@
+"""
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are met:
+ *
+ * - Redistributions of source code must retain the above copyright notice, this
+ * list of conditions and the following disclaimer.
+ *
+ * - Redistributions in binary form must reproduce the above copyright notice,
+ * this list of conditions and the following disclaimer in the documentation
+ * and/or other materials provided with the distribution.
+ *
+ * - Neither the name of prim nor the names of its contributors may be used to
+ * endorse or promote products derived from this software without specific prior
+ * written permission.
+ *
+ * See the NOTICE file distributed with this work for additional information
+ * regarding copyright ownership.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ * POSSIBILITY OF SUCH DAMAGE.
+"""
+import threading
+import unittest
+import taskrun
+from .OrderCheckObserver import OrderCheckObserver
+
+
+class WorkerPoolTestCase(unittest.TestCase):
+  def test_engine_create(self):
+    self.assertIs(taskrun.ExecutionEngine.create('worker_pool'),
+                  taskrun.ExecutionEngine.WORKER_POOL)
+    self.assertIs(taskrun.ExecutionEngine.create(1),
+                  taskrun.ExecutionEngine.THREAD_PER_TASK)
+    with self.assertRaises(ValueError):
+      taskrun.ExecutionEngine.create('bogus')
+
+  def test_pool_size(self):
+    rm = taskrun.ResourceManager(taskrun.CounterResource('slots', 1, 3))
+    tm = taskrun.TaskManager(resource_manager=rm, engine='worker_pool')
+    self.assertEqual(tm.pool_size(), 3)
+    tm = taskrun.TaskManager(resource_manager=rm, engine='worker_pool',
+                             workers=7)
+    self.assertEqual(tm.pool_size(), 7)
+    tm = taskrun.TaskManager(engine='worker_pool')
+    self.assertIsNone(tm.pool_size())
+
+  def test_dependencies(self):
+    ob = OrderCheckObserver(['@t1', '@t2', '@t3', '+t1', '-t1', '+t2', '-t2',
+                             '+t3', '-t3'])
+    rm = taskrun.ResourceManager(taskrun.CounterResource('slots', 1, 4))
+    tm = taskrun.TaskManager(resource_manager=rm, observers=[ob],
+                             engine='worker_pool')
+    t1 = taskrun.NopTask(tm, 't1')
+    t2 = taskrun.FunctionTask(tm, 't2', lambda: None)
+    t3 = taskrun.ProcessTask(tm, 't3', 'true')
+    t3.add_dependency(t2)
+    t2.add_dependency(t1)
+    self.assertTrue(tm.run_tasks())
+    self.assertTrue(ob.ok())
+
+  def test_threads_reused(self):
+    threads = set()
+    lock = threading.Lock()
+    def func():
+      with lock:
+        threads.add(threading.current_thread())
+    rm = taskrun.ResourceManager(taskrun.CounterResource('slots', 1, 2))
+    tm = taskrun.TaskManager(resource_manager=rm, engine='worker_pool')
+    for idx in range(200):
+      taskrun.FunctionTask(tm, 't{}'.format(idx), func)
+    self.assertTrue(tm.run_tasks())
+    self.assertLessEqual(len(threads), 2)
+
+  def test_failure(self):
+    ob = OrderCheckObserver(['@t1', '@t2', '+t1', '!t1'])
+    rm = taskrun.ResourceManager(taskrun.CounterResource('slots', 1, 1))
+    tm = taskrun.TaskManager(resource_manager=rm, observers=[ob],
+                             failure_mode='passive_fail',
+                             engine='worker_pool')
+    t1 = taskrun.FunctionTask(tm, 't1', lambda: 1)
+    t2 = taskrun.NopTask(tm, 't2')
+    t2.add_dependency(t1)
+    self.assertFalse(tm.run_tasks())
+    self.assertTrue(ob.ok())